@@ -1,12 +1,22 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 from flask_cors import CORS
 import joblib
 import pandas as pd
 import numpy as np
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import re
+import json
+import math
+import time
 import logging
+from academic_scoring import (FEATURES, FeatureAttributor, feature_encoder, prediction_label, score_one, score_records,
+                              what_if)
+from cohort_store import CohortAnalytics, prediction_entry
+from llm_cache import cache_key, llm_cache_from_env
+from llm_gateway import llm_gateway_from_env
+from llm_score import SCORE_ONLY_MAX_TOKENS, PendingReports, read_score, score_instruction
+from llm_streaming import ProbabilityWatcher, completion_deltas, event_stream_response, requested_stream_format
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -23,81 +33,132 @@ OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY is not set in the .env file")
 
-# Initialize OpenRouter client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
-)
+# Initialize OpenRouter client: a pooled gateway with per-model concurrency limits, retries,
+# circuit breaking and fallback models (LLM_BASE_URL can point it at a local stub server)
+client = llm_gateway_from_env()
+
+# OpenRouter settings shared by the blocking and the streamed report
+LLM_MODEL = "meta-llama/llama-3.1-8b-instruct:free"  # Switch to a reliable model
+LLM_EXTRA_HEADERS = {
+    "HTTP-Referer": "http://localhost:3000",  # Replace with your site URL
+    "X-Title": "Mental Health Analysis",      # Replace with your site name
+}
+LLM_REPORT_MAX_TOKENS = 500  # Adjust based on desired report length
 
 # Load the CatBoost model
 model = joblib.load('catboost_depression_model.pkl')
 
-# Define the expected features
-FEATURES = [
-    'Age', 'Academic Pressure', 'CGPA', 'Study Satisfaction',
-    'Dietary Habits', 'Degree', 'Have you ever had suicidal thoughts ?',
-    'Work/Study Hours', 'Fatigue Index', 'Stress Risk Score'
-]
+# Per-prediction SHAP attributions, cached by encoded feature vector
+attributor = FeatureAttributor(
+    model,
+    max_size=int(os.getenv('ATTRIBUTION_CACHE_SIZE', 10000)),
+    calc_type=os.getenv('SHAP_CALC_TYPE', 'Regular')
+)
+
+# Running cohort aggregates of every prediction; set COHORT_STORE_PATH (e.g. academic_predictions.ndjson)
+# to also append the answers, without user IDs, to a local log that survives restarts
+cohort = CohortAnalytics(path=os.getenv('COHORT_STORE_PATH') or None)
+cohort.load()
+
+# Shared LLM response cache: identical prompts are answered without an OpenRouter call
+llm_cache = llm_cache_from_env()
+
+# Inputs of score-only requests, kept so their full report can be asked for later by full_report_id
+pending_reports = PendingReports()
 
-def generate_llm_report(input_data, prediction, probability):
+# Batch scoring: records per predict_proba call and the largest accepted batch
+BATCH_CHUNK_SIZE = int(os.getenv('BATCH_CHUNK_SIZE', 1000))
+MAX_BATCH_RECORDS = int(os.getenv('MAX_BATCH_RECORDS', 100000))
+# LLM reports are one API call each, so batches that ask for them are capped separately
+MAX_BATCH_REPORTS = int(os.getenv('MAX_BATCH_REPORTS', 50))
+
+def build_llm_messages(input_data, prediction, probability, contributions=None, score_only=False):
     """
-    Send the user input and CatBoost prediction to OpenRouter to generate an AI report.
+    Chat messages asking for the report on the user input and CatBoost prediction, or with
+    score_only for just the 'Academic Stress Probability: X%' line.
+    contributions ({feature: SHAP value}) ground the report in what the model actually used.
     """
-    try:
-        # Construct the prompt for the LLM
-        prompt = (
-            "You are a mental health expert. Based on the following academic-related data and a machine learning model's prediction, "
-            "generate a detailed report assessing the user's mental health and providing recommendations.\n\n"
-            "User Input:\n"
-        )
-        for feature, value in input_data.items():
-            prompt += f"- {feature}: {value}\n"
+    prompt = (
+        "You are a mental health expert. Based on the following academic-related data and a machine learning model's prediction, "
+        "generate a detailed report assessing the user's mental health and providing recommendations.\n\n"
+        "User Input:\n"
+    )
+    for feature, value in input_data.items():
+        prompt += f"- {feature}: {value}\n"
+    prompt += (
+        f"\nMachine Learning Prediction:\n"
+        f"- Depression Risk: {prediction}\n"
+        f"- Probability of Depression: {probability * 100:.2f}%\n\n"
+    )
+    if contributions:
+        prompt += "Model Feature Contributions (SHAP values in log-odds; positive values raised the predicted risk, negative values lowered it):\n"
+        for feature, contribution in contributions.items():
+            prompt += f"- {feature}: {contribution:+.3f}\n"
+        prompt += "\n" if score_only else "\nBase the Risk Factors and Protective Factors on these contributions.\n\n"
+    if score_only:
         prompt += (
-            f"\nMachine Learning Prediction:\n"
-            f"- Depression Risk: {prediction}\n"
-            f"- Probability of Depression: {probability * 100:.2f}%\n\n"
-            "Provide a detailed analysis of the user's mental health based on this data. Structure your response with the following sections:\n"
-            "- **Summary of Academic Stress:** Describe the user's stress levels related to academics.\n"
-            "- **Risk Factors:** Highlight concerning patterns or behaviors.\n"
-            "- **Protective Factors:** Identify positive or adaptive behaviors.\n"
-            "- **Academic Stress Probability:** Estimate the probability of academic stress (0-100%) based on the data and include it in the format 'Academic Stress Probability: X%' (e.g., 'Academic Stress Probability: 75%'). Use the following guidelines:\n"
+            "Estimate the probability of academic stress (0-100%) based on this data. Use the following guidelines:\n"
             "  - **Low Stress (0-15%)**: Balanced workload, good coping strategies, stable emotions.\n"
             "  - **Moderate Stress (30-50%)**: Some overwhelm, reduced productivity, mild anxiety.\n"
-            "  - **High Stress (80-100%)**: Severe overwhelm, burnout symptoms, ineffective coping.\n"
-            "- **Recommendations:** Offer actionable advice to manage academic stress.\n\n"
-            "Ensure that the 'Academic Stress Probability: X%' line is included exactly as specified, with a numeric value between 0 and 100, followed by a '%' sign. Be empathetic, professional, and supportive in your tone."
+            "  - **High Stress (80-100%)**: Severe overwhelm, burnout symptoms, ineffective coping.\n\n"
+            + score_instruction('Academic Stress Probability')
         )
+        return [
+            {"role": "system", "content": "You are a mental health expert."},
+            {"role": "user", "content": prompt},
+        ]
+    prompt += (
+        "Provide a detailed analysis of the user's mental health based on this data. Structure your response with the following sections:\n"
+        "- **Summary of Academic Stress:** Describe the user's stress levels related to academics.\n"
+        "- **Risk Factors:** Highlight concerning patterns or behaviors.\n"
+        "- **Protective Factors:** Identify positive or adaptive behaviors.\n"
+        "- **Academic Stress Probability:** Estimate the probability of academic stress (0-100%) based on the data and include it in the format 'Academic Stress Probability: X%' (e.g., 'Academic Stress Probability: 75%'). Use the following guidelines:\n"
+        "  - **Low Stress (0-15%)**: Balanced workload, good coping strategies, stable emotions.\n"
+        "  - **Moderate Stress (30-50%)**: Some overwhelm, reduced productivity, mild anxiety.\n"
+        "  - **High Stress (80-100%)**: Severe overwhelm, burnout symptoms, ineffective coping.\n"
+        "- **Recommendations:** Offer actionable advice to manage academic stress.\n\n"
+        "Ensure that the 'Academic Stress Probability: X%' line is included exactly as specified, with a numeric value between 0 and 100, followed by a '%' sign. Be empathetic, professional, and supportive in your tone."
+    )
+    return [
+        {"role": "system", "content": "You are a mental health expert."},
+        {"role": "user", "content": prompt},
+    ]
 
-        # Make a request to OpenRouter using the OpenAI client
-        logger.debug("Making request to OpenRouter API...")
-        try:
+def generate_llm_report(input_data, prediction, probability, contributions=None):
+    """
+    Send the user input and CatBoost prediction to OpenRouter to generate an AI report.
+    """
+    try:
+        messages = build_llm_messages(input_data, prediction, probability, contributions)
+
+        def request_report():
             completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "http://localhost:3000",  # Replace with your site URL
-                    "X-Title": "Mental Health Analysis",      # Replace with your site name
-                },
+                extra_headers=LLM_EXTRA_HEADERS,
                 extra_body={},
-                model="meta-llama/llama-3.1-8b-instruct:free",  # Switch to a reliable model
-                messages=[
-                    {"role": "system", "content": "You are a mental health expert."},
-                    {"role": "user", "content": prompt},
-                ],
-                max_tokens=500,  # Adjust based on desired report length
+                model=LLM_MODEL,
+                messages=messages,
+                max_tokens=LLM_REPORT_MAX_TOKENS,
             )
+
+            # Log the raw response for debugging
+            logger.debug(f"OpenRouter API raw response: {completion}")
+
+            # Check if completion is valid
+            if not completion or not hasattr(completion, 'choices') or not completion.choices:
+                raise ValueError("OpenRouter API returned an invalid response: No choices found")
+            if not getattr(completion.choices[0].message, 'content', None):
+                raise ValueError("OpenRouter API returned an invalid response: No content in the message")
+            return completion.choices[0].message.content.strip()
+
+        # Make a request to OpenRouter using the OpenAI client, unless the same prompt was answered before
+        logger.debug("Making request to OpenRouter API...")
+        try:
+            report, cache_status = llm_cache.fetch(cache_key(LLM_MODEL, messages, max_tokens=LLM_REPORT_MAX_TOKENS), request_report)
         except Exception as api_error:
             logger.error(f"OpenRouter API request failed: {str(api_error)}")
             return f"Error generating LLM report: OpenRouter API request failed: {str(api_error)}"
+        logger.debug(f"LLM report cache: {cache_status}")
 
-        # Log the raw response for debugging
-        logger.debug(f"OpenRouter API raw response: {completion}")
-
-        # Check if completion is valid
-        if not completion or not hasattr(completion, 'choices') or not completion.choices:
-            logger.error("OpenRouter API returned an invalid response: No choices found")
-            return "Error generating LLM report: OpenRouter API returned an invalid response"
-
-        # Extract the report
-        report = completion.choices[0].message.content.strip()
         if not report:
             logger.warning("LLM report is empty; returning default message")
             return (
@@ -113,58 +174,214 @@ def generate_llm_report(input_data, prediction, probability):
         logger.error(f"Error generating LLM report: {str(e)}")
         return f"Error generating LLM report: {str(e)}"
 
+def generate_llm_score(input_data, prediction, probability, contributions=None):
+    """
+    Ask OpenRouter for the academic stress probability only, reading the answer just up to the score.
+    Returns (academic stress probability, usage); falls back to the CatBoost probability when the
+    model does not answer in the expected format.
+    """
+    started = time.perf_counter()
+    score, text, stopped_early = read_score(
+        client, 'Academic Stress Probability',
+        extra_headers=LLM_EXTRA_HEADERS,
+        extra_body={},
+        model=LLM_MODEL,
+        messages=build_llm_messages(input_data, prediction, probability, contributions, score_only=True),
+    )
+    usage = {
+        'llm_ms': round((time.perf_counter() - started) * 1000, 1),
+        'completion_tokens': math.ceil(len(text) / 4),  # estimated
+        'max_tokens': SCORE_ONLY_MAX_TOKENS,
+        'stopped_early': stopped_early
+    }
+    logger.info(f"Score-only report: {usage['completion_tokens']} completion tokens instead of up to {LLM_REPORT_MAX_TOKENS}, {usage['llm_ms']} ms")
+    if score is None:
+        score = extract_academic_stress_probability(text, probability)
+    return score, usage
+
+def stream_llm_report_events(input_data, prediction, probability, contributions, base_value, user_id):
+    """
+    Events of a streamed /api/predict-depression-with-report: the CatBoost prediction first, then report
+    deltas as they arrive, the academic stress probability as soon as its line is complete, and done.
+    """
+    yield 'prediction', {
+        'prediction': prediction,
+        'probability': probability,
+        **attribution_fields(contributions, base_value),
+        'user_id': user_id
+    }
+    watcher = ProbabilityWatcher('Academic Stress Probability')
+    try:
+        for delta in completion_deltas(
+            client,
+            extra_headers=LLM_EXTRA_HEADERS,
+            extra_body={},
+            model=LLM_MODEL,
+            messages=build_llm_messages(input_data, prediction, probability, contributions),
+            max_tokens=LLM_REPORT_MAX_TOKENS,
+        ):
+            yield 'report', {'delta': delta}
+            if watcher.feed(delta) is not None:
+                yield 'academic_stress_probability', {'academic_stress_probability': watcher.value}
+    except Exception as e:
+        logger.error(f"OpenRouter streaming request failed: {str(e)}")
+        yield 'error', {'error': f"Error generating LLM report: OpenRouter API request failed: {str(e)}"}
+        return
+
+    llm_report = watcher.text.strip()
+    if not llm_report:
+        yield 'error', {'error': "Error generating LLM report: OpenRouter API returned an empty report"}
+        return
+    yield 'done', {
+        'llm_report': llm_report,
+        'academic_stress_probability': watcher.value if watcher.value is not None
+        else extract_academic_stress_probability(llm_report, probability)
+    }
+
+def attribution_fields(contributions, base_value):
+    """
+    Response fields for SHAP contributions; empty when attributions were not requested.
+    """
+    if contributions is None:
+        return {}
+    return {'feature_contributions': contributions, 'contribution_base_value': base_value}
+
+def extract_academic_stress_probability(llm_report, probability):
+    """
+    Read 'Academic Stress Probability: X%' from the LLM report, falling back to the CatBoost probability.
+    """
+    probability_match = re.search(r'Academic Stress Probability: (\d+\.?\d*)%', llm_report)
+    if probability_match is None:
+        logger.warning("Could not extract academic stress probability from the LLM report; using CatBoost probability as fallback")
+        return probability * 100
+    return float(probability_match.group(1))
+
+@app.route('/api/llm-cache-stats', methods=['GET'])
+def llm_cache_stats():
+    """
+    Hit/miss/stale counters of the shared LLM response cache.
+    """
+    return jsonify(llm_cache.stats()), 200
+
+@app.route('/api/llm-gateway-stats', methods=['GET'])
+def llm_gateway_stats():
+    """
+    Per-model concurrency, queue, retry, circuit breaker and latency statistics of the LLM gateway.
+    """
+    return jsonify(client.stats()), 200
+
+@app.route('/api/attribution-cache-stats', methods=['GET'])
+def attribution_cache_stats():
+    """
+    Hit/miss counters of the SHAP attribution cache.
+    """
+    return jsonify(attributor.stats()), 200
+
+@app.route('/api/cohort-dashboard', methods=['GET'])
+def cohort_dashboard():
+    """
+    Cohort aggregates over all stored predictions: risk histogram, mean risk by degree and
+    study hours, and daily counts for the last `days` days (default 90).
+    """
+    try:
+        days = int(request.args.get('days', 90))
+    except ValueError:
+        return jsonify({'error': 'days must be an integer'}), 400
+    return jsonify(cohort.dashboard(days=max(days, 1))), 200
+
 @app.route('/api/predict-depression-with-report', methods=['POST'])
 def predict_depression_with_report():
+    """
+    Predict depression risk and generate the LLM report. With "stream": "sse" / "ndjson" (or true, or
+    Accept: text/event-stream) the prediction is sent at once and the report streamed as it is generated.
+    With "mode": "score" only the academic stress probability is asked for, and the response carries a
+    full_report_id; posting {"full_report_id": ...} later generates the full report for the same input.
+    The report is grounded in the SHAP feature contributions of the prediction, which full report
+    responses include; set include_attributions to include them in a score-only response too.
+    """
     try:
         # Get the input data from the request
         data = request.get_json()
         user_id = data.get('user_id')  # For logging or authentication purposes
 
-        # Extract the features from the input data
-        input_data = {}
-        for feature in FEATURES:
-            if feature not in data:
-                return jsonify({'error': f'Missing feature: {feature}'}), 400
-            input_data[feature] = data[feature]
+        # A full_report_id from a score-only response brings back its input
+        full_report_id = data.get('full_report_id')
+        if full_report_id:
+            pending = pending_reports.get(full_report_id)
+            if pending is None:
+                return jsonify({'error': 'Unknown or expired full_report_id'}), 404
+            input_data = pending['input_data']
+            user_id = user_id or pending['user_id']
+        else:
+            # Extract the features from the input data
+            input_data = {}
+            for feature in FEATURES:
+                if feature not in data:
+                    return jsonify({'error': f'Missing feature: {feature}'}), 400
+                input_data[feature] = data[feature]
 
-        # Convert input data to a DataFrame for the CatBoost model
-        input_df = pd.DataFrame([input_data], columns=FEATURES)
+        # Validate and encode the features straight into a preallocated row for the CatBoost model
+        try:
+            row = feature_encoder.encode(input_data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
-        # Map categorical features
-        degree_mapping = {'Bachelors': 0, 'Masters': 1, 'PhD': 2}
-        suicidal_thoughts_mapping = {'No': 0, 'Yes': 1}
+        # Make CatBoost prediction with the SHAP feature contributions that ground the LLM prompt
+        include_attributions = str(data.get('include_attributions', False)).lower() in ('true', '1')
+        prediction, probability, feature_contributions, base_value = score_one(model, row, attributor)
+        attributions = attribution_fields(feature_contributions, base_value)
 
-        input_df['Degree'] = input_df['Degree'].map(degree_mapping)
-        input_df['Have you ever had suicidal thoughts ?'] = input_df['Have you ever had suicidal thoughts ?'].map(suicidal_thoughts_mapping)
+        # Record the prediction for cohort analytics (a full report for a score-only request was recorded then)
+        prediction_result = prediction_label(prediction)
+        if not full_report_id:
+            cohort.record([prediction_entry(input_data, row[0], prediction_result, probability)])
 
-        # Ensure all features are numeric
-        for feature in FEATURES:
-            input_df[feature] = pd.to_numeric(input_df[feature], errors='coerce')
+        stream_format = requested_stream_format(data)
 
-        # Check for NaN values after conversion
-        if input_df.isnull().values.any():
-            return jsonify({'error': 'Invalid input data: Some features could not be converted to numeric values'}), 400
+        # Score-only: a one-line answer, read only up to the academic stress probability
+        if str(data.get('mode', '')).lower() == 'score' and not full_report_id:
+            if not include_attributions:
+                attributions = {}
+            try:
+                academic_stress_probability, usage = generate_llm_score(input_data, prediction_result, probability, feature_contributions)
+            except Exception as api_error:
+                logger.error(f"OpenRouter API request failed: {str(api_error)}")
+                return jsonify({'error': f"Error generating LLM score: OpenRouter API request failed: {str(api_error)}"}), 500
+            result = {
+                'prediction': prediction_result,
+                'probability': probability,
+                'academic_stress_probability': academic_stress_probability,
+                **attributions,
+                'full_report_id': pending_reports.put({'input_data': input_data, 'user_id': user_id}),
+                'usage': usage,
+                'user_id': user_id
+            }
+            if stream_format:
+                events = [
+                    ('prediction', {'prediction': prediction_result, 'probability': probability, **attributions, 'user_id': user_id}),
+                    ('academic_stress_probability', {'academic_stress_probability': academic_stress_probability}),
+                    ('done', result)
+                ]
+                return event_stream_response(iter(events), stream_format)
+            return jsonify(result), 200
 
-        # Make CatBoost prediction
-        prediction = model.predict(input_df)[0]  # 0 or 1 (No Depression or Depression)
-        prediction_proba = model.predict_proba(input_df)[0]  # Probabilities for both classes
+        # Stream the report instead of waiting for the whole completion
+        if stream_format:
+            return event_stream_response(
+                stream_llm_report_events(input_data, prediction_result, probability, feature_contributions,
+                                         base_value, user_id),
+                stream_format
+            )
 
         # Generate LLM report
-        prediction_result = 'Depression' if prediction == 1 else 'No Depression'
-        probability = float(prediction_proba[1])
-        llm_report = generate_llm_report(input_data, prediction_result, probability)
+        llm_report = generate_llm_report(input_data, prediction_result, probability, feature_contributions)
 
         # Check if the report contains an error message
         if "Error generating LLM report" in llm_report:
             return jsonify({'error': llm_report}), 500
 
         # Extract the academic stress probability from the LLM report
-        import re
-        probability_match = re.search(r'Academic Stress Probability: (\d+\.?\d*)%', llm_report)
-        academic_stress_probability = float(probability_match.group(1)) if probability_match else probability * 100  # Fallback to CatBoost probability
-
-        if probability_match is None:
-            logger.warning("Could not extract academic stress probability from the LLM report; using CatBoost probability as fallback")
+        academic_stress_probability = extract_academic_stress_probability(llm_report, probability)
 
         # Prepare the response
         result = {
@@ -172,6 +389,7 @@ def predict_depression_with_report():
             'probability': probability,  # CatBoost probability of depression
             'academic_stress_probability': academic_stress_probability,  # Extracted from LLM report or fallback
             'llm_report': llm_report,
+            **attributions,
             'user_id': user_id
         }
 
@@ -181,5 +399,108 @@ def predict_depression_with_report():
         logger.error(f"Error in predict_depression_with_report: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/what-if-depression', methods=['POST'])
+def what_if_depression():
+    """
+    How one student's predicted risk responds to changes in chosen features.
+    Body: the student's features plus ranges, e.g.
+    {"ranges": {"Work/Study Hours": {"min": 0, "max": 12, "step": 1}, "Dietary Habits": {"values": [0, 1, 2]}}}.
+    The whole perturbation grid is scored in one batch call; no LLM report is generated.
+    """
+    try:
+        data = request.get_json()
+        try:
+            result = what_if(model, data, data.get('ranges'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        result['user_id'] = data.get('user_id')
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f"Error in what_if_depression: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+def read_batch_records():
+    """
+    Read batch records from a JSON body ({"records": [...]}) or an NDJSON body (one record per line).
+    Returns (records, options); raises ValueError for a body that is not of that shape.
+    """
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        records = [json.loads(line) for line in request.get_data(as_text=True).splitlines() if line.strip()]
+        return records, request.args
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('expected a JSON object with a records list')
+    records = data.get('records') or []
+    if not isinstance(records, list):
+        raise ValueError('records must be a list')
+    return records, data
+
+@app.route('/api/predict-depression-batch', methods=['POST'])
+def predict_depression_batch():
+    """
+    Score many students and stream one NDJSON result line per record, in input order.
+    Records are scored in chunks of BATCH_CHUNK_SIZE with one predict_proba call per chunk.
+    Set include_attributions to add SHAP feature contributions (computed in the same pass as the
+    scores) and include_report to also generate the LLM report for each scored record; reports are
+    always grounded in the contributions.
+    """
+    try:
+        try:
+            records, options = read_batch_records()
+        except ValueError as e:
+            return jsonify({'error': f'Invalid batch body: {str(e)}'}), 400
+
+        include_report = str(options.get('include_report', False)).lower() in ('true', '1')
+        include_attributions = str(options.get('include_attributions', False)).lower() in ('true', '1')
+        if not isinstance(records, list) or not records:
+            return jsonify({'error': 'No records to score'}), 400
+        if len(records) > MAX_BATCH_RECORDS:
+            return jsonify({'error': f'Too many records: at most {MAX_BATCH_RECORDS} per batch'}), 400
+        if include_report and len(records) > MAX_BATCH_REPORTS:
+            return jsonify({'error': f'Too many records for include_report: at most {MAX_BATCH_REPORTS} per batch'}), 400
+        logger.debug(f"Scoring batch of {len(records)} records for user {options.get('user_id')}")
+
+        def generate():
+            for start in range(0, len(records), BATCH_CHUNK_SIZE):
+                chunk = records[start:start + BATCH_CHUNK_SIZE]
+                try:
+                    results = score_records(model, chunk, attributor if include_attributions or include_report else None)
+                except Exception as e:
+                    logger.error(f"Error scoring batch chunk at {start}: {str(e)}")
+                    results = [{'index': i, 'error': str(e)} for i in range(len(chunk))]
+                cohort.record([
+                    prediction_entry(
+                        {feature: record[feature] for feature in FEATURES},
+                        feature_encoder.encode_into(record, np.empty(len(FEATURES))),
+                        result['prediction'], result['probability']
+                    )
+                    for result, record in zip(results, chunk) if 'error' not in result
+                ])
+                for result, record in zip(results, chunk):
+                    result['index'] += start
+                    if isinstance(record, dict) and 'id' in record:
+                        result['id'] = record['id']
+                    if include_report and 'error' not in result:
+                        input_data = {feature: record[feature] for feature in FEATURES}
+                        llm_report = generate_llm_report(
+                            input_data, result['prediction'], result['probability'], result.get('feature_contributions')
+                        )
+                        if "Error generating LLM report" in llm_report:
+                            result['report_error'] = llm_report
+                        else:
+                            result['llm_report'] = llm_report
+                            result['academic_stress_probability'] = extract_academic_stress_probability(llm_report, result['probability'])
+                    if not include_attributions:
+                        result.pop('feature_contributions', None)
+                        result.pop('contribution_base_value', None)
+                    yield json.dumps(result) + '\n'
+
+        return Response(generate(), mimetype='application/x-ndjson')
+
+    except Exception as e:
+        logger.error(f"Error in predict_depression_batch: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 if __name__ == '__main__':
     app.run(port=5002, debug=True)
\ No newline at end of file
@@ -0,0 +1,44 @@
+"""
+Overhead of SHAP feature attributions against scoring alone for the academic model.
+
+For single-row requests and batches of increasing size, times one predict_proba call
+(scoring only) against FeatureAttributor.explain() with a cold cache (scores and SHAP values
+in one pass) and with a warm cache (every row seen before).
+
+Usage: python bench_academic_attributions.py
+"""
+import time
+
+import joblib
+import numpy as np
+
+from academic_scoring import FeatureAttributor, feature_encoder, score_encoded
+from bench_academic_inference import synthetic_records
+
+BATCH_SIZES = [1, 100, 1000, 10000]
+SINGLE_ROW_REPEATS = 200
+
+
+def timed(func, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        func()
+    return (time.perf_counter() - start) / repeats
+
+
+if __name__ == '__main__':
+    model = joblib.load('catboost_depression_model.pkl')
+    records = synthetic_records(max(BATCH_SIZES) + SINGLE_ROW_REPEATS, seed=1)
+    matrix = np.array([feature_encoder.encode_into(record, np.empty(len(feature_encoder.features))) for record in records])
+
+    print(f"{'rows':>8}{'score ms':>12}{'explain cold ms':>18}{'explain warm ms':>18}{'cold overhead':>16}")
+    for size in BATCH_SIZES:
+        repeats = SINGLE_ROW_REPEATS if size == 1 else max(1, 2000 // size)
+        batch = matrix[:size]
+        score = timed(lambda: score_encoded(model, batch), repeats)
+        # A fresh attributor per repeat keeps every call cold
+        cold = timed(lambda: FeatureAttributor(model).explain(batch), repeats)
+        warm_attributor = FeatureAttributor(model, max_size=len(matrix))
+        warm_attributor.explain(batch)
+        warm = timed(lambda: warm_attributor.explain(batch), repeats)
+        print(f"{size:>8}{score * 1e3:>12.2f}{cold * 1e3:>18.2f}{warm * 1e3:>18.2f}{cold / score:>15.1f}x")
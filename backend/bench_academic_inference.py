@@ -0,0 +1,90 @@
+"""
+Per-request latency of academic model inference, before and after the compiled encoder.
+
+"pandas" is the previous path of /api/predict-depression-with-report: a one-row DataFrame,
+per-column .map and pd.to_numeric, an isnull scan, then model.predict and model.predict_proba.
+"encoder" is the endpoint's current default: FeatureEncoder.encode into a preallocated row and
+score_one, a single predict_proba call. "encoder+shap" is the same request with
+include_attributions, where score_one also computes SHAP contributions (cold attribution cache,
+as for a new student). All are timed end to end on the same records (without the LLM call).
+
+Usage: python bench_academic_inference.py [requests]
+"""
+import random
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from academic_scoring import FEATURES, FeatureAttributor, feature_encoder, score_one
+
+REQUESTS = 5000
+
+
+def legacy_predict(model, input_data):
+    input_df = pd.DataFrame([input_data], columns=FEATURES)
+    input_df['Degree'] = input_df['Degree'].map({'Bachelors': 0, 'Masters': 1, 'PhD': 2})
+    input_df['Have you ever had suicidal thoughts ?'] = input_df['Have you ever had suicidal thoughts ?'].map({'No': 0, 'Yes': 1})
+    for feature in FEATURES:
+        input_df[feature] = pd.to_numeric(input_df[feature], errors='coerce')
+    if input_df.isnull().values.any():
+        raise ValueError('invalid input')
+    prediction = model.predict(input_df)[0]
+    prediction_proba = model.predict_proba(input_df)[0]
+    return int(prediction), float(prediction_proba[1])
+
+
+def encoder_predict(model, input_data, attributor=None):
+    prediction, probability, _, _ = score_one(model, feature_encoder.encode(input_data), attributor)
+    return int(prediction), probability
+
+
+def synthetic_records(count, seed=0):
+    rng = random.Random(seed)
+    return [{
+        'Age': rng.randint(18, 35),
+        'Academic Pressure': rng.randint(1, 5),
+        'CGPA': round(rng.uniform(5, 10), 2),
+        'Study Satisfaction': rng.randint(1, 5),
+        'Dietary Habits': rng.randint(0, 2),
+        'Degree': rng.choice(['Bachelors', 'Masters', 'PhD']),
+        'Have you ever had suicidal thoughts ?': rng.choice(['Yes', 'No']),
+        'Work/Study Hours': rng.randint(0, 12),
+        'Fatigue Index': round(rng.uniform(0, 5), 1),
+        'Stress Risk Score': str(round(rng.uniform(0, 10), 1))
+    } for _ in range(count)]
+
+
+def latencies(func, model, records):
+    timings = np.empty(len(records))
+    for i, record in enumerate(records):
+        start = time.perf_counter()
+        func(model, record)
+        timings[i] = time.perf_counter() - start
+    return timings * 1e6
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    model = joblib.load('catboost_depression_model.pkl')
+    records = synthetic_records(requests)
+
+    # Both paths must agree before their speed is compared
+    for record in records[:500]:
+        old, new = legacy_predict(model, record), encoder_predict(model, record)
+        assert old[0] == new[0] and abs(old[1] - new[1]) < 1e-12, (record, old, new)
+
+    # Every record is distinct, so the attributor computes SHAP values for each one
+    attributor = FeatureAttributor(model)
+    shap_predict = lambda model, record: encoder_predict(model, record, attributor)
+    assert shap_predict(model, records[0])[0] == encoder_predict(model, records[0])[0]
+    attributor = FeatureAttributor(model)
+    paths = (('pandas', legacy_predict), ('encoder', encoder_predict), ('encoder+shap', shap_predict))
+    results = {name: latencies(func, model, records) for name, func in paths}
+    print(f"{requests} single-row requests, latency in microseconds")
+    print(f"{'path':>14}{'mean':>10}{'p50':>10}{'p99':>10}")
+    for name, timings in results.items():
+        print(f"{name:>14}{timings.mean():>10.0f}{np.percentile(timings, 50):>10.0f}{np.percentile(timings, 99):>10.0f}")
+    print(f"{'speedup':>14}{results['pandas'].mean() / results['encoder'].mean():>9.1f}x (default path vs pandas)")
@@ -0,0 +1,76 @@
+"""
+Lookup latency of the near-duplicate essay index as it grows.
+
+Fills an EssayIndex with synthetic essays (120 words drawn from a 5,000-word vocabulary) and,
+at each checkpoint, times lookups of near-duplicates of stored essays (2%, 5% or 10% of the
+words replaced, as after small edits) and of fresh essays, reporting hit rates and the memory
+the index holds.
+
+Usage: python bench_essay_dedup.py [max_entries]
+"""
+import resource
+import sys
+import time
+
+import numpy as np
+
+from essay_dedup import EssayIndex
+
+CHECKPOINTS = [10_000, 100_000, 300_000]
+ESSAY_WORDS = 120
+VOCABULARY = np.array([f"w{i}" for i in range(5000)])
+EDIT_FRACTIONS = [0.02, 0.05, 0.10]
+QUERIES = 1000
+
+
+def essay(seed, edit_fraction=0.0):
+    rng = np.random.default_rng(seed)
+    words = rng.integers(0, len(VOCABULARY), ESSAY_WORDS)
+    if edit_fraction:
+        edit_rng = np.random.default_rng(seed + 10 ** 9)
+        positions = edit_rng.choice(ESSAY_WORDS, int(ESSAY_WORDS * edit_fraction), replace=False)
+        words[positions] = edit_rng.integers(0, len(VOCABULARY), len(positions))
+    return ' '.join(VOCABULARY[words])
+
+
+def lookups(index, texts):
+    timings = np.empty(len(texts))
+    hits = 0
+    for i, text in enumerate(texts):
+        start = time.perf_counter()
+        payload, _ = index.query(index.signature(text))
+        timings[i] = time.perf_counter() - start
+        hits += payload is not None
+    return timings * 1e6, hits / len(texts)
+
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+if __name__ == '__main__':
+    checkpoints = [int(sys.argv[1])] if len(sys.argv) > 1 else CHECKPOINTS
+    index = EssayIndex(max_entries=max(checkpoints))
+    rng = np.random.default_rng(0)
+    baseline = rss_mb()
+    print(f"threshold {index.threshold}")
+    print(f"{'entries':>9}{'insert/s':>11}{'p50 us':>9}{'p99 us':>9}"
+          + ''.join(f"{f'hits {fraction:.0%} edits':>17}" for fraction in EDIT_FRACTIONS)
+          + f"{'hits new':>10}{'RSS MB':>9}")
+    stored = 0
+    for checkpoint in checkpoints:
+        start = time.perf_counter()
+        for seed in range(stored, checkpoint):
+            index.add(index.signature(essay(seed)), {'report': 'r', 'probability': 50.0})
+        insert_rate = (checkpoint - stored) / (time.perf_counter() - start)
+        stored = checkpoint
+
+        results = [
+            lookups(index, [essay(int(seed), fraction) for seed in rng.integers(0, stored, QUERIES)])
+            for fraction in EDIT_FRACTIONS
+        ]
+        results.append(lookups(index, [essay(int(seed)) for seed in rng.integers(10 ** 8, 2 * 10 ** 8, QUERIES)]))
+        timings = np.concatenate([times for times, _ in results])
+        print(f"{stored:>9}{insert_rate:>11,.0f}{np.percentile(timings, 50):>9.0f}{np.percentile(timings, 99):>9.0f}"
+              + ''.join(f"{hits:>17.1%}" for _, hits in results[:-1])
+              + f"{results[-1][1]:>10.1%}{rss_mb() - baseline:>9.0f}")
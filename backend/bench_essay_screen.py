@@ -0,0 +1,83 @@
+"""
+Throughput of the local essay pre-screen and the share of LLM calls it avoids.
+
+Synthetic Q1-Q3 submissions are built from low-risk and high-risk phrase pools mixed by a
+latent risk level, whose value stands in for the LLM's Depression Probability. The screen is
+trained on one set and evaluated on another; for several confidence bands the benchmark
+reports how many essays are answered locally and how often those local answers agree with
+the label.
+
+Usage: python bench_essay_screen.py
+"""
+import random
+import time
+
+import numpy as np
+
+from essay_screen import EssayScreen, essay_text
+
+TRAIN_ESSAYS = 20000
+TEST_ESSAYS = 5000
+BANDS = [(0.05, 0.95), (0.10, 0.90), (0.15, 0.85), (0.25, 0.75), (0.35, 0.65)]
+
+LOW_RISK = [
+    "I usually get up early and go for a run before class", "my friends and I cook dinner together on weekends",
+    "I feel motivated when I plan my week", "when I am stressed I talk to my sister and it helps",
+    "I have been enjoying my courses this semester", "I sleep well most nights",
+    "I joined a climbing club and met great people", "I am looking forward to the summer internship",
+    "I take breaks and go for walks when work piles up", "I feel proud of how I handled the exams",
+    "I like spending time with my family", "I have hobbies that keep me busy and happy",
+]
+HIGH_RISK = [
+    "I do not see the point of getting out of bed anymore", "I feel empty and numb most of the day",
+    "I stopped answering messages from my friends", "nothing I used to enjoy feels good now",
+    "I cannot concentrate and I keep falling behind", "I feel like a burden to everyone around me",
+    "I sleep all day but I am still exhausted", "I cry at night and I do not know why",
+    "I skip meals because I cannot be bothered", "everything feels heavy and hopeless",
+    "I stay in my room and avoid people", "I feel worthless when I compare myself to others",
+]
+FILLER = ["to be honest", "lately", "most days", "this year", "at university", "if I think about it", "I guess"]
+
+
+def synthetic_essays(count, seed=0):
+    """
+    (texts, targets): each essay draws its sentences from the high-risk pool with its latent risk.
+    """
+    rng = random.Random(seed)
+    texts, targets = [], []
+    for _ in range(count):
+        risk = rng.choice([rng.uniform(0.0, 0.15)] * 9 + [rng.uniform(0.85, 1.0)] * 8 + [rng.uniform(0.3, 0.7)] * 3)
+        answers = {}
+        for key in ('Q1', 'Q2', 'Q3'):
+            sentences = [
+                f"{rng.choice(FILLER)} {rng.choice(HIGH_RISK if rng.random() < risk else LOW_RISK)}"
+                for _ in range(rng.randint(2, 6))
+            ]
+            answers[key] = '. '.join(sentences) + '.'
+        texts.append(essay_text(answers))
+        targets.append(risk)
+    return texts, np.array(targets)
+
+
+if __name__ == '__main__':
+    train_texts, train_targets = synthetic_essays(TRAIN_ESSAYS, seed=0)
+    test_texts, test_targets = synthetic_essays(TEST_ESSAYS, seed=1)
+
+    start = time.perf_counter()
+    screen = EssayScreen.train(train_texts, train_targets)
+    print(f"trained on {TRAIN_ESSAYS} essays in {time.perf_counter() - start:.1f}s")
+
+    timings = np.empty(len(test_texts))
+    probabilities = np.empty(len(test_texts))
+    for i, text in enumerate(test_texts):
+        start = time.perf_counter()
+        probabilities[i] = screen.probability(text)
+        timings[i] = time.perf_counter() - start
+    print(f"screened {TEST_ESSAYS} essays: {len(test_texts) / timings.sum():,.0f} essays/s, "
+          f"p50 {np.percentile(timings, 50) * 1e6:.0f}us, p99 {np.percentile(timings, 99) * 1e6:.0f}us")
+
+    print(f"{'band':>14}{'answered locally':>20}{'agree with label':>20}")
+    for low, high in BANDS:
+        confident = (probabilities < low) | (probabilities > high)
+        agreement = ((probabilities > 0.5) == (test_targets > 0.5))[confident].mean()
+        print(f"{f'[{low:.2f}, {high:.2f}]':>14}{confident.mean():>19.1%}{agreement:>19.1%}")
@@ -0,0 +1,135 @@
+"""
+The LLM gateway against a local stub OpenAI-compatible server.
+
+Five scenarios, each driven by concurrent caller threads:
+  pooling   the gateway's pooled session vs. one requests.post per call (as Spotify did),
+            comparing throughput and TCP connections opened
+  flaky     20% of upstream calls fail with 503: success rate with and without retries
+  outage    the primary model is down: the circuit breaker opens after a few failures and the
+            fallback model serves the rest without paying for a failed call first
+  burst     more callers than slots: peak upstream concurrency stays at the per-model cap
+  stream    streamed completions read through completion_deltas, ending with the empty-delta
+            final chunk OpenAI-compatible servers send; connections are reused across streams
+
+Usage: python bench_llm_gateway.py [callers] [requests_per_caller]
+"""
+import logging
+import sys
+import threading
+import time
+
+import numpy as np
+import requests
+
+from llm_gateway import LLMGateway, LLMGatewayError
+from llm_streaming import completion_deltas
+from llm_stub_server import start_stub_server
+
+CALLERS = 16
+REQUESTS_PER_CALLER = 25
+LATENCY = 0.02
+MESSAGES = [{'role': 'user', 'content': 'How stressed does this student sound?'}]
+
+
+def drive(call, callers, per_caller):
+    """
+    Run `call` per_caller times in each of `callers` threads; returns (latencies in ms, errors, seconds).
+    """
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def worker():
+        for _ in range(per_caller):
+            start = time.perf_counter()
+            try:
+                call()
+            except (LLMGatewayError, requests.exceptions.RequestException) as e:
+                with lock:
+                    errors.append(e)
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+
+    threads = [threading.Thread(target=worker) for _ in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return np.array(latencies), errors, time.perf_counter() - start
+
+
+def report(name, latencies, errors, seconds, extra=''):
+    total = len(latencies) + len(errors)
+    p50, p99 = np.percentile(latencies, [50, 99]) if len(latencies) else (float('nan'), float('nan'))
+    print(f"{name:<28}{total / seconds:>9.0f}{len(latencies) / total:>10.1%}{p50:>9.1f}{p99:>9.1f}  {extra}")
+
+
+def gateway(base_url, **kwargs):
+    settings = dict(api_key='stub', base_url=base_url, backoff_base=0.01, backoff_max=0.05, breaker_cooldown=60)
+    settings.update(kwargs)
+    return LLMGateway(**settings)
+
+
+def complete(client, model='free'):
+    return lambda: client.chat.completions.create(model=model, messages=MESSAGES, max_tokens=40)
+
+
+if __name__ == '__main__':
+    logging.disable(logging.WARNING)
+    callers = int(sys.argv[1]) if len(sys.argv) > 1 else CALLERS
+    per_caller = int(sys.argv[2]) if len(sys.argv) > 2 else REQUESTS_PER_CALLER
+    print(f"{callers} callers x {per_caller} requests, stub latency {LATENCY * 1000:.0f} ms")
+    print(f"{'scenario':<28}{'req/s':>9}{'success':>10}{'p50 ms':>9}{'p99 ms':>9}")
+
+    # pooling
+    server, base_url = start_stub_server(latency=LATENCY)
+
+    def unpooled():
+        response = requests.post(base_url + '/chat/completions', json={'model': 'free', 'messages': MESSAGES, 'max_tokens': 40},
+                                 headers={'Authorization': 'Bearer stub'}, timeout=10)
+        response.raise_for_status()
+        return response.json()
+
+    report('requests.post per call', *drive(unpooled, callers, per_caller), f"{server.state.connections} connections")
+    server.state.connections = 0
+    client = gateway(base_url, max_concurrency=callers)
+    report('gateway (pooled)', *drive(complete(client), callers, per_caller), f"{server.state.connections} connections")
+    server.shutdown()
+
+    # flaky
+    for retries in (0, 2):
+        server, base_url = start_stub_server(latency=LATENCY, error_rate=0.2)
+        client = gateway(base_url, max_retries=retries, fallback_models=[], max_concurrency=callers, breaker_threshold=10 ** 6)
+        report(f"20% 503s, {retries} retries", *drive(complete(client), callers, per_caller),
+               f"{client.stats()['models']['free']['retries']} retries")
+        server.shutdown()
+
+    # outage
+    for fallback in ([], ['paid']):
+        server, base_url = start_stub_server(latency=LATENCY, down_models=['free'])
+        client = gateway(base_url, fallback_models=fallback, max_concurrency=callers)
+        latencies, errors, seconds = drive(complete(client), callers, per_caller)
+        lane = client.stats()['models']['free']
+        report(f"primary down, fallback {fallback[0] if fallback else 'none'}", latencies, errors, seconds,
+               f"breaker {lane['breaker']['state']}, {server.state.requests.get('free', 0)} calls to the dead model")
+        server.shutdown()
+
+    # burst
+    server, base_url = start_stub_server(latency=LATENCY)
+    client = gateway(base_url, max_concurrency=4, max_queue=callers * 4, fallback_models=[])
+    latencies, errors, seconds = drive(complete(client), callers * 4, per_caller)
+    report(f"{callers * 4} callers, 4 slots", latencies, errors, seconds,
+           f"peak upstream concurrency {server.state.peak_in_flight['free']}")
+    server.shutdown()
+    buckets = client.stats()['models']['free']['latency']['bucketsMs']
+
+    # stream
+    server, base_url = start_stub_server(latency=LATENCY)
+    client = gateway(base_url, max_concurrency=callers, fallback_models=[])
+    stream = lambda: ''.join(completion_deltas(client, model='free', messages=MESSAGES, max_tokens=40))
+    report('streamed via gateway', *drive(stream, callers, per_caller), f"{server.state.connections} connections")
+    server.shutdown()
+
+    print()
+    print("gateway latency histogram (burst), ms bucket: count", {bound: count for bound, count in buckets if count})
@@ -0,0 +1,103 @@
+"""
+Memory benchmark for per-user YouTube report storage.
+
+Simulates USERS users with a stored analysis each (scored videos with realistic titles and
+descriptions, the rendered report and the incremental state) and reports the resident
+memory of the legacy dict/string representation against the compact one from report_store.
+Each representation is built in its own process and measured as the growth of its peak RSS
+(tracemalloc itself would need more memory than the legacy representation at 100k users).
+
+Usage: python bench_report_storage.py [users] [videos_per_user]
+"""
+import random
+import subprocess
+import sys
+import resource
+from datetime import datetime, timedelta
+
+from app import (REPORT_TEMPLATE_VERSION, generate_mental_health_report, mental_health_report_params,
+                 categorize_emotion)
+from report_store import StoredReport, PackedMetricsState, compact_metrics
+from youtube_metrics import MetricsAccumulator
+
+USERS = 100_000
+VIDEOS_PER_USER = 12
+WORDS = ['official', 'music', 'video', 'live', 'episode', 'subscribe', 'channel', 'tour', 'merch', 'link',
+         'instagram', 'twitter', 'new', 'album', 'out', 'now', 'follow', 'lyrics', 'full', 'remix']
+TEXT = ' '.join(random.Random(1).choices(WORDS, k=50_000))
+
+
+def simulate_user(rng, user_index, videos_per_user, now):
+    """
+    One user's analysis as /api/analyze-youtube produces it. Titles and descriptions are
+    sliced out of a shared text, so every user holds its own string objects like the
+    JSON-decoded API responses they stand in for.
+    """
+    accumulator = MetricsAccumulator()
+    videos = []
+    for j in range(videos_per_user):
+        score = rng.uniform(20, 90)
+        published = now - timedelta(days=rng.randint(0, 59), seconds=rng.randint(0, 86399))
+        start = rng.randrange(len(TEXT) - 2000)
+        video = {
+            'id': f"{user_index:08x}{j:03x}",
+            'title': TEXT[start:start + rng.randint(30, 80)],
+            'description': TEXT[start:start + rng.randint(100, 1000)],
+            'sentimentScore': score,
+            'category': categorize_emotion(score),
+            'publishedAt': published.strftime('%Y-%m-%dT%H:%M:%SZ')
+        }
+        videos.append(video)
+        accumulator.add(video)
+    analyzed_at = now.isoformat()
+    return accumulator, videos, {video['id']: analyzed_at for video in videos}, analyzed_at
+
+
+def build(mode, users, videos_per_user):
+    rng = random.Random(0)
+    now = datetime.utcnow()
+    db = {}
+    baseline = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    for i in range(users):
+        accumulator, videos, analyzed_videos, analyzed_at = simulate_user(rng, i, videos_per_user, now)
+        metrics = accumulator.to_metrics(videos)
+        if mode == 'legacy':
+            db[f'user_{i}'] = {
+                'youtube_metrics': metrics,
+                'youtube_report': generate_mental_health_report(accumulator),
+                'youtube_report_generated_at': analyzed_at,
+                'youtube_analyzed_videos': analyzed_videos,
+                'youtube_metrics_state': accumulator.to_dict()
+            }
+        else:
+            stored_metrics = compact_metrics(metrics)
+            db[f'user_{i}'] = {
+                'youtube_metrics': stored_metrics,
+                'youtube_report': StoredReport(REPORT_TEMPLATE_VERSION, mental_health_report_params(accumulator)),
+                'youtube_report_generated_at': analyzed_at,
+                'youtube_analyzed_videos': {video_id: analyzed_at for video_id in stored_metrics.videos.ids},
+                'youtube_metrics_state': PackedMetricsState.pack(accumulator)
+            }
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    scale = 1 if sys.platform == 'darwin' else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - baseline) * scale
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] in ('legacy', 'compact'):
+        print(build(sys.argv[1], int(sys.argv[2]), int(sys.argv[3])))
+        sys.exit(0)
+
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else USERS
+    videos_per_user = int(sys.argv[2]) if len(sys.argv) > 2 else VIDEOS_PER_USER
+    results = {}
+    for mode in ('legacy', 'compact'):
+        output = subprocess.run([sys.executable, __file__, mode, str(users), str(videos_per_user)],
+                                capture_output=True, text=True, check=True).stdout
+        results[mode] = int(output.strip().splitlines()[-1])
+
+    print(f"{users:,} users x {videos_per_user} videos")
+    print(f"{'representation':>16}{'total MB':>12}{'bytes/user':>14}")
+    for mode, size in results.items():
+        print(f"{mode:>16}{size / 2**20:>12,.1f}{size / users:>14,.0f}")
+    print(f"{'reduction':>16}{results['legacy'] / results['compact']:>11.1f}x")
@@ -0,0 +1,48 @@
+"""
+Throughput benchmark for the local sentiment engine.
+
+Builds large synthetic batches that look like YouTube video texts (title, description and
+comment textDisplay with HTML markup and entities) and reports texts per second for one
+batched score_texts call versus scoring the same texts one at a time.
+
+Usage: python bench_sentiment.py
+"""
+import random
+import time
+
+from sentiment import LEXICON, score_texts
+
+BATCH_SIZES = [1_000, 10_000, 100_000]
+FILLER = ['the', 'video', 'this', 'song', 'today', 'we', 'went', 'to', 'and', 'with', 'my',
+          'friends', 'official', 'music', 'live', 'full', 'episode', 'vlog', 'reaction']
+MARKUP = ['<br>', '&#39;', '&quot;', '<a href="https://www.youtube.com/watch?v=abc">0:42</a>', '<b>', '</b>']
+
+
+def synthetic_texts(count, seed=0):
+    rng = random.Random(seed)
+    vocabulary = FILLER * 4 + list(LEXICON) + ['not', 'very', 'so']
+    texts = []
+    for _ in range(count):
+        words = rng.choices(vocabulary, k=rng.randint(40, 200))
+        for _ in range(rng.randint(1, 6)):
+            words.insert(rng.randrange(len(words)), rng.choice(MARKUP))
+        texts.append(' '.join(words))
+    return texts
+
+
+def throughput(func, texts):
+    start = time.perf_counter()
+    func(texts)
+    elapsed = time.perf_counter() - start
+    return len(texts) / elapsed, elapsed
+
+
+if __name__ == '__main__':
+    print(f"{'texts':>10}{'batched texts/s':>18}{'per-text texts/s':>20}{'speedup':>10}")
+    for batch_size in BATCH_SIZES:
+        texts = synthetic_texts(batch_size)
+        batched, _ = throughput(score_texts, texts)
+        # Per-text scoring is slow, so measure it on a sample of the batch
+        sample = texts[:min(batch_size, 5_000)]
+        per_text, _ = throughput(lambda batch: [score_texts([text]) for text in batch], sample)
+        print(f"{batch_size:>10}{batched:>18,.0f}{per_text:>20,.0f}{batched / per_text:>9.1f}x")
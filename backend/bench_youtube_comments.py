@@ -0,0 +1,104 @@
+"""
+Benchmark for /api/analyze-youtube comment fetching.
+
+Starts a local fake YouTube Data API server that adds a fixed latency to every
+request, points the YouTube backend at it and times a full analysis with
+sequential (concurrency 1) and concurrent comment fetching as the number of
+liked videos grows.
+
+Usage: python bench_youtube_comments.py [latency_ms]
+"""
+import json
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import app as youtube_app
+from video_cache import VideoAnalysisCache
+
+LATENCY = float(sys.argv[1]) / 1000 if len(sys.argv) > 1 else 0.05
+VIDEO_COUNTS = [5, 10, 25, 50, 100, 200]
+CONCURRENCY_LEVELS = [1, 4, 8, 16]
+
+
+class FakeYouTubeHandler(BaseHTTPRequestHandler):
+    video_count = 50
+
+    def do_GET(self):
+        time.sleep(LATENCY)
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        published_at = (datetime.utcnow() - timedelta(days=1)).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        if url.path.endswith('/videos'):
+            page_size = int(query.get('maxResults', ['50'])[0])
+            offset = int(query.get('pageToken', ['0'])[0])
+            end = min(offset + page_size, self.video_count)
+            body = {'items': [
+                {'id': f'video{i}', 'snippet': {'title': f'Video {i}', 'description': 'A liked video', 'publishedAt': published_at}}
+                for i in range(offset, end)
+            ]}
+            if end < self.video_count:
+                body['nextPageToken'] = str(end)
+        elif url.path.endswith('/commentThreads'):
+            video_id = query.get('videoId', [''])[0]
+            body = {'items': [
+                {'snippet': {'topLevelComment': {'snippet': {'textDisplay': f'Comment {j} on {video_id}'}}}}
+                for j in range(20)
+            ]}
+        else:
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeYouTubeServer(ThreadingHTTPServer):
+    # The default listen backlog of 5 drops connections once many fetches run at once
+    request_queue_size = 128
+
+
+def run_analysis(client):
+    # Measure a cold, full analysis: no reuse from the shared video cache or a previous run
+    youtube_app.video_cache = VideoAnalysisCache()
+    start = time.perf_counter()
+    response = client.post('/api/analyze-youtube', json={'user_id': 'bench-user', 'incremental': False})
+    elapsed = time.perf_counter() - start
+    assert response.status_code == 200, response.get_json()
+    return elapsed
+
+
+if __name__ == '__main__':
+    import logging
+    logging.disable(logging.CRITICAL)
+
+    server = FakeYouTubeServer(('127.0.0.1', 0), FakeYouTubeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    youtube_app.YOUTUBE_API_BASE = f'http://127.0.0.1:{server.server_port}/youtube/v3'
+    youtube_app.mock_db['bench-user'] = {'youtube_access_token': 'fake-token'}
+    client = youtube_app.app.test_client()
+
+    print(f"Fake YouTube latency: {LATENCY * 1000:.0f} ms per request")
+    print(f"{'videos':>8}" + ''.join(f"{'c=' + str(c):>10}" for c in CONCURRENCY_LEVELS) + f"{'speedup':>10}")
+    for video_count in VIDEO_COUNTS:
+        FakeYouTubeHandler.video_count = video_count
+        timings = []
+        for concurrency in CONCURRENCY_LEVELS:
+            youtube_app.COMMENT_FETCH_CONCURRENCY = concurrency
+            timings.append(run_analysis(client))
+        row = f"{video_count:>8}" + ''.join(f"{t:>9.2f}s" for t in timings)
+        print(row + f"{timings[0] / min(timings):>9.1f}x")
+
+    server.shutdown()
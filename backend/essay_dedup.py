@@ -0,0 +1,171 @@
+"""
+Near-duplicate index for essay submissions (MinHash signatures with LSH banding).
+
+Each essay is normalised (lowercase, punctuation stripped), cut into overlapping word-pair
+shingles and summarised by a MinHash signature, whose fraction of equal slots estimates the
+Jaccard similarity of two essays' shingle sets. Signatures are split into bands; essays that
+share any band hash are candidates, so a lookup touches a handful of entries however many
+are stored. Entries are evicted least-recently-used beyond max_entries.
+"""
+import re
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+
+NUM_PERM = 64
+# 16 bands of 4 rows: a pair with similarity 0.8 shares at least one band with probability
+# 0.9998 (0.7: 0.988), so thresholds of 0.8 and up lose almost no matches to banding
+BANDS = 16
+# Word pairs: an edited word changes two shingles, so a few edits keep the similarity high
+SHINGLE_WORDS = 2
+DEFAULT_THRESHOLD = 0.8
+DEFAULT_MAX_ENTRIES = 10000
+# Shingles hashed per block, so a very long essay does not build one huge hashes x permutations matrix
+SIGNATURE_BLOCK = 4096
+
+_MERSENNE_PRIME = (1 << 31) - 1
+_NON_WORD_RE = re.compile(r"[^a-z0-9']+")
+
+
+def normalize(text):
+    return _NON_WORD_RE.sub(' ', text.lower()).strip()
+
+
+def shingles(text, size=SHINGLE_WORDS):
+    """
+    crc32 hashes of the overlapping size-word shingles of the normalised text; empty when the
+    text has no words (e.g. only punctuation or emoji).
+    """
+    words = normalize(text).split()
+    if not words:
+        return np.empty(0, dtype=np.uint64)
+    if len(words) <= size:
+        grams = [' '.join(words)]
+    else:
+        grams = [' '.join(words[i:i + size]) for i in range(len(words) - size + 1)]
+    return np.fromiter((zlib.crc32(gram.encode()) for gram in set(grams)), dtype=np.uint64)
+
+
+class EssayIndex:
+    """
+    Thread-safe MinHash/LSH index mapping essays to a stored payload (report and probability).
+    """
+
+    def __init__(self, threshold=DEFAULT_THRESHOLD, max_entries=DEFAULT_MAX_ENTRIES, num_perm=NUM_PERM, bands=BANDS, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.bands = bands
+        rng = np.random.default_rng(seed)
+        # Universal hashes (a * x + b) mod p; every product fits in 64 bits because x, a < 2^31
+        self._a = rng.integers(1, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self._band_weights = rng.integers(1, 1 << 62, num_perm // bands, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._next_id = 0
+        # id -> (signature bytes, scope, payload), oldest first
+        self._entries = OrderedDict()
+        # One dict per band: band key -> entry id, or a set of ids when several essays share it
+        self._buckets = [{} for _ in range(bands)]
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def signature(self, text):
+        """
+        MinHash signature of the text, or None for text without words, which is never matched or stored.
+        """
+        hashes = shingles(text) % np.uint64(_MERSENNE_PRIME)
+        if not len(hashes):
+            return None
+        blocks = (
+            ((np.outer(hashes[i:i + SIGNATURE_BLOCK], self._a) + self._b) % np.uint64(_MERSENNE_PRIME)).min(axis=0)
+            for i in range(0, len(hashes), SIGNATURE_BLOCK)
+        )
+        return np.minimum.reduce(list(blocks)).astype(np.uint32)
+
+    def _band_keys(self, signature):
+        # One 64-bit key per band (wrapping multiply-add of its rows); collisions only add candidates
+        rows = signature.reshape(self.bands, -1).astype(np.uint64)
+        return [int(key) for key in (rows * self._band_weights).sum(axis=1)]
+
+    def query(self, signature, scope=None):
+        """
+        Best stored entry in the same scope with estimated similarity >= threshold, as
+        (payload, similarity), or (None, best similarity seen).
+        """
+        if signature is None:
+            return None, 0.0
+        band_keys = self._band_keys(signature)
+        best_id, best = None, 0.0
+        with self._lock:
+            candidates = set()
+            for bucket, key in zip(self._buckets, band_keys):
+                ids = bucket.get(key)
+                if ids is None:
+                    continue
+                candidates.update(ids if isinstance(ids, set) else (ids,))
+            for entry_id in candidates:
+                stored, entry_scope, _ = self._entries[entry_id]
+                if entry_scope != scope:
+                    continue
+                similarity = float(np.mean(np.frombuffer(stored, dtype=np.uint32) == signature))
+                if similarity > best:
+                    best_id, best = entry_id, similarity
+            if best_id is not None and best >= self.threshold:
+                self._entries.move_to_end(best_id)
+                self.hits += 1
+                return self._entries[best_id][2], best
+            self.misses += 1
+        return None, best
+
+    def add(self, signature, payload, scope=None):
+        if signature is None:
+            return
+        band_keys = self._band_keys(signature)
+        with self._lock:
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (signature.tobytes(), scope, payload)
+            for bucket, key in zip(self._buckets, band_keys):
+                ids = bucket.get(key)
+                if ids is None:
+                    bucket[key] = entry_id
+                elif isinstance(ids, set):
+                    ids.add(entry_id)
+                else:
+                    bucket[key] = {ids, entry_id}
+            while len(self._entries) > self.max_entries:
+                self._evict()
+
+    def _evict(self):
+        # Band keys are recomputed rather than stored per entry, which keeps entries small
+        entry_id, (signature, _, _) = self._entries.popitem(last=False)
+        for bucket, key in zip(self._buckets, self._band_keys(np.frombuffer(signature, dtype=np.uint32))):
+            ids = bucket[key]
+            if isinstance(ids, set):
+                ids.discard(entry_id)
+                if len(ids) == 1:
+                    bucket[key] = ids.pop()
+            else:
+                del bucket[key]
+        self.evictions += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'maxEntries': self.max_entries,
+                'threshold': self.threshold,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else None,
+                'evictions': self.evictions
+            }
@@ -1,9 +1,17 @@
 from flask import Flask, request, jsonify
 from flask_cors import CORS
-from openai import OpenAI
 from dotenv import load_dotenv
 import os
+import re
+import time
 import logging
+from essay_dedup import DEFAULT_MAX_ENTRIES, DEFAULT_THRESHOLD, EssayIndex
+from essay_budget import estimate_tokens, fit_prompt, request_cost
+from essay_screen import DEFAULT_HIGH, DEFAULT_LOW, EssayScreen, essay_text, local_report
+from llm_cache import cache_key, llm_cache_from_env
+from llm_gateway import llm_gateway_from_env
+from llm_score import SCORE_ONLY_MAX_TOKENS, PendingReports, read_score, score_instruction
+from llm_streaming import ProbabilityWatcher, completion_deltas, event_stream_response, requested_stream_format
 
 # Set up logging
 logging.basicConfig(level=logging.DEBUG)
@@ -20,33 +28,63 @@ OPENROUTER_API_KEY = os.getenv('OPENROUTER_API_KEY')
 if not OPENROUTER_API_KEY:
     raise ValueError("OPENROUTER_API_KEY is not set in the .env file")
 
-# Initialize OpenRouter client
-client = OpenAI(
-    base_url="https://openrouter.ai/api/v1",
-    api_key=OPENROUTER_API_KEY,
+# Initialize OpenRouter client: a pooled gateway with per-model concurrency limits, retries,
+# circuit breaking and fallback models (LLM_BASE_URL can point it at a local stub server)
+client = llm_gateway_from_env()
+
+# OpenRouter settings shared by the blocking and the streamed report
+LLM_MODEL = "meta-llama/llama-3.1-8b-instruct:free"  # Updated model
+LLM_EXTRA_HEADERS = {
+    "HTTP-Referer": "http://localhost:3000",  # Replace with your site URL
+    "X-Title": "Mental Health Analysis",      # Replace with your site name
+}
+LLM_REPORT_MAX_TOKENS = 1000
+
+# Prompts estimated above this many tokens have their answers condensed locally before the call
+ESSAY_PROMPT_TOKEN_BUDGET = int(os.getenv('ESSAY_PROMPT_TOKEN_BUDGET', 2000))
+# Longer answers are condensed to the budget; this hard cap (in characters) only guards against abuse
+MAX_RESPONSE_CHARS = int(os.getenv('ESSAY_MAX_RESPONSE_CHARS', 1000000))
+# USD per million tokens for the per-request cost estimate (the :free model costs nothing)
+LLM_PROMPT_PRICE = float(os.getenv('LLM_PROMPT_PRICE_PER_MTOK', 0))
+LLM_COMPLETION_PRICE = float(os.getenv('LLM_COMPLETION_PRICE_PER_MTOK', 0))
+
+# Local pre-screen (see train_essay_screen.py): essays it is confident about are answered without the LLM
+ESSAY_SCREEN_MODEL = os.getenv('ESSAY_SCREEN_MODEL', 'essay_screen_model.npz')
+essay_screen = None
+if os.path.exists(ESSAY_SCREEN_MODEL):
+    essay_screen = EssayScreen.load(
+        ESSAY_SCREEN_MODEL,
+        low=float(os.getenv('ESSAY_SCREEN_LOW', DEFAULT_LOW)),
+        high=float(os.getenv('ESSAY_SCREEN_HIGH', DEFAULT_HIGH))
+    )
+    logger.info(f"Essay screen loaded from {ESSAY_SCREEN_MODEL} with band [{essay_screen.low}, {essay_screen.high}]")
+else:
+    logger.info(f"No essay screen model at {ESSAY_SCREEN_MODEL}; every essay goes to the LLM")
+
+# Near-duplicate resubmissions reuse the stored LLM report; ESSAY_DEDUP_SCOPE=global shares reports across users
+ESSAY_DEDUP_ENABLED = os.getenv('ESSAY_DEDUP_ENABLED', 'true').lower() == 'true'
+ESSAY_DEDUP_SCOPE = os.getenv('ESSAY_DEDUP_SCOPE', 'user')
+essay_index = EssayIndex(
+    threshold=float(os.getenv('ESSAY_DEDUP_THRESHOLD', DEFAULT_THRESHOLD)),
+    max_entries=int(os.getenv('ESSAY_DEDUP_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
 )
 
-@app.route('/api/analyze-essay', methods=['POST'])
-def analyze_essay():
-    try:
-        # Get the input data from the request
-        data = request.get_json()
-        user_id = data.get('user_id')  # For logging or authentication purposes
+# Shared LLM response cache: identical prompts are answered without an OpenRouter call
+llm_cache = llm_cache_from_env()
 
-        # Extract the user responses
-        user_responses = {
-            "Q1": data.get('Q1', ''),
-            "Q2": data.get('Q2', ''),
-            "Q3": data.get('Q3', ''),
-        }
+# Answers of score-only requests, kept so their full report can be asked for later by full_report_id
+pending_reports = PendingReports()
 
-        # Validate input
-        for key, value in user_responses.items():
-            if not value or not isinstance(value, str) or len(value.strip()) == 0:
-                return jsonify({'error': f'Missing or invalid response for {key}'}), 400
+EMPTY_REPORT_MESSAGE = (
+    "We were unable to generate a detailed report at this time due to an issue with the AI model. "
+    "We recommend reaching out to a mental health professional for a comprehensive assessment and support."
+)
 
-        # Construct the prompt for a full report
-        prompt = f"""
+def build_essay_prompt(user_responses):
+    """
+    Prompt for a full report on the user's Q1-Q3 responses.
+    """
+    return f"""
 You are an expert mental health analysis model trained to assess emotional well-being based on a person's written responses. Given the following responses, analyze them in detail and provide a comprehensive report on the user's mental health, including a probability estimate of depression.
 
 ### Instructions:
@@ -76,57 +114,297 @@ You are an expert mental health analysis model trained to assess emotional well-
 Now, perform the detailed analysis and provide a comprehensive report as a single string.
 """
 
+def build_essay_score_prompt(user_responses):
+    """
+    Prompt asking only for the depression probability of the user's Q1-Q3 responses.
+    """
+    return f"""
+You are an expert mental health analysis model. Estimate the probability of depression from the following written responses.
+
+### Example Cases for Depression Probability:
+- **Low Depression Probability (0-15%)**: Engaged in daily life, good coping strategies, stable emotions.
+- **Moderate Depression Probability (30-50%)**: Some withdrawal, reduced motivation, mild negative emotions.
+- **High Depression Probability (80-100%)**: Severe withdrawal, emotional numbness, ineffective coping, distress.
+
+### User Responses:
+- **Q1:** {user_responses["Q1"]}
+- **Q2:** {user_responses["Q2"]}
+- **Q3:** {user_responses["Q3"]}
+
+{score_instruction('Depression Probability')}
+"""
+
+def extract_depression_probability(report):
+    """
+    Read 'Depression Probability: X%' from the report, falling back to 50%.
+    """
+    probability_match = re.search(r'Depression Probability: (\d+\.?\d*)%', report)
+    if probability_match is None:
+        logger.warning("Could not extract depression probability from the report; using default value")
+        return 50.0  # Default fallback probability
+    return float(probability_match.group(1))
+
+def finish_usage(usage, llm_started, report, completion_usage=None, cache_status=None):
+    """
+    Add LLM latency, token counts (from the API's usage when it reports one, else estimated) and cost
+    to the usage built by fit_prompt, and log it. Reports served from the LLM cache cost nothing.
+    """
+    usage['llm_ms'] = round((time.perf_counter() - llm_started) * 1000, 1)
+    usage['prompt_tokens'] = getattr(completion_usage, 'prompt_tokens', None) or usage['estimated_prompt_tokens']
+    usage['completion_tokens'] = getattr(completion_usage, 'completion_tokens', None) or estimate_tokens(report)
+    usage['cost_usd'] = request_cost(usage['prompt_tokens'], usage['completion_tokens'], LLM_PROMPT_PRICE, LLM_COMPLETION_PRICE)
+    if cache_status is not None:
+        usage['cache'] = cache_status
+        if cache_status != 'miss':
+            usage['cost_usd'] = 0.0
+    logger.info(f"Essay report usage: {usage}")
+    return usage
+
+def remember_report(signature, scope, report, probability):
+    """
+    Store an LLM report for near-duplicate resubmissions. Per-user scopes never store
+    anonymous essays, so one person's report cannot be served to another.
+    """
+    if scope is None and ESSAY_DEDUP_SCOPE != 'global':
+        return
+    if signature is not None and report != EMPTY_REPORT_MESSAGE:
+        essay_index.add(signature, {'report': report, 'probability': probability}, scope)
+
+def stream_essay_report_events(prompt, user_id, usage, signature=None, scope=None):
+    """
+    Events of a streamed /api/analyze-essay: accepted at once, then report deltas as they arrive,
+    the depression probability as soon as its line is complete, and done with the whole report.
+    """
+    yield 'accepted', {'user_id': user_id}
+    llm_started = time.perf_counter()
+    watcher = ProbabilityWatcher('Depression Probability')
+    try:
+        for delta in completion_deltas(
+            client,
+            extra_headers=LLM_EXTRA_HEADERS,
+            extra_body={},
+            model=LLM_MODEL,
+            messages=[{"role": "user", "content": prompt}],
+            max_tokens=LLM_REPORT_MAX_TOKENS,
+        ):
+            yield 'report', {'delta': delta}
+            if watcher.feed(delta) is not None:
+                yield 'probability', {'probability': watcher.value}
+    except Exception as e:
+        logger.error(f"OpenRouter streaming request failed: {str(e)}")
+        yield 'error', {'error': f'OpenRouter API request failed: {str(e)}'}
+        return
+
+    report = watcher.text.strip() or EMPTY_REPORT_MESSAGE
+    probability = watcher.value if watcher.value is not None else extract_depression_probability(report)
+    remember_report(signature, scope, report, probability)
+    yield 'done', {
+        'report': report,
+        'probability': probability,
+        'usage': finish_usage(usage, llm_started, report),
+        'user_id': user_id
+    }
+
+@app.route('/api/llm-cache-stats', methods=['GET'])
+def llm_cache_stats():
+    """
+    Hit/miss/stale counters of the shared LLM response cache.
+    """
+    return jsonify(llm_cache.stats()), 200
+
+@app.route('/api/llm-gateway-stats', methods=['GET'])
+def llm_gateway_stats():
+    """
+    Per-model concurrency, queue, retry, circuit breaker and latency statistics of the LLM gateway.
+    """
+    return jsonify(client.stats()), 200
+
+@app.route('/api/essay-screen-stats', methods=['GET'])
+def essay_screen_stats():
+    """
+    How many essays the local screen answered and how many escalated to the LLM, by reason.
+    """
+    if essay_screen is None:
+        return jsonify({'enabled': False}), 200
+    return jsonify({'enabled': True, **essay_screen.stats()}), 200
+
+@app.route('/api/essay-dedup-stats', methods=['GET'])
+def essay_dedup_stats():
+    """
+    Size and hit rate of the near-duplicate essay index.
+    """
+    return jsonify({'enabled': ESSAY_DEDUP_ENABLED, **essay_index.stats()}), 200
+
+@app.route('/api/analyze-essay', methods=['POST'])
+def analyze_essay():
+    """
+    Analyze the user's Q1-Q3 responses. With "mode": "score" only the depression probability is asked for and
+    read, and the response carries a full_report_id to request the full report later. A near-duplicate of an
+    earlier submission gets its stored report back (tagged reused; "reuse": false skips this). Essays the local
+    screen is confident about (and that are not flagged) are answered at once unless "full_report" is set; the
+    rest go to the LLM. With "stream": "sse" / "ndjson" (or true, or Accept: text/event-stream) the report is
+    streamed as it is generated.
+    """
+    try:
+        # Get the input data from the request
+        data = request.get_json()
+        user_id = data.get('user_id')  # For logging or authentication purposes
+
+        # A full_report_id from a score-only response brings back its answers
+        full_report_id = data.get('full_report_id')
+        if full_report_id:
+            pending = pending_reports.get(full_report_id)
+            if pending is None:
+                return jsonify({'error': 'Unknown or expired full_report_id'}), 404
+            user_responses = pending['responses']
+            user_id = user_id or pending['user_id']
+        else:
+            # Extract the user responses
+            user_responses = {
+                "Q1": data.get('Q1', ''),
+                "Q2": data.get('Q2', ''),
+                "Q3": data.get('Q3', ''),
+            }
+
+        # Validate input
+        for key, value in user_responses.items():
+            if not value or not isinstance(value, str) or len(value.strip()) == 0:
+                return jsonify({'error': f'Missing or invalid response for {key}'}), 400
+            if len(value) > MAX_RESPONSE_CHARS:
+                return jsonify({'error': f'Response for {key} is too long: at most {MAX_RESPONSE_CHARS} characters'}), 400
+
+        stream_format = requested_stream_format(data)
+
+        # Resubmissions close enough to an earlier essay reuse its report; with per-user
+        # scopes, anonymous essays are neither matched nor stored, nor are essays without words
+        signature = scope = None
+        if ESSAY_DEDUP_ENABLED and (ESSAY_DEDUP_SCOPE == 'global' or user_id):
+            signature = essay_index.signature(essay_text(user_responses))
+            scope = None if ESSAY_DEDUP_SCOPE == 'global' else user_id
+            if signature is not None and str(data.get('reuse', True)).lower() not in ('false', '0'):
+                stored, similarity = essay_index.query(signature, scope)
+                if stored is not None:
+                    result = {**stored, 'source': 'reused', 'reused': True, 'similarity': round(similarity, 3), 'user_id': user_id}
+                    if stream_format:
+                        events = [('accepted', {'user_id': user_id}), ('probability', {'probability': stored['probability']}), ('done', result)]
+                        return event_stream_response(iter(events), stream_format)
+                    return jsonify(result), 200
+
+        # Answer confident, unflagged essays locally
+        full_report = bool(full_report_id) or str(data.get('full_report', False)).lower() in ('true', '1')
+        if essay_screen is not None and not full_report:
+            screen = essay_screen.screen(essay_text(user_responses))
+            if not screen['escalate']:
+                probability = round(screen['probability'] * 100, 1)
+                result = {
+                    'report': local_report(screen['probability']),
+                    'probability': probability,
+                    'source': 'screen',
+                    'user_id': user_id
+                }
+                if stream_format:
+                    events = [('accepted', {'user_id': user_id}), ('probability', {'probability': probability}), ('done', result)]
+                    return event_stream_response(iter(events), stream_format)
+                return jsonify(result), 200
+            logger.debug(f"Essay escalated to the LLM: {screen['reason']} (local probability {screen['probability']:.2f})")
+
+        # Score-only: a one-line answer, read only up to the probability
+        if str(data.get('mode', '')).lower() == 'score' and not full_report_id:
+            prompt, usage = fit_prompt(user_responses, build_essay_score_prompt, ESSAY_PROMPT_TOKEN_BUDGET)
+            llm_started = time.perf_counter()
+            try:
+                probability, text, usage['stopped_early'] = read_score(
+                    client, 'Depression Probability',
+                    extra_headers=LLM_EXTRA_HEADERS,
+                    extra_body={},
+                    model=LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                )
+            except Exception as api_error:
+                logger.error(f"OpenRouter API request failed: {str(api_error)}")
+                return jsonify({'error': f'OpenRouter API request failed: {str(api_error)}'}), 500
+            usage['max_tokens'] = SCORE_ONLY_MAX_TOKENS
+            finish_usage(usage, llm_started, text)
+            logger.info(f"Score-only essay: {usage['completion_tokens']} completion tokens instead of up to {LLM_REPORT_MAX_TOKENS}")
+            if probability is None:
+                probability = extract_depression_probability(text)
+            result = {
+                'probability': probability,
+                'source': 'llm_score',
+                'full_report_id': pending_reports.put({'responses': user_responses, 'user_id': user_id}),
+                'usage': usage,
+                'user_id': user_id
+            }
+            if stream_format:
+                events = [('accepted', {'user_id': user_id}), ('probability', {'probability': probability}), ('done', result)]
+                return event_stream_response(iter(events), stream_format)
+            return jsonify(result), 200
+
+        # Fit the prompt to the token budget, condensing long answers
+        started = time.perf_counter()
+        prompt, usage = fit_prompt(user_responses, build_essay_prompt, ESSAY_PROMPT_TOKEN_BUDGET)
+        usage['condense_ms'] = round((time.perf_counter() - started) * 1000, 1)
+        if usage['condensed']:
+            logger.info(f"Condensed {usage['condensed']}: ~{usage['original_prompt_tokens']} -> ~{usage['estimated_prompt_tokens']} prompt tokens")
+
+        # Stream the report instead of waiting for the whole completion
+        if stream_format:
+            return event_stream_response(stream_essay_report_events(prompt, user_id, usage, signature, scope), stream_format)
+
         # Make the request to OpenRouter
         logger.debug("Making request to OpenRouter API...")
-        try:
+        llm_started = time.perf_counter()
+        messages = [
+            {"role": "user", "content": prompt}
+        ]
+        completion_usage = []
+
+        def request_report():
             completion = client.chat.completions.create(
-                extra_headers={
-                    "HTTP-Referer": "http://localhost:3000",  # Replace with your site URL
-                    "X-Title": "Mental Health Analysis",      # Replace with your site name
-                },
+                extra_headers=LLM_EXTRA_HEADERS,
                 extra_body={},
-                model="meta-llama/llama-3.1-8b-instruct:free",  # Updated model
-                messages=[
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=1000,
+                model=LLM_MODEL,
+                messages=messages,
+                max_tokens=LLM_REPORT_MAX_TOKENS,
             )
+
+            # Log the raw response for debugging
+            logger.debug(f"OpenRouter API raw response: {completion}")
+
+            # Check if completion is valid
+            if not completion or not hasattr(completion, 'choices') or not completion.choices:
+                raise ValueError("OpenRouter API returned an invalid response: No choices found")
+            if not getattr(completion.choices[0].message, 'content', None):
+                raise ValueError("OpenRouter API returned an invalid response: No content in the message")
+            completion_usage.append(getattr(completion, 'usage', None))
+            # The LLM gateway may have answered with a fallback model
+            usage['model'] = getattr(completion, 'served_model', LLM_MODEL)
+            return completion.choices[0].message.content.strip()
+
+        # Identical prompts answered before come from the LLM cache (or, if OpenRouter fails, a stale entry)
+        try:
+            report, cache_status = llm_cache.fetch(cache_key(LLM_MODEL, messages, max_tokens=LLM_REPORT_MAX_TOKENS), request_report)
         except Exception as api_error:
             logger.error(f"OpenRouter API request failed: {str(api_error)}")
             return jsonify({'error': f'OpenRouter API request failed: {str(api_error)}'}), 500
 
-        # Log the raw response for debugging
-        logger.debug(f"OpenRouter API raw response: {completion}")
-
-        # Check if completion is valid
-        if not completion or not hasattr(completion, 'choices') or not completion.choices:
-            logger.error("OpenRouter API returned an invalid response: No choices found")
-            return jsonify({'error': 'OpenRouter API returned an invalid response: No choices found'}), 500
-
         # Extract the report
-        report = completion.choices[0].message.content.strip()
         if not report:
             logger.warning("LLM report is empty; returning default message")
-            report = (
-                "We were unable to generate a detailed report at this time due to an issue with the AI model. "
-                "We recommend reaching out to a mental health professional for a comprehensive assessment and support."
-            )
+            report = EMPTY_REPORT_MESSAGE
 
         logger.debug(f"LLM Report: {report}")
 
         # Extract the probability from the report
-        import re
-        probability_match = re.search(r'Depression Probability: (\d+\.?\d*)%', report)
-        probability = float(probability_match.group(1)) if probability_match else None
-
-        if probability is None:
-            logger.warning("Could not extract depression probability from the report; using default value")
-            probability = 50.0  # Default fallback probability
+        probability = extract_depression_probability(report)
+        remember_report(signature, scope, report, probability)
 
         # Prepare the response
         result = {
             'report': report,
             'probability': probability,
+            'source': 'llm',
+            'usage': finish_usage(usage, llm_started, report, completion_usage[0] if completion_usage else None, cache_status),
             'user_id': user_id
         }
 
@@ -0,0 +1,180 @@
+"""
+Google API client layer for the YouTube backend.
+
+All calls go through one pooled requests.Session with gzip-friendly headers. GET requests
+remember the ETag of every resource they fetch and send If-None-Match on the next request,
+so unchanged resources come back as an empty 304 and are served from the stored body. The
+stored bodies are bounded by count and by total bytes, evicting least recently used first.
+Every request reports how many bytes it transferred and how many it saved.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Google only serves gzip to clients whose User-Agent contains "gzip"
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip',
+    'User-Agent': 'mind-sync-youtube-backend (gzip)'
+}
+
+# Default budget for the response bodies kept for ETag revalidation
+DEFAULT_MAX_ETAG_BYTES = 32 * 1024 * 1024
+
+# Timeout for calls made without a deadline
+DEFAULT_TIMEOUT = 10
+
+# fields= projections: ask only for what the analysis reads
+LIKED_VIDEOS_FIELDS = 'nextPageToken,items(id,snippet(title,description,publishedAt))'
+COMMENT_THREADS_FIELDS = 'items(snippet(topLevelComment(snippet(textDisplay))))'
+
+
+class Deadline:
+    """
+    Overall time budget shared by every outbound call made for one request.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.started = time.monotonic()
+        self.expires_at = self.started + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0.0)
+
+    def expired(self):
+        return time.monotonic() >= self.expires_at
+
+    def request_timeout(self):
+        # requests rejects a zero timeout, so an expired deadline still gets a minimal one
+        return max(self.remaining(), 0.001)
+
+    def elapsed(self):
+        return time.monotonic() - self.started
+
+
+class ApiResponse:
+    """
+    Response returned by GoogleAPIClient. A 304 is surfaced as a 200 with from_cache=True
+    and the stored body, so callers handle both the same way.
+    """
+
+    def __init__(self, status_code, content, from_cache=False, bytes_received=0, bytes_saved=0):
+        self.status_code = status_code
+        self.content = content
+        self.from_cache = from_cache
+        self.bytes_received = bytes_received
+        self.bytes_saved = bytes_saved
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8', errors='replace')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class GoogleAPIClient:
+    """
+    Pooled HTTP client with per-resource ETag caching and transfer accounting.
+    """
+
+    def __init__(self, pool_size=32, max_etags=10000, max_etag_bytes=DEFAULT_MAX_ETAG_BYTES):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update(DEFAULT_HEADERS)
+        self.max_etags = max_etags
+        self.max_etag_bytes = max_etag_bytes
+        self._etags = OrderedDict()
+        self._etag_bytes = 0
+        self._lock = threading.Lock()
+        self.totals = {'requests': 0, 'notModified': 0, 'bytesReceived': 0, 'bytesSaved': 0}
+
+    @staticmethod
+    def _resource_key(url, params, headers):
+        # Responses are per user, so the Authorization header is part of the resource identity
+        authorization = (headers or {}).get('Authorization', '')
+        raw = json.dumps([url, sorted((params or {}).items()), authorization], default=str)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    @staticmethod
+    def _wire_bytes(response):
+        # Bytes read off the socket (compressed size when gzip was used)
+        try:
+            return response.raw.tell()
+        except Exception:
+            return int(response.headers.get('Content-Length') or len(response.content))
+
+    def _record(self, method, url, response, bytes_received, bytes_saved, not_modified=False):
+        with self._lock:
+            self.totals['requests'] += 1
+            self.totals['notModified'] += int(not_modified)
+            self.totals['bytesReceived'] += bytes_received
+            self.totals['bytesSaved'] += bytes_saved
+        logging.debug(
+            f"{method} {url} -> {response.status_code}{' (not modified)' if not_modified else ''}: "
+            f"{bytes_received} bytes received, {bytes_saved} bytes saved"
+        )
+
+    def get(self, url, params=None, headers=None, fields=None, timeout=DEFAULT_TIMEOUT):
+        """
+        Conditional GET. fields is sent as the fields= projection when given.
+        """
+        params = dict(params or {})
+        if fields:
+            params['fields'] = fields
+        key = self._resource_key(url, params, headers)
+        request_headers = dict(headers or {})
+        with self._lock:
+            cached = self._etags.get(key)
+        if cached:
+            request_headers['If-None-Match'] = cached[0]
+
+        response = self.session.get(url, params=params, headers=request_headers, timeout=timeout)
+        bytes_received = self._wire_bytes(response)
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                if key in self._etags:
+                    self._etags.move_to_end(key)
+            bytes_saved = len(cached[1])
+            self._record('GET', url, response, bytes_received, bytes_saved, not_modified=True)
+            return ApiResponse(200, cached[1], from_cache=True, bytes_received=bytes_received, bytes_saved=bytes_saved)
+
+        content = response.content
+        etag = response.headers.get('ETag')
+        if response.status_code == 200 and etag and len(content) <= self.max_etag_bytes:
+            with self._lock:
+                previous = self._etags.pop(key, None)
+                if previous:
+                    self._etag_bytes -= len(previous[1])
+                self._etags[key] = (etag, content)
+                self._etag_bytes += len(content)
+                while len(self._etags) > self.max_etags or self._etag_bytes > self.max_etag_bytes:
+                    self._etag_bytes -= len(self._etags.popitem(last=False)[1][1])
+
+        bytes_saved = max(len(content) - bytes_received, 0)
+        self._record('GET', url, response, bytes_received, bytes_saved)
+        return ApiResponse(response.status_code, content, bytes_received=bytes_received, bytes_saved=bytes_saved)
+
+    def post(self, url, data=None, headers=None, timeout=DEFAULT_TIMEOUT):
+        """
+        POST over the pooled session (used for the OAuth token exchange).
+        """
+        response = self.session.post(url, data=data, headers=headers, timeout=timeout)
+        content = response.content
+        bytes_received = self._wire_bytes(response)
+        bytes_saved = max(len(content) - bytes_received, 0)
+        self._record('POST', url, response, bytes_received, bytes_saved)
+        return ApiResponse(response.status_code, content, bytes_received=bytes_received, bytes_saved=bytes_saved)
+
+    def stats(self):
+        with self._lock:
+            return {**self.totals, 'storedETags': len(self._etags), 'storedETagBytes': self._etag_bytes}
@@ -0,0 +1,98 @@
+"""
+Incremental delivery of LLM reports as Server-Sent Events or NDJSON.
+
+The OpenRouter completion is requested with stream=True and every content delta is forwarded
+as soon as it arrives. A ProbabilityWatcher scans the text as it accumulates, so the
+'<label>: X%' line becomes its own event the moment it is complete instead of after the
+whole report has been generated.
+"""
+import json
+import re
+
+from flask import Response, request
+
+STREAM_FORMATS = ('sse', 'ndjson')
+
+
+class ProbabilityWatcher:
+    """
+    Finds '<label>: X%' in text that arrives in arbitrary fragments.
+    """
+
+    def __init__(self, label):
+        self.pattern = re.compile(re.escape(label) + r': (\d+\.?\d*)%')
+        self.value = None
+        self._parts = []
+        # Text of the unfinished last line: the only place a match can still complete
+        self._tail = ''
+
+    def feed(self, delta):
+        """
+        Add a fragment; returns the probability the first time its line is complete, otherwise None.
+        """
+        self._parts.append(delta)
+        if self.value is not None:
+            return None
+        self._tail += delta
+        match = self.pattern.search(self._tail)
+        if match:
+            self.value = float(match.group(1))
+            return self.value
+        self._tail = self._tail[self._tail.rfind('\n') + 1:]
+        return None
+
+    @property
+    def text(self):
+        return ''.join(self._parts)
+
+
+def completion_deltas(client, **kwargs):
+    """
+    Content fragments of a streamed chat completion, in order.
+    """
+    stream = client.chat.completions.create(stream=True, **kwargs)
+    try:
+        for chunk in stream:
+            # Role-only and final chunks carry no content (the final one has an empty delta)
+            content = getattr(chunk.choices[0].delta, 'content', None) if chunk.choices else None
+            if content:
+                yield content
+    finally:
+        # Closing the response when the caller stops early stops reading the rest of the completion
+        close = getattr(stream, 'close', None)
+        if close is not None:
+            close()
+
+
+def requested_stream_format(data):
+    """
+    'sse', 'ndjson' or None (a normal JSON response). Taken from the body's stream field or
+    ?stream= (true means SSE), or an Accept: text/event-stream header.
+    """
+    stream = (data or {}).get('stream', request.args.get('stream'))
+    if stream is None:
+        return 'sse' if request.accept_mimetypes.best == 'text/event-stream' else None
+    stream = str(stream).lower()
+    if stream in STREAM_FORMATS:
+        return stream
+    return 'sse' if stream in ('true', '1') else None
+
+
+def format_event(stream_format, event, data):
+    if stream_format == 'sse':
+        return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+    return json.dumps({'event': event, **data}) + '\n'
+
+
+def event_stream_response(events, stream_format):
+    """
+    Stream (event, data) pairs to the client, each flushed as soon as it is produced.
+    """
+    response = Response(
+        (format_event(stream_format, event, data) for event, data in events),
+        mimetype='text/event-stream' if stream_format == 'sse' else 'application/x-ndjson'
+    )
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stops nginx-style proxies from buffering the whole stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,172 @@
+"""
+Local OpenAI-compatible chat-completions server for exercising the LLM gateway offline.
+
+POST /v1/chat/completions (also /api/v1/chat/completions) answers with a canned completion
+that contains every '<label>: X%' line the services parse, streamed as server-sent events when
+the request asks for stream=True. Latency, an error rate, per-model outages and rate limiting
+can be configured to reproduce a slow or failing upstream. The server speaks HTTP/1.1 with
+keep-alive and counts connections, requests and peak concurrency per model.
+
+Usage: python llm_stub_server.py [--port 8099] [--latency 0.2] [--error-rate 0.1] [--down MODEL ...]
+then run a service with LLM_BASE_URL=http://127.0.0.1:8099/v1.
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPORT = ("Academic Stress Probability: 42%\n"
+          "Depression Probability: 42%\n"
+          "This is a stub report from the local LLM server. The answers suggest moderate stress; "
+          "regular sleep, breaks and talking to someone you trust can help.")
+
+
+class StubState:
+    """
+    Behaviour and counters of a stub server, shared by its handler threads.
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, down_models=(), rate_limited_models=(), seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.down_models = set(down_models)
+        self.rate_limited_models = set(rate_limited_models)
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = {}
+        self.in_flight = {}
+        self.peak_in_flight = {}
+
+    def start(self, model):
+        with self.lock:
+            self.requests[model] = self.requests.get(model, 0) + 1
+            self.in_flight[model] = self.in_flight.get(model, 0) + 1
+            self.peak_in_flight[model] = max(self.peak_in_flight.get(model, 0), self.in_flight[model])
+            return self.random.random() < self.error_rate
+
+    def finish(self, model):
+        with self.lock:
+            self.in_flight[model] -= 1
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately; without TCP_NODELAY delayed ACKs add ~40 ms per response
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        with self.server.state.lock:
+            self.server.state.connections += 1
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        if self.path.rstrip('/') not in ('/v1/chat/completions', '/api/v1/chat/completions'):
+            self._send_json(404, {'error': {'code': 404, 'message': f'Unknown path {self.path}'}})
+            return
+        state = self.server.state
+        model = body.get('model', '')
+        failing = state.start(model)
+        try:
+            time.sleep(state.latency)
+            if model in state.down_models or failing:
+                self._send_json(503, {'error': {'code': 503, 'message': f'{model} is unavailable'}})
+            elif model in state.rate_limited_models:
+                self._send_json(429, {'error': {'code': 429, 'message': 'Rate limited'}}, {'Retry-After': '1'})
+            elif body.get('stream'):
+                self._stream(model, body)
+            else:
+                self._send_json(200, self._completion(model, body))
+        finally:
+            state.finish(model)
+
+    @staticmethod
+    def _text(body):
+        max_tokens = body.get('max_tokens') or 1000
+        return ' '.join(REPORT.split(' ')[:max_tokens * 3 // 4 or 1])
+
+    def _completion(self, model, body):
+        text = self._text(body)
+        prompt_tokens = sum(len(str(message.get('content', '')).split()) for message in body.get('messages', []))
+        return {
+            'id': 'stub-completion',
+            'object': 'chat.completion',
+            'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': text}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': len(text.split()),
+                      'total_tokens': prompt_tokens + len(text.split())}
+        }
+
+    def _stream(self, model, body):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        words = self._text(body).split(' ')
+        try:
+            for i, word in enumerate(words):
+                chunk = {'model': model, 'choices': [{'index': 0, 'delta': {'content': word if i == 0 else ' ' + word}}]}
+                self._write_chunk(f"data: {json.dumps(chunk)}\n\n")
+            # Like OpenAI-compatible upstreams, the last chunk has an empty delta and the finish reason
+            final = {'model': model, 'choices': [{'index': 0, 'delta': {}, 'finish_reason': 'stop'}]}
+            self._write_chunk(f"data: {json.dumps(final)}\n\n")
+            self._write_chunk("data: [DONE]\n\n")
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            # The client stopped reading early (e.g. a score-only request)
+            self.close_connection = True
+
+    def _write_chunk(self, text):
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b'\r\n')
+        self.wfile.flush()
+
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for a burst of new connections; the default backlog of 5 turns bursts into SYN retries
+    request_queue_size = 128
+
+
+def start_stub_server(port=0, **behaviour):
+    """
+    Serve in a daemon thread; returns (server, base_url). server.state holds the behaviour and
+    counters, server.shutdown() stops it.
+    """
+    server = StubServer(('127.0.0.1', port), StubHandler)
+    server.state = StubState(**behaviour)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8099)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before every response')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with 503')
+    parser.add_argument('--down', nargs='*', default=[], help='models that always answer 503')
+    parser.add_argument('--rate-limited', nargs='*', default=[], help='models that always answer 429')
+    args = parser.parse_args()
+    server, base_url = start_stub_server(args.port, latency=args.latency, error_rate=args.error_rate,
+                                         down_models=args.down, rate_limited_models=args.rate_limited)
+    print(f"Stub LLM server at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
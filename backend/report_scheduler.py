@@ -0,0 +1,179 @@
+"""
+Background refresh of YouTube reports for recently active users.
+
+Users who load their dashboard would otherwise wait for a live analysis. The scheduler
+periodically ranks connected, recently active users by how stale their report is, weighted
+by how often they have been active lately, and refreshes the top of that queue in the
+background with a bounded number of analyses in flight. Outside the off-peak hours only
+reports that are much staler are refreshed, so most of the work lands off-peak.
+"""
+import heapq
+import logging
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+def parse_hour_ranges(spec):
+    """
+    Parse "1-6,22-24" into the set of hours {1..5, 22, 23}. Ranges are [start, end).
+    """
+    hours = set()
+    for part in (spec or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition('-')
+        start = int(start)
+        end = int(end) if end else start + 1
+        if not 0 <= start <= 24 or not 0 <= end <= 24:
+            raise ValueError(f"Invalid hour range: {part}")
+        hours.update(range(start, end) if start <= end else [*range(start, 24), *range(0, end)])
+    return hours
+
+
+class ReportRefreshScheduler:
+    """
+    Priority queue of report refreshes, ordered by staleness x activity.
+
+    refresh(user_id) runs one background analysis and returns True on success.
+    candidates() yields (user_id, report_generated_at) for every user with a stored token,
+    where report_generated_at is a datetime or None if the user has no report yet.
+    """
+
+    def __init__(self, refresh, candidates, max_concurrency=2, interval=60, min_age=3600,
+                 peak_min_age=6 * 3600, active_window=7 * 86400, activity_half_life=86400,
+                 off_peak_hours=frozenset(range(1, 6)), clock=time.time):
+        self.refresh = refresh
+        self.candidates = candidates
+        self.max_concurrency = max_concurrency
+        self.interval = interval
+        self.min_age = min_age
+        self.peak_min_age = peak_min_age
+        self.active_window = active_window
+        self.activity_half_life = activity_half_life
+        self.off_peak_hours = frozenset(off_peak_hours)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._activity = {}
+        self._backoff = {}
+        self._in_flight = set()
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='report-refresh')
+        self._stop = threading.Event()
+        self._thread = None
+        self.counters = {'refreshed': 0, 'failed': 0, 'runs': 0, 'lastQueued': 0}
+
+    def record_activity(self, user_id):
+        """
+        Note that a user used the service; activity decays with activity_half_life.
+        """
+        now = self._clock()
+        with self._lock:
+            last_seen, score = self._activity.get(user_id, (now, 0.0))
+            score = score * math.pow(0.5, (now - last_seen) / self.activity_half_life) + 1.0
+            self._activity[user_id] = (now, score)
+            # A user who comes back gets another chance after failed refreshes
+            self._backoff.pop(user_id, None)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._activity.pop(user_id, None)
+            self._backoff.pop(user_id, None)
+
+    def is_off_peak(self, now=None):
+        return datetime.fromtimestamp(self._clock() if now is None else now, timezone.utc).hour in self.off_peak_hours
+
+    def plan(self, now=None):
+        """
+        Return the user IDs due for a refresh, most urgent first.
+        """
+        now = self._clock() if now is None else now
+        min_age = self.min_age if self.is_off_peak(now) else self.peak_min_age
+        with self._lock:
+            activity = dict(self._activity)
+            backoff = dict(self._backoff)
+            in_flight = set(self._in_flight)
+
+        queue = []
+        for user_id, generated_at in self.candidates():
+            seen = activity.get(user_id)
+            if seen is None or now - seen[0] > self.active_window or user_id in in_flight:
+                continue
+            if user_id in backoff and backoff[user_id][0] > now:
+                continue
+            staleness = now - generated_at.timestamp() if generated_at else self.active_window
+            if staleness < min_age:
+                continue
+            weight = seen[1] * math.pow(0.5, (now - seen[0]) / self.activity_half_life)
+            heapq.heappush(queue, (-staleness * (1.0 + weight), user_id))
+        return [heapq.heappop(queue)[1] for _ in range(len(queue))]
+
+    def _run(self, user_id):
+        try:
+            succeeded = self.refresh(user_id)
+        except Exception as e:
+            logging.error(f"Background report refresh failed for user {user_id}: {e}")
+            succeeded = False
+        with self._lock:
+            self._in_flight.discard(user_id)
+            if succeeded:
+                self.counters['refreshed'] += 1
+                self._backoff.pop(user_id, None)
+            else:
+                # Exponential backoff, capped at one day
+                self.counters['failed'] += 1
+                failures = self._backoff.get(user_id, (0, 0))[1] + 1
+                delay = min(self.interval * 2 ** failures, 86400)
+                self._backoff[user_id] = (self._clock() + delay, failures)
+
+    def run_once(self):
+        """
+        Plan and start as many refreshes as the concurrency cap allows.
+        """
+        queue = self.plan()
+        started = 0
+        with self._lock:
+            self.counters['runs'] += 1
+            self.counters['lastQueued'] = len(queue)
+            for user_id in queue:
+                if len(self._in_flight) >= self.max_concurrency:
+                    break
+                self._in_flight.add(user_id)
+                self._executor.submit(self._run, user_id)
+                started += 1
+        if started:
+            logging.debug(f"Started {started} background report refreshes, {len(queue) - started} still queued")
+        return started
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_once()
+            except Exception as e:
+                logging.error(f"Report refresh scheduler run failed: {e}")
+
+    def start(self):
+        """
+        Start the scheduling thread; later calls do nothing.
+        """
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._loop, name='report-refresh-scheduler', daemon=True)
+                self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self.counters,
+                'inFlight': len(self._in_flight),
+                'activeUsers': len(self._activity),
+                'backingOff': len(self._backoff),
+                'maxConcurrency': self.max_concurrency,
+                'offPeak': self.is_off_peak()
+            }
@@ -0,0 +1,214 @@
+"""
+Compact per-user storage for YouTube analysis results.
+
+mock_db keeps one result per user, so its footprint is users x liked videos. Instead of a
+list of video dicts, a report string and the accumulator state as nested dicts, each user
+stores:
+
+- a VideoTable: column arrays for scores, interned category codes and publish times, with
+  interned video IDs and descriptions truncated to DESCRIPTION_MAX_CHARS
+- a StoredReport: the report template version and its parameters, rendered on read
+- a PackedMetricsState: the accumulator's daily buckets as one flat array
+
+Apart from the truncated descriptions, everything expands back to the payloads the API
+returned before.
+"""
+import sys
+from array import array
+from datetime import datetime, timezone
+
+from youtube_metrics import CATEGORIES, MetricsAccumulator
+
+CATEGORY_CODES = {category: code for code, category in enumerate(CATEGORIES)}
+
+# Longest description prefix kept per stored video
+DESCRIPTION_MAX_CHARS = 160
+
+PUBLISHED_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+SUMMARY_KEYS = ('sadCount', 'happyCount', 'energeticCount', 'calmCount', 'totalVideos', 'averageSentimentScore')
+SERIES_KEYS = ('sentimentOverTime', 'sentimentByWeek', 'sentimentByMonth')
+
+
+class VideoTable:
+    """
+    Column-oriented list of scored videos ({'id', 'title', 'description', 'sentimentScore',
+    'category', 'publishedAt'}). Indexing and slicing return video dicts.
+    """
+    __slots__ = ('ids', 'titles', 'descriptions', 'scores', 'categories', 'published', 'irregular_published')
+
+    def __init__(self):
+        self.ids = []
+        self.titles = []
+        self.descriptions = []
+        self.scores = array('d')
+        self.categories = array('B')
+        self.published = array('q')
+        # publishedAt values that do not round-trip through PUBLISHED_FORMAT, by row
+        self.irregular_published = None
+
+    @classmethod
+    def from_videos(cls, videos, description_chars=DESCRIPTION_MAX_CHARS):
+        """
+        Raises KeyError or ValueError if a video does not have the scored-video shape.
+        """
+        table = cls()
+        for video in videos:
+            table.append(video, description_chars)
+        return table
+
+    def append(self, video, description_chars=DESCRIPTION_MAX_CHARS):
+        category = CATEGORY_CODES[video['category']]
+        score = float(video['sentimentScore'])
+        published_at = video['publishedAt']
+        try:
+            # Equivalent to strptime(PUBLISHED_FORMAT) for 'YYYY-MM-DDTHH:MM:SSZ', but much faster
+            if len(published_at) != 20 or published_at[-1] != 'Z':
+                raise ValueError(published_at)
+            timestamp = int(datetime.fromisoformat(published_at[:-1]).replace(tzinfo=timezone.utc).timestamp())
+        except (TypeError, ValueError):
+            timestamp = -1
+            if self.irregular_published is None:
+                self.irregular_published = {}
+            self.irregular_published[len(self.ids)] = published_at
+
+        self.ids.append(sys.intern(video['id']))
+        self.titles.append(video.get('title', ''))
+        self.descriptions.append((video.get('description') or '')[:description_chars])
+        self.scores.append(score)
+        self.categories.append(category)
+        self.published.append(timestamp)
+
+    def _published_at(self, index):
+        if self.irregular_published and index in self.irregular_published:
+            return self.irregular_published[index]
+        return datetime.fromtimestamp(self.published[index], timezone.utc).strftime(PUBLISHED_FORMAT)
+
+    def _row(self, index):
+        return {
+            'id': self.ids[index],
+            'title': self.titles[index],
+            'description': self.descriptions[index],
+            'sentimentScore': self.scores[index],
+            'category': CATEGORIES[self.categories[index]],
+            'publishedAt': self._published_at(index)
+        }
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._row(i) for i in range(*index.indices(len(self.ids)))]
+        if index < 0:
+            index += len(self.ids)
+        return self._row(index)
+
+    def __iter__(self):
+        return (self._row(i) for i in range(len(self.ids)))
+
+
+class CompactMetrics:
+    """
+    Stored form of the metrics payload built by MetricsAccumulator.to_metrics().
+    get() mirrors dict.get() on the expanded payload, with 'videos' returning the VideoTable.
+    """
+    __slots__ = ('summary', 'series', 'videos')
+
+    def __init__(self, summary, series, videos):
+        self.summary = summary
+        self.series = series
+        self.videos = videos
+
+    @classmethod
+    def from_metrics(cls, metrics):
+        summary = tuple(metrics[key] for key in SUMMARY_KEYS)
+        series = tuple(
+            tuple((sys.intern(point['date']), point['score']) for point in metrics.get(key) or ())
+            for key in SERIES_KEYS
+        )
+        return cls(summary, series, VideoTable.from_videos(metrics.get('videos') or []))
+
+    def get(self, key, default=None):
+        if key == 'videos':
+            return self.videos
+        if key in SUMMARY_KEYS:
+            return self.summary[SUMMARY_KEYS.index(key)]
+        if key in SERIES_KEYS:
+            return [{'date': day, 'score': score} for day, score in self.series[SERIES_KEYS.index(key)]]
+        return default
+
+    def to_dict(self):
+        metrics = dict(zip(SUMMARY_KEYS, self.summary))
+        metrics['videos'] = self.videos[:]
+        metrics.update((key, self.get(key)) for key in SERIES_KEYS)
+        return metrics
+
+
+def compact_metrics(metrics):
+    """
+    Convert a metrics payload to CompactMetrics. Payloads that do not have the analysis
+    shape (e.g. saved by an older client) are kept as they are.
+    """
+    if metrics is None:
+        return None
+    try:
+        return CompactMetrics.from_metrics(metrics)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return metrics
+
+
+class StoredReport:
+    """
+    A report kept as a template version plus its parameters and rendered on read.
+    Reports supplied as text (e.g. through /api/save-youtube-report) are kept verbatim.
+    """
+    __slots__ = ('template', 'params', 'text')
+
+    def __init__(self, template=None, params=(), text=None):
+        self.template = template
+        self.params = params
+        self.text = text
+
+    @classmethod
+    def from_text(cls, text):
+        return cls(text=text)
+
+    def render(self, templates):
+        if self.text is not None:
+            return self.text
+        return templates[self.template](*self.params)
+
+
+class PackedMetricsState:
+    """
+    MetricsAccumulator state packed into one array: per day its count, score sum and
+    per-category counts. Weekly/monthly rollups and totals are rebuilt from the days.
+    """
+    __slots__ = ('days', 'values')
+
+    ROW_SIZE = 2 + len(CATEGORIES)
+
+    def __init__(self, days, values):
+        self.days = days
+        self.values = values
+
+    @classmethod
+    def pack(cls, accumulator):
+        days = []
+        values = array('d')
+        for day, count, score, category_counts in accumulator.to_rows():
+            days.append(sys.intern(day))
+            values.append(count)
+            values.append(score)
+            values.extend(category_counts)
+        return cls(tuple(days), values)
+
+    def unpack(self):
+        size = self.ROW_SIZE
+        rows = (
+            (day, int(self.values[i * size]), self.values[i * size + 1],
+             [int(count) for count in self.values[i * size + 2:(i + 1) * size]])
+            for i, day in enumerate(self.days)
+        )
+        return MetricsAccumulator.from_rows(rows)
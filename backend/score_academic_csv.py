@@ -0,0 +1,113 @@
+"""
+Offline bulk scorer for the academic depression-risk model.
+
+Reads a CSV with the FEATURES columns in chunks, scores each chunk in a worker process with
+one predict_proba call and writes the input rows plus prediction, probability and error
+columns, in input order. With --report an LLM report is generated per scored row, which
+requires OPENROUTER_API_KEY and is one API call per row.
+
+Usage: python score_academic_csv.py students.csv scored.csv [--chunk-size 10000] [--workers 4]
+"""
+import argparse
+import logging
+import os
+import sys
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import pandas as pd
+
+from academic_scoring import FEATURES, encode_frame, score_encoded, prediction_label, INVALID_INPUT_ERROR
+
+_model = None
+_with_report = False
+
+
+def _init_worker(model_path, with_report):
+    global _model, _with_report
+    _model = joblib.load(model_path)
+    _with_report = with_report
+
+
+def score_chunk(chunk):
+    """
+    Score one DataFrame chunk. Rows with missing or non-numeric features get an error instead.
+    """
+    missing = [feature for feature in FEATURES if feature not in chunk.columns]
+    if missing:
+        raise ValueError(f"Missing feature column: {missing[0]}")
+
+    encoded, valid = encode_frame(chunk)
+    predictions, probabilities = score_encoded(_model, encoded[valid])
+    chunk = chunk.copy()
+    chunk['prediction'] = None
+    chunk['probability'] = None
+    chunk['error'] = None
+    chunk.loc[valid, 'prediction'] = [prediction_label(p) for p in predictions]
+    chunk.loc[valid, 'probability'] = probabilities
+    chunk.loc[~valid, 'error'] = INVALID_INPUT_ERROR
+
+    if _with_report:
+        # Imported lazily: the service module needs OPENROUTER_API_KEY and sets up its client on import
+        from academic_model import generate_llm_report, extract_academic_stress_probability
+        reports, stress = [], []
+        for (_, row), is_valid in zip(chunk.iterrows(), valid):
+            if not is_valid:
+                reports.append(None)
+                stress.append(None)
+                continue
+            report = generate_llm_report({feature: row[feature] for feature in FEATURES}, row['prediction'], row['probability'])
+            reports.append(report)
+            stress.append(None if "Error generating LLM report" in report
+                          else extract_academic_stress_probability(report, row['probability']))
+        chunk['llm_report'] = reports
+        chunk['academic_stress_probability'] = stress
+    return chunk
+
+
+def score_csv(input_path, output_path, model_path, chunk_size, workers, with_report=False):
+    """
+    Score input_path into output_path; returns the number of rows written.
+    At most two chunks per worker are in flight, so memory stays bounded for any file size.
+    """
+    rows = 0
+    pending = deque()
+    output = sys.stdout if output_path == '-' else open(output_path, 'w', newline='')
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_path, with_report)) as executor:
+            def write_next():
+                nonlocal rows
+                scored = pending.popleft().result()
+                scored.to_csv(output, header=rows == 0, index=False)
+                rows += len(scored)
+
+            for chunk in pd.read_csv(input_path, chunksize=chunk_size):
+                pending.append(executor.submit(score_chunk, chunk))
+                if len(pending) >= 2 * workers:
+                    write_next()
+            while pending:
+                write_next()
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score a CSV of students with the academic depression-risk model.")
+    parser.add_argument('input', help="input CSV with the model's feature columns")
+    parser.add_argument('output', help="output CSV, or - for stdout")
+    parser.add_argument('--model', default='catboost_depression_model.pkl', help="path to the CatBoost model")
+    parser.add_argument('--chunk-size', type=int, default=10000, help="rows per predict_proba call")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument('--report', action='store_true', help="also generate an LLM report per row (slow)")
+    args = parser.parse_args(argv)
+
+    rows = score_csv(args.input, args.output, args.model, args.chunk_size, args.workers, args.report)
+    logging.info(f"Scored {rows} rows from {args.input}")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
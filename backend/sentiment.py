@@ -0,0 +1,164 @@
+"""
+Local, offline sentiment engine for the YouTube backend.
+
+Texts are scored in batches against a precompiled valence lexicon. A whole batch is
+cleaned and tokenized as a single string, tokens are mapped to vocabulary indices in one
+C-level pass, and per-text scores are reduced with NumPy (np.bincount acts as a sparse
+document-term matrix times the valence vector), so there is no per-text Python loop.
+"""
+import html
+import os
+import re
+from itertools import repeat
+
+import numpy as np
+
+# Valence lexicon: word -> score in [-4, 4]
+LEXICON = {
+    # strongly negative
+    'abuse': -3, 'abused': -3, 'agony': -3, 'awful': -3, 'depressed': -3, 'depressing': -3,
+    'depression': -3, 'despair': -3, 'devastated': -3, 'devastating': -3, 'died': -3,
+    'disgusting': -3, 'dying': -3, 'grief': -3, 'hate': -3, 'hated': -3, 'hates': -3,
+    'heartbreak': -3, 'heartbreaking': -3, 'heartbroken': -3, 'hopeless': -3, 'horrible': -3,
+    'horrific': -3, 'kill': -3, 'killed': -3, 'miserable': -3, 'misery': -3, 'murder': -3,
+    'suicide': -4, 'suicidal': -4, 'terrible': -3, 'tragedy': -3, 'tragic': -3, 'worst': -3,
+    'worthless': -3,
+    # negative
+    'afraid': -2, 'alone': -2, 'angry': -2, 'anxiety': -2, 'anxious': -2, 'bad': -2,
+    'broken': -2, 'cried': -2, 'cry': -2, 'crying': -2, 'dark': -1, 'dead': -2, 'death': -2,
+    'disappointed': -2, 'disappointing': -2, 'empty': -2, 'fail': -2, 'failed': -2,
+    'failure': -2, 'fear': -2, 'funeral': -2, 'goodbye': -1, 'guilt': -2, 'hurt': -2,
+    'hurts': -2, 'lonely': -2, 'loneliness': -2, 'lose': -2, 'losing': -2, 'loss': -2,
+    'lost': -2, 'mad': -2, 'miss': -1, 'missed': -1, 'missing': -1, 'mourn': -2,
+    'pain': -2, 'painful': -2, 'rip': -2, 'sad': -2, 'sadly': -2, 'sadness': -2,
+    'scared': -2, 'sick': -2, 'sorrow': -2, 'sorry': -1, 'stress': -2, 'stressed': -2,
+    'suffer': -2, 'suffering': -2, 'tears': -2, 'tired': -1, 'ugly': -2, 'unhappy': -2,
+    'upset': -2, 'war': -2, 'weep': -2, 'wrong': -1, 'cringe': -1, 'boring': -1,
+    'annoying': -2, 'sucks': -2, 'trash': -2, 'waste': -1, 'cancelled': -1, 'scam': -2,
+    # mildly positive / calm
+    'ambient': 1, 'breathe': 1, 'calm': 1, 'calming': 1, 'chill': 1, 'comfort': 1,
+    'comfortable': 1, 'cozy': 1, 'gentle': 1, 'lofi': 1, 'meditation': 1, 'nature': 1,
+    'peace': 1, 'peaceful': 1, 'quiet': 1, 'rain': 1, 'relax': 1, 'relaxing': 1, 'rest': 1,
+    'serene': 1, 'sleep': 1, 'slow': 1, 'soft': 1, 'soothing': 1, 'tranquil': 1,
+    'ok': 1, 'okay': 1, 'nice': 2, 'cool': 1, 'interesting': 1, 'helpful': 2, 'thanks': 2,
+    'thank': 2, 'hope': 1, 'hopeful': 2, 'safe': 1, 'useful': 1, 'learn': 1, 'learned': 1,
+    # positive
+    'beautiful': 3, 'best': 3, 'better': 2, 'blessed': 3, 'bright': 2, 'celebrate': 3,
+    'celebration': 3, 'cheer': 2, 'cute': 2, 'enjoy': 2, 'enjoyed': 2, 'fantastic': 3,
+    'favorite': 2, 'favourite': 2, 'fun': 2, 'funny': 2, 'glad': 2, 'good': 2, 'great': 3,
+    'grateful': 3, 'happy': 3, 'happiness': 3, 'haha': 2, 'hilarious': 3, 'joy': 3,
+    'kind': 2, 'laugh': 2, 'laughing': 2, 'lmao': 2, 'lol': 2, 'love': 3, 'loved': 3,
+    'lovely': 3, 'loves': 3, 'perfect': 3, 'proud': 2, 'smile': 2, 'sweet': 2,
+    'wholesome': 3, 'win': 2, 'wonderful': 3, 'yay': 2,
+    # strongly positive / high arousal
+    'amazing': 4, 'awesome': 4, 'banger': 3, 'brilliant': 3, 'champion': 3, 'crazy': 2,
+    'dance': 2, 'electrifying': 4, 'energy': 2, 'epic': 4, 'euphoric': 4, 'excited': 3,
+    'exciting': 3, 'fire': 3, 'goat': 3, 'hype': 3, 'incredible': 4, 'insane': 3,
+    'legendary': 4, 'masterpiece': 4, 'outstanding': 4, 'party': 3, 'phenomenal': 4,
+    'thrilling': 4, 'unbelievable': 3, 'victory': 3, 'wow': 3,
+}
+
+NEGATORS = {'not', 'no', 'never', 'nobody', 'nothing', "don't", "dont", "doesn't", "didn't",
+            "isn't", "wasn't", "can't", "cant", "won't", "aren't", 'without', 'hardly'}
+INTENSIFIERS = {'very': 1.3, 'really': 1.3, 'so': 1.2, 'extremely': 1.5, 'super': 1.4,
+                'absolutely': 1.5, 'totally': 1.3, 'incredibly': 1.5, 'most': 1.2}
+
+NEGATION_SCALAR = -0.74
+NORMALIZATION_ALPHA = 15.0
+NEUTRAL_SCORE = 50.0
+
+_SEPARATOR = '\x1e'
+_TAG_RE = re.compile(r'<[^>]*>')
+_TOKEN_RE = re.compile(r"[a-z][a-z']*|" + _SEPARATOR)
+
+
+def load_lexicon(path):
+    """
+    Read extra lexicon entries from a tab-separated "word<TAB>score" file (e.g. AFINN).
+    """
+    entries = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.rstrip('\n').rsplit('\t', 1)
+            if len(parts) == 2:
+                try:
+                    entries[parts[0].lower()] = float(parts[1])
+                except ValueError:
+                    continue
+    return entries
+
+
+class SentimentEngine:
+    """
+    Batched lexicon scorer. Scores are on the 0 (negative) to 100 (positive) scale
+    used by categorize_emotion; texts without any sentiment-bearing words score 50.
+    """
+
+    def __init__(self, lexicon=None, negators=NEGATORS, intensifiers=INTENSIFIERS):
+        lexicon = dict(LEXICON if lexicon is None else lexicon)
+        words = sorted(set(lexicon) | set(negators) | set(intensifiers))
+
+        # Precompiled vocabulary index; index 0 is reserved for out-of-vocabulary tokens and the
+        # last index for the separator placed between texts of a batch
+        self.vocabulary = {word: index for index, word in enumerate(words, start=1)}
+        self.separator_id = len(words) + 1
+        self.vocabulary[_SEPARATOR] = self.separator_id
+        size = len(words) + 2
+        self.valence = np.zeros(size)
+        self.is_negator = np.zeros(size, dtype=bool)
+        self.intensity = np.ones(size)
+        for word, index in self.vocabulary.items():
+            self.valence[index] = lexicon.get(word, 0.0)
+            self.is_negator[index] = word in negators
+            self.intensity[index] = intensifiers.get(word, 1.0)
+
+    def _token_ids(self, texts):
+        # Clean and tokenize the whole batch as one string, texts separated by a sentinel token
+        joined = _SEPARATOR.join(text.replace(_SEPARATOR, ' ') for text in texts)
+        joined = html.unescape(_TAG_RE.sub(' ', joined)).lower()
+        tokens = _TOKEN_RE.findall(joined)
+
+        # Vocabulary lookup runs entirely in C: dict.get(token, 0) mapped over the token list
+        token_ids = np.fromiter(map(self.vocabulary.get, tokens, repeat(0)), dtype=np.int64, count=len(tokens))
+        is_separator = token_ids == self.separator_id
+        doc_ids = np.cumsum(is_separator)
+        keep = ~is_separator
+        return token_ids[keep], doc_ids[keep]
+
+    def score(self, texts):
+        """
+        Score a batch of texts and return a float array of sentiment scores (0-100), one per text.
+        """
+        texts = list(texts)
+        if not texts:
+            return np.zeros(0)
+        token_ids, doc_ids = self._token_ids(texts)
+        if token_ids.size == 0:
+            return np.full(len(texts), NEUTRAL_SCORE)
+
+        valence = self.valence[token_ids]
+
+        # Modifiers apply to the next token within the same text
+        same_doc = np.zeros(token_ids.size, dtype=bool)
+        same_doc[1:] = doc_ids[1:] == doc_ids[:-1]
+        previous_ids = np.roll(token_ids, 1)
+        negated = same_doc & self.is_negator[previous_ids]
+        intensity = np.where(same_doc, self.intensity[previous_ids], 1.0)
+        valence = valence * intensity * np.where(negated, NEGATION_SCALAR, 1.0)
+
+        totals = np.bincount(doc_ids, weights=valence, minlength=len(texts))
+        normalized = totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)
+        return NEUTRAL_SCORE + NEUTRAL_SCORE * normalized
+
+
+_extra_lexicon_path = os.getenv('SENTIMENT_LEXICON_PATH')
+default_engine = SentimentEngine(
+    {**LEXICON, **load_lexicon(_extra_lexicon_path)} if _extra_lexicon_path else None
+)
+
+
+def score_texts(texts):
+    """
+    Score a batch of texts with the default engine.
+    """
+    return default_engine.score(texts)
@@ -3,9 +3,10 @@ import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 import joblib
 import os
-import requests
 from dotenv import load_dotenv
 from flask_cors import CORS
+from llm_cache import cache_key, llm_cache_from_env
+from llm_gateway import LLMGatewayError, llm_gateway_from_env
 
 # Load environment variables
 load_dotenv()
@@ -39,17 +40,17 @@ emotion_labels = {0: 'Sad', 1: 'Neutral', 2: 'Happy'}
 
 # OpenRouter API setup
 OPENROUTER_API_KEY = os.getenv("OPENROUTER_API_KEY")
-OPENROUTER_API_URL = "https://openrouter.ai/api/v1/chat/completions"
+# Pooled client with per-model concurrency limits, retries, circuit breaking and fallback models
+client = llm_gateway_from_env(timeout=(5.0, 10.0))
+
+# Shared LLM response cache: repeated prompts (e.g. the emotion label of a popular song) skip OpenRouter
+llm_cache = llm_cache_from_env()
 
 def get_llm_feedback(prompt):
     if not OPENROUTER_API_KEY:
         print("Error: OPENROUTER_API_KEY not set")
         return "Error: OpenRouter API key not configured"
 
-    headers = {
-        "Authorization": f"Bearer {OPENROUTER_API_KEY}",
-        "Content-Type": "application/json",
-    }
     payload = {
         "model": "meta-llama/llama-3.1-8b-instruct",
         "messages": [{"role": "user", "content": prompt}],
@@ -57,13 +58,18 @@ def get_llm_feedback(prompt):
         "temperature": 0.7,
     }
 
+    def request_feedback():
+        completion = client.chat.completions.create(**payload)
+        if not completion or not getattr(completion, 'choices', None) or not completion.choices[0].message.content:
+            raise ValueError("OpenRouter API returned an invalid response: No choices found")
+        return completion.choices[0].message.content.strip()
+
     try:
-        response = requests.post(OPENROUTER_API_URL, json=payload, headers=headers, timeout=10)
-        response.raise_for_status()
-        feedback = response.json()["choices"][0]["message"]["content"].strip()
-        print(f"OpenRouter response: {feedback}")
+        key = cache_key(payload["model"], payload["messages"], max_tokens=payload["max_tokens"], temperature=payload["temperature"])
+        feedback, cache_status = llm_cache.fetch(key, request_feedback)
+        print(f"OpenRouter response ({cache_status}): {feedback}")
         return feedback
-    except requests.exceptions.RequestException as e:
+    except (LLMGatewayError, ValueError) as e:
         print(f"OpenRouter API error: {e}")
         return f"Error: Failed to get feedback from OpenRouter - {str(e)}"
 
@@ -224,6 +230,14 @@ def analyze_emotion():
         print(f"Unexpected error in analyze-emotion: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/llm-cache-stats', methods=['GET'])
+def llm_cache_stats():
+    return jsonify(llm_cache.stats()), 200
+
+@app.route('/api/llm-gateway-stats', methods=['GET'])
+def llm_gateway_stats():
+    return jsonify(client.stats()), 200
+
 @app.route('/save-user', methods=['POST'])
 def save_user():
     data = request.get_json()
@@ -0,0 +1,134 @@
+"""
+Per-request cost of the /predict-stress upload path, up to the 224x224 model input.
+
+Posts synthetic JPEG photos (webcam frame, 1080p, 12 MP phone photo) as multipart uploads to a
+minimal Flask app with three handlers, without the model:
+  disk      the old path: file.save() under the client filename, cv2.imread, os.remove
+            (werkzeug also spools uploads over 500 KB to a temporary file first)
+  memory    UploadRequest buffers + cv2.imdecode at full resolution
+  reduced   UploadRequest buffers + decode_grayscale (IMREAD_REDUCED_* for large photos)
+and reports latency and the file I/O per request (read/write syscalls and bytes, from
+/proc/self/io, so Linux only for those columns).
+
+Usage: python bench_image_decode.py [requests_per_size]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+import cv2
+import numpy as np
+from flask import Flask, jsonify, request
+from werkzeug.datastructures import FileStorage
+from werkzeug.test import encode_multipart
+
+from image_decode import TARGET_SIZE, UploadRequest, decode_grayscale
+
+SIZES = [(640, 480), (1920, 1080), (4032, 3024)]
+REQUESTS = 30
+UPLOAD_FOLDER = tempfile.mkdtemp(prefix='bench_uploads_')
+
+
+def photo(width, height, seed=0):
+    # Smooth noise compresses like a photo (~1-2 bits per pixel at quality 90)
+    rng = np.random.default_rng(seed)
+    small = rng.integers(0, 255, (height // 8, width // 8, 3), dtype=np.uint8)
+    img = cv2.resize(small, (width, height), interpolation=cv2.INTER_CUBIC)
+    img = cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+    return cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, 90])[1].tobytes()
+
+
+def io_counters():
+    try:
+        with open('/proc/self/io') as f:
+            return {key: int(value) for key, value in (line.split(': ') for line in f)}
+    except OSError:
+        return None
+
+
+def make_app(request_class, handler):
+    app = Flask(__name__)
+    app.request_class = request_class
+    app.add_url_rule('/predict', 'predict', handler, methods=['POST'])
+    return app
+
+
+def disk_handler():
+    file = request.files['image']
+    image_path = os.path.join(UPLOAD_FOLDER, file.filename)
+    file.save(image_path)
+    try:
+        img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
+        return jsonify({'shape': cv2.resize(img, (TARGET_SIZE, TARGET_SIZE)).shape})
+    finally:
+        if os.path.exists(image_path):
+            os.remove(image_path)
+
+
+def memory_handler():
+    img = cv2.imdecode(request.files['image'].stream.array(), cv2.IMREAD_GRAYSCALE)
+    return jsonify({'shape': cv2.resize(img, (TARGET_SIZE, TARGET_SIZE)).shape})
+
+
+def reduced_handler():
+    img = decode_grayscale(request.files['image'].stream.array())
+    return jsonify({'shape': cv2.resize(img, (TARGET_SIZE, TARGET_SIZE)).shape})
+
+
+def run(app, data, requests):
+    # Encoded once up front: the test client would otherwise spool bodies over 500 KB to a temporary file itself
+    boundary, body = encode_multipart({'image': FileStorage(io.BytesIO(data), 'photo.jpg', content_type='image/jpeg')})
+    client = app.test_client()
+    post = lambda: client.post('/predict', data=body, content_type=f'multipart/form-data; boundary={boundary}')
+    post()
+    before = io_counters()
+    timings = np.empty(requests)
+    for i in range(requests):
+        start = time.perf_counter()
+        response = post()
+        timings[i] = time.perf_counter() - start
+        assert response.status_code == 200, response.data
+    after = io_counters()
+    per_request = {key: (after[key] - before[key]) / requests for key in after} if before else None
+    return timings * 1000, per_request
+
+
+def decode_ms(decode, data, requests):
+    array = np.frombuffer(data, dtype=np.uint8)
+    timings = np.empty(requests)
+    for i in range(requests):
+        start = time.perf_counter()
+        decode(array)
+        timings[i] = time.perf_counter() - start
+    return np.median(timings) * 1000
+
+
+if __name__ == '__main__':
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else REQUESTS
+    apps = {
+        'disk': make_app(Flask.request_class, disk_handler),
+        'memory': make_app(UploadRequest, memory_handler),
+        'reduced': make_app(UploadRequest, reduced_handler),
+    }
+    decoders = {
+        'disk': lambda array: cv2.imdecode(array, cv2.IMREAD_GRAYSCALE),
+        'memory': lambda array: cv2.imdecode(array, cv2.IMREAD_GRAYSCALE),
+        'reduced': decode_grayscale,
+    }
+    print(f"{'photo':>11}{'KB':>7}  {'path':<9}{'p50 ms':>8}{'p95 ms':>8}{'decode ms':>11}"
+          f"{'read calls':>12}{'write calls':>13}{'KB read':>10}{'KB written':>12}")
+    for width, height in SIZES:
+        data = photo(width, height)
+        baseline = None
+        for name, app in apps.items():
+            timings, counters = run(app, data, requests)
+            p50, p95 = np.percentile(timings, [50, 95])
+            baseline = baseline or p50
+            io_columns = (f"{counters['syscr']:>12.0f}{counters['syscw']:>13.0f}{counters['rchar'] / 1024:>10.0f}"
+                          f"{counters['wchar'] / 1024:>12.0f}") if counters else ''
+            decode = decode_ms(decoders[name], data, requests)
+            print(f"{f'{width}x{height}':>11}{len(data) / 1024:>7.0f}  {name:<9}{p50:>8.2f}{p95:>8.2f}{decode:>11.2f}{io_columns}"
+                  f"  {baseline / p50:.1f}x")
+    os.rmdir(UPLOAD_FOLDER)
@@ -0,0 +1,235 @@
+"""
+In-memory decoding of uploaded images.
+
+UploadRequest replaces werkzeug's upload stream factory, which spools file parts over 500 KB to
+a temporary file, with buffers from a shared pool: the form parser writes each part straight
+into a bytearray that keeps its capacity and goes back to the pool when the request closes, so
+an upload costs no disk I/O and, once the buffers have grown to the usual photo size, no
+allocation. Nothing is named after the client's filename, so concurrent uploads cannot collide.
+The bytes are decoded with cv2.imdecode from a zero-copy view of the buffer.
+
+The model only needs a 224x224 grayscale image, so large images are decoded at 1/2, 1/4 or 1/8
+resolution (IMREAD_REDUCED_GRAYSCALE_*), never below 224 pixels on the short side. For JPEG,
+libjpeg skips the fine DCT detail instead of decoding every pixel and shrinking afterwards.
+"""
+import struct
+import threading
+
+import cv2
+import numpy as np
+from flask import Request
+
+TARGET_SIZE = 224
+INITIAL_CAPACITY = 256 * 1024
+# Buffers that grew beyond this are not pooled, so one huge upload does not pin its memory
+MAX_POOLED_CAPACITY = 8 * 1024 * 1024
+MAX_IDLE_BUFFERS = 8
+READ_CHUNK = 64 * 1024
+
+_REDUCED_FLAGS = {
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+}
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+# Start-of-frame markers (baseline, progressive, lossless, ...); C4, C8 and CC are not frames
+_JPEG_SOF_MARKERS = set(range(0xC0, 0xD0)) - {0xC4, 0xC8, 0xCC}
+
+
+class UploadBuffer:
+    """
+    Writable, seekable file-like object over a bytearray that keeps its capacity when reset.
+    """
+
+    def __init__(self, capacity=INITIAL_CAPACITY):
+        self._data = bytearray(capacity)
+        self._size = 0
+        self._pos = 0
+        self.closed = False
+
+    @property
+    def capacity(self):
+        return len(self._data)
+
+    def reset(self):
+        self._size = self._pos = 0
+
+    def _reserve(self, needed):
+        # Grow into a new bytearray rather than resizing, which numpy views of the old one would block
+        if needed > len(self._data):
+            grown = bytearray(max(needed, 2 * len(self._data)))
+            grown[:self._size] = memoryview(self._data)[:self._size]
+            self._data = grown
+
+    def write(self, data):
+        end = self._pos + len(data)
+        self._reserve(end)
+        self._data[self._pos:end] = data
+        self._pos = end
+        self._size = max(self._size, end)
+        return len(data)
+
+    def fill(self, stream):
+        """
+        Replace the contents with everything left in stream.
+        """
+        self.reset()
+        while True:
+            chunk = stream.read(READ_CHUNK)
+            if not chunk:
+                break
+            self.write(chunk)
+        self._pos = 0
+        return self
+
+    def seek(self, offset, whence=0):
+        base = (0, self._pos, self._size)[whence]
+        self._pos = max(0, base + offset)
+        return self._pos
+
+    def tell(self):
+        return self._pos
+
+    def read(self, size=-1):
+        end = self._size if size is None or size < 0 else min(self._size, self._pos + size)
+        data = bytes(memoryview(self._data)[self._pos:end])
+        self._pos = max(self._pos, end)
+        return data
+
+    def readline(self, size=-1):
+        end = self._data.find(b'\n', self._pos, self._size)
+        end = self._size if end < 0 else end + 1
+        if size is not None and size >= 0:
+            end = min(end, self._pos + size)
+        return self.read(end - self._pos)
+
+    def readable(self):
+        return True
+
+    def writable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def flush(self):
+        pass
+
+    def close(self):
+        # The buffer is returned to the pool when the request closes, not by FileStorage.close()
+        pass
+
+    def array(self):
+        """
+        Zero-copy uint8 view of the contents; valid until the buffer is reused.
+        """
+        return np.frombuffer(self._data, dtype=np.uint8, count=self._size)
+
+
+class UploadBufferPool:
+    """
+    Thread-safe free list of UploadBuffers.
+    """
+
+    def __init__(self, max_idle=MAX_IDLE_BUFFERS, max_capacity=MAX_POOLED_CAPACITY):
+        self.max_idle = max_idle
+        self.max_capacity = max_capacity
+        self._free = []
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._free:
+                self.reused += 1
+                buffer = self._free.pop()
+                buffer.reset()
+                return buffer
+            self.created += 1
+        return UploadBuffer()
+
+    def release(self, buffer):
+        with self._lock:
+            if len(self._free) < self.max_idle and buffer.capacity <= self.max_capacity:
+                self._free.append(buffer)
+
+
+upload_buffers = UploadBufferPool()
+
+
+class UploadRequest(Request):
+    """
+    Flask request whose file uploads (and raw body, via upload_body()) land in pooled buffers.
+    """
+
+    def _pooled_buffer(self):
+        buffer = upload_buffers.acquire()
+        self.__dict__.setdefault('_upload_buffers', []).append(buffer)
+        return buffer
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return self._pooled_buffer()
+
+    def upload_body(self):
+        """
+        The raw request body (e.g. a POST with Content-Type: image/jpeg), read from the stream into a pooled buffer.
+        """
+        return self._pooled_buffer().fill(self.stream)
+
+    def close(self):
+        super().close()
+        for buffer in self.__dict__.pop('_upload_buffers', ()):
+            upload_buffers.release(buffer)
+
+
+def image_size(data):
+    """
+    (width, height) read from a PNG or JPEG header, or None for other or truncated data.
+    """
+    header = data[:32].tobytes()
+    if header.startswith(_PNG_SIGNATURE) and header[12:16] == b'IHDR':
+        return struct.unpack('>II', header[16:24])
+    if not header.startswith(b'\xff\xd8'):
+        return None
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = int(data[i + 1])
+        if marker == 0xFF:
+            # Fill byte before a marker
+            i += 1
+            continue
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:
+            i += 2
+            continue
+        if marker in _JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', data[i + 5:i + 9].tobytes())
+            return width, height
+        i += 2 + struct.unpack('>H', data[i + 2:i + 4].tobytes())[0]
+    return None
+
+
+def reduction_for(size, target=TARGET_SIZE):
+    """
+    Largest decode reduction (8, 4 or 2) that keeps the short side at least target, else 1.
+    """
+    if size is None:
+        return 1
+    short_side = min(size)
+    return next((factor for factor in _REDUCED_FLAGS if short_side // factor >= target), 1)
+
+
+def decode_grayscale(data, target=TARGET_SIZE):
+    """
+    Grayscale image decoded from encoded bytes (a uint8 array), at reduced resolution when it
+    is at least twice target on its short side.
+    """
+    if not len(data):
+        raise ValueError("The uploaded image is empty")
+    factor = reduction_for(image_size(data), target)
+    img = cv2.imdecode(data, _REDUCED_FLAGS.get(factor, cv2.IMREAD_GRAYSCALE))
+    if img is None:
+        raise ValueError("Could not decode the uploaded image")
+    return img
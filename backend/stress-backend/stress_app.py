@@ -6,16 +6,14 @@ from tensorflow.keras.models import load_model
 from tensorflow.keras.applications.resnet50 import preprocess_input
 from tensorflow.keras.metrics import MeanSquaredError
 from flask_cors import CORS
+from image_decode import UploadRequest, decode_grayscale
 
 app = Flask(__name__)
 CORS(app, resources={r"/predict-stress": {"origins": "http://localhost:3000"}})
 
-# Directory to save uploaded images
-UPLOAD_FOLDER = 'E:/mental-health-analysis/uploads'
-if not os.path.exists(UPLOAD_FOLDER):
-    os.makedirs(UPLOAD_FOLDER)
-
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are decoded in memory from pooled buffers; nothing is written to disk
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
 
 # Load the stress detection model
 MODEL_PATH = r'E:\mental-health-analysis\backend\stress-backend\stress_model.h5'
@@ -27,11 +25,9 @@ except Exception as e:
     print(f"Failed to load stress detection model: {e}")
     model = None
 
-def load_and_preprocess_image(image_path):
-    # Load the image in grayscale (FER2013 images are grayscale)
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise ValueError(f"Could not load image from {image_path}")
+def load_and_preprocess_image(data):
+    # Decode the uploaded bytes in grayscale (FER2013 images are grayscale), reduced for large photos
+    img = decode_grayscale(data)
     
     # Resize to 224x224 (model input size)
     img = cv2.resize(img, (224, 224))
@@ -51,20 +47,22 @@ def predict_stress():
     if model is None:
         return jsonify({'error': 'Stress detection model not loaded'}), 500
 
-    if 'image' not in request.files:
-        return jsonify({'error': 'No image uploaded'}), 400
-    
-    file = request.files['image']
-    if file.filename == '':
-        return jsonify({'error': 'No image selected'}), 400
-    
-    # Save the uploaded image
-    image_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(image_path)
+    if request.mimetype.startswith('image/'):
+        # Raw image body: read straight from the request stream
+        upload = request.upload_body()
+    else:
+        if 'image' not in request.files:
+            return jsonify({'error': 'No image uploaded'}), 400
+
+        file = request.files['image']
+        if file.filename == '':
+            return jsonify({'error': 'No image selected'}), 400
+        # The form parser wrote the file into a pooled in-memory buffer
+        upload = file.stream
     
     try:
-        # Load and preprocess the image
-        img = load_and_preprocess_image(image_path)
+        # Decode and preprocess the image
+        img = load_and_preprocess_image(upload.array())
         
         # Make prediction
         stress_level = model.predict(img)[0][0]
@@ -75,10 +73,6 @@ def predict_stress():
         return jsonify({'stress_level': stress_level})
     except Exception as e:
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up: delete the uploaded image
-        if os.path.exists(image_path):
-            os.remove(image_path)
 
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
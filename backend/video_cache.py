@@ -0,0 +1,108 @@
+"""
+Process-wide cache of per-video analysis results, shared across users.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class VideoAnalysisCache:
+    """
+    Thread-safe LRU cache of {video_id: (sentiment score, category)} with a TTL.
+
+    Entries older than ttl seconds are treated as misses, and the least recently used
+    entry is evicted once more than max_size videos are cached. Each hit is one
+    commentThreads request (and one scoring pass) that did not have to be made.
+    """
+
+    def __init__(self, max_size=50000, ttl=7 * 24 * 3600, path=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, video_id):
+        """
+        Return the cached {'sentimentScore', 'category'} for a video, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(video_id)
+            if entry is not None and time.time() - entry[2] > self.ttl:
+                del self._entries[video_id]
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(video_id)
+            self.hits += 1
+            return {'sentimentScore': entry[0], 'category': entry[1]}
+
+    def put(self, video_id, sentiment_score, category):
+        with self._lock:
+            self._entries[video_id] = (sentiment_score, category, time.time())
+            self._entries.move_to_end(video_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxSize': self.max_size,
+                'ttlSeconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'apiCallsSaved': self.hits
+            }
+
+    def save(self, path=None):
+        """
+        Persist the unexpired entries to a JSON file, least recently used first.
+        """
+        path = path or self.path
+        if not path:
+            return
+        now = time.time()
+        with self._lock:
+            entries = [[video_id, *entry] for video_id, entry in self._entries.items() if now - entry[2] <= self.ttl]
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, path)
+        logging.debug(f"Saved {len(entries)} video analyses to {path}")
+
+    def load(self, path=None):
+        """
+        Load entries written by save(), skipping expired ones. A missing file is not an error.
+        """
+        path = path or self.path
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Could not load video analysis cache from {path}: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for video_id, sentiment_score, category, cached_at in entries:
+                if now - cached_at <= self.ttl:
+                    self._entries[video_id] = (sentiment_score, category, cached_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        logging.debug(f"Loaded {len(self._entries)} video analyses from {path}")
@@ -0,0 +1,154 @@
+"""
+YouTube Data API quota accounting and request scheduling.
+
+Every API call acquires its quota cost from a process-wide token bucket that refills at
+the daily budget spread over 24 hours. Interactive analyses may drain the bucket
+completely, background analyses stop at a reserve so they can never starve users who
+are waiting on a report, and interactive waiters are always served first.
+"""
+import heapq
+import itertools
+import threading
+import time
+
+# Quota units per API method (https://developers.google.com/youtube/v3/determine_quota_cost)
+QUOTA_COSTS = {
+    'videos.list': 1,
+    'commentThreads.list': 1
+}
+
+INTERACTIVE = 0
+BACKGROUND = 1
+PRIORITIES = {'interactive': INTERACTIVE, 'background': BACKGROUND}
+
+
+class QuotaExhaustedError(Exception):
+    """
+    Raised when quota for a call could not be acquired in time.
+    """
+    def __init__(self, method, retry_after):
+        super().__init__(f"YouTube API quota exhausted for {method}")
+        self.method = method
+        self.retry_after = retry_after
+
+
+class QuotaScheduler:
+    """
+    Token-bucket quota budget shared by all users, with priority-ordered waiters.
+    """
+
+    def __init__(self, daily_budget=10000, background_reserve=0.3, clock=time.monotonic):
+        self.capacity = float(daily_budget)
+        self.refill_rate = daily_budget / 86400.0
+        self.background_reserve = background_reserve * daily_budget
+        self._clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.spent = {method: 0 for method in QUOTA_COSTS}
+        self.denied = {method: 0 for method in QUOTA_COSTS}
+        self.degraded_videos = 0
+
+    def _refill(self):
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def _floor(self, priority):
+        return 0.0 if priority == INTERACTIVE else self.background_reserve
+
+    def _wait_time(self, cost, priority):
+        missing = self._floor(priority) + cost - self._tokens
+        return max(missing, 0.0) / self.refill_rate
+
+    def acquire(self, method, priority=INTERACTIVE, timeout=0.0):
+        """
+        Spend the quota cost of one call to method, waiting up to timeout seconds.
+        Raises QuotaExhaustedError if the quota could not be acquired in time.
+        """
+        cost = QUOTA_COSTS[method]
+        deadline = self._clock() + timeout
+        with self._condition:
+            entry = (priority, next(self._sequence))
+            heapq.heappush(self._waiters, entry)
+            try:
+                while True:
+                    self._refill()
+                    if self._waiters[0] == entry and self._tokens - cost >= self._floor(priority):
+                        self._tokens -= cost
+                        self.spent[method] += cost
+                        return
+                    remaining = deadline - self._clock()
+                    if remaining <= 0:
+                        self.denied[method] += 1
+                        raise QuotaExhaustedError(method, self._wait_time(cost, priority))
+                    self._condition.wait(min(remaining, max(self._wait_time(cost, priority), 0.05)))
+            finally:
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+
+    def try_acquire(self, method, priority=INTERACTIVE):
+        """
+        Non-blocking acquire; returns False instead of raising.
+        """
+        try:
+            self.acquire(method, priority)
+            return True
+        except QuotaExhaustedError:
+            return False
+
+    def drain(self):
+        """
+        Empty the bucket, e.g. after the API itself reported quotaExceeded.
+        """
+        with self._condition:
+            self._refill()
+            self._tokens = 0.0
+
+    def remaining_fraction(self):
+        with self._condition:
+            self._refill()
+            return self._tokens / self.capacity
+
+    def comment_fetch_limit(self, video_count, priority=INTERACTIVE):
+        """
+        How many of video_count videos should have their comments fetched.
+
+        A commentThreads call costs the same quota whatever its maxResults, so the analysis
+        degrades by fetching comments for fewer videos (falling back to title and description)
+        as the budget runs low, instead of failing.
+        """
+        remaining = self.remaining_fraction()
+        if priority == BACKGROUND:
+            remaining -= self.background_reserve / self.capacity
+        if remaining > 0.5:
+            return video_count
+        if remaining > 0.2:
+            return (video_count + 1) // 2
+        if remaining > 0.05:
+            return min(video_count, 5)
+        return 0
+
+    def record_degraded(self, video_count):
+        """
+        Count videos that were scored without comments because the budget was low.
+        """
+        with self._condition:
+            self.degraded_videos += video_count
+
+    def stats(self):
+        with self._condition:
+            self._refill()
+            return {
+                'capacity': self.capacity,
+                'remaining': round(self._tokens, 2),
+                'remainingFraction': self._tokens / self.capacity,
+                'backgroundReserve': self.background_reserve,
+                'spentByMethod': dict(self.spent),
+                'deniedByMethod': dict(self.denied),
+                'degradedVideos': self.degraded_videos,
+                'waiting': len(self._waiters)
+            }
@@ -0,0 +1,373 @@
+"""
+Vectorized CatBoost scoring for the academic depression-risk model.
+
+Shared by the Flask service and the offline CSV scorer (score_academic_csv.py). Request
+records are validated and encoded by a FeatureEncoder straight into NumPy rows, CSV chunks
+column-wise with pandas, and every call scores with a single predict_proba call; the label
+is the most probable class, which is what model.predict returns.
+"""
+import math
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from catboost import Pool
+
+# Define the expected features
+FEATURES = [
+    'Age', 'Academic Pressure', 'CGPA', 'Study Satisfaction',
+    'Dietary Habits', 'Degree', 'Have you ever had suicidal thoughts ?',
+    'Work/Study Hours', 'Fatigue Index', 'Stress Risk Score'
+]
+
+# Categorical features and their encodings
+DEGREE_MAPPING = {'Bachelors': 0, 'Masters': 1, 'PhD': 2}
+SUICIDAL_THOUGHTS_MAPPING = {'No': 0, 'Yes': 1}
+CATEGORICAL_MAPPINGS = {
+    'Degree': DEGREE_MAPPING,
+    'Have you ever had suicidal thoughts ?': SUICIDAL_THOUGHTS_MAPPING
+}
+
+INVALID_INPUT_ERROR = 'Invalid input data: Some features could not be converted to numeric values'
+
+# Batches up to this size compute SHAP values without CatBoost's per-call precalculation
+SHAP_NO_PRECALC_MAX_ROWS = 32
+
+# Largest perturbation grid scored by one what-if request, and the most values per feature
+MAX_WHAT_IF_POINTS = 50000
+MAX_WHAT_IF_VALUES = 1000
+
+
+def prediction_label(prediction):
+    return 'Depression' if prediction == 1 else 'No Depression'
+
+
+class FeatureEncoder:
+    """
+    Compiled encoder for FEATURES. Validates a request record and writes it straight into a
+    float64 row, following the same rules as encode_frame(): categorical features are looked
+    up in their mapping, the others are coerced like pd.to_numeric(errors='coerce'), and
+    missing or non-numeric values are rejected with ValueError.
+    """
+
+    def __init__(self, features=FEATURES, mappings=CATEGORICAL_MAPPINGS):
+        self.features = list(features)
+        self._columns = [(index, feature, mappings.get(feature)) for index, feature in enumerate(self.features)]
+        self._local = threading.local()
+
+    @staticmethod
+    def _to_number(value, mapping):
+        if mapping is not None:
+            return mapping.get(value) if isinstance(value, str) else None
+        if isinstance(value, (int, float)):
+            return float(value)
+        if isinstance(value, str):
+            try:
+                return float(value)
+            except ValueError:
+                return None
+        return None
+
+    def encode_value(self, feature, value):
+        """
+        Encode a single value of feature; raises ValueError if it is not valid for the feature.
+        """
+        if feature not in self.features:
+            raise ValueError(f'Unknown feature: {feature}')
+        number = self._to_number(value, CATEGORICAL_MAPPINGS.get(feature))
+        if number is None or math.isnan(number):
+            raise ValueError(f'Invalid value for {feature}: {value!r}')
+        return number
+
+    def row(self):
+        """
+        Preallocated (1, n_features) buffer, one per thread.
+        """
+        row = getattr(self._local, 'row', None)
+        if row is None:
+            row = self._local.row = np.empty((1, len(self.features)))
+        return row
+
+    def encode_into(self, record, out):
+        """
+        Encode record into the 1-D array out.
+        """
+        for feature in self.features:
+            if feature not in record:
+                raise ValueError(f'Missing feature: {feature}')
+        for index, feature, mapping in self._columns:
+            number = self._to_number(record[feature], mapping)
+            if number is None or math.isnan(number):
+                raise ValueError(INVALID_INPUT_ERROR)
+            out[index] = number
+        return out
+
+    def encode(self, record):
+        """
+        Encode one record into this thread's preallocated row and return the row.
+        """
+        row = self.row()
+        # CatBoost marks arrays it was given as read-only; the buffer is ours to reuse
+        row.flags.writeable = True
+        self.encode_into(record, row[0])
+        return row
+
+
+feature_encoder = FeatureEncoder()
+
+
+def encode_frame(frame):
+    """
+    Encode the FEATURES columns of a DataFrame: categorical columns are mapped and every
+    column is coerced to numeric. Returns (encoded DataFrame, boolean mask of valid rows).
+    """
+    encoded = pd.DataFrame(index=frame.index)
+    for feature in FEATURES:
+        column = frame[feature]
+        if feature in CATEGORICAL_MAPPINGS:
+            column = column.map(CATEGORICAL_MAPPINGS[feature])
+        encoded[feature] = pd.to_numeric(column, errors='coerce')
+    valid = encoded.notnull().all(axis=1).to_numpy()
+    return encoded, valid
+
+
+def score_encoded(model, encoded):
+    """
+    Score encoded rows with one predict_proba call.
+    Returns (predicted classes, probabilities of depression) as arrays.
+    """
+    if len(encoded) == 0:
+        return np.empty(0, dtype=int), np.empty(0)
+    proba = model.predict_proba(encoded)
+    classes = np.asarray(model.classes_)
+    positive = int(np.flatnonzero(classes == 1)[0])
+    return classes[proba.argmax(axis=1)], proba[:, positive]
+
+
+def predict_one(model, row):
+    """
+    Label and probability of depression for one encoded row, from a single predict_proba call.
+    """
+    predictions, probabilities = score_encoded(model, row)
+    return int(predictions[0]), float(probabilities[0])
+
+
+def score_one(model, row, attributor=None):
+    """
+    Label and probability of depression for one encoded row, plus its formatted SHAP
+    contributions and base value when an attributor is given (otherwise None, None).
+    Without an attributor this is a single predict_proba call.
+    """
+    if attributor is None:
+        prediction, probability = predict_one(model, row)
+        return prediction, probability, None, None
+    predictions, probabilities, contributions, base_values = attributor.explain(row)
+    return predictions[0], float(probabilities[0]), format_contributions(contributions[0]), float(base_values[0])
+
+
+class FeatureAttributor:
+    """
+    Per-prediction feature contributions from CatBoost's native SHAP values, cached by
+    encoded feature vector.
+
+    The SHAP values of a binary CatBoost model add up to its raw log-odds, so the pass that
+    computes them also yields the probability and the label: explain() scores and explains
+    in one batched call, with no separate predict_proba.
+    """
+
+    def __init__(self, model, max_size=10000, calc_type='Regular'):
+        self.model = model
+        self.max_size = max_size
+        self.calc_type = calc_type
+        classes = np.asarray(model.classes_)
+        self._negative, self._positive = classes[0], classes[1]
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _shap_values(self, matrix):
+        # CatBoost's per-tree precalculation has a large fixed cost per call (~0.5s for this model)
+        # and only pays off for larger batches; small ones are faster computed row by row
+        shap_mode = 'NoPreCalc' if len(matrix) <= SHAP_NO_PRECALC_MAX_ROWS else 'UsePreCalc'
+        return self.model.get_feature_importance(
+            Pool(matrix), type='ShapValues', shap_mode=shap_mode, shap_calc_type=self.calc_type
+        )
+
+    def explain(self, matrix):
+        """
+        Explain encoded rows. Returns (predicted classes, probabilities of depression,
+        contributions of shape (rows, features), base values), contributions in log-odds.
+        """
+        matrix = np.asarray(matrix, dtype=float)
+        keys = [row.tobytes() for row in matrix]
+        shap = np.empty((len(matrix), matrix.shape[1] + 1))
+        missing = []
+        with self._lock:
+            for i, key in enumerate(keys):
+                cached = self._cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    self._cache.move_to_end(key)
+                    shap[i] = cached
+            self.hits += len(keys) - len(missing)
+            self.misses += len(missing)
+
+        if missing:
+            computed = self._shap_values(matrix[missing])
+            shap[missing] = computed
+            with self._lock:
+                for i, values in zip(missing, computed):
+                    self._cache[keys[i]] = values
+                while len(self._cache) > self.max_size:
+                    self._cache.popitem(last=False)
+
+        # P(classes_[1]) is the sigmoid of the summed SHAP values (contributions plus base value)
+        positive_probability = 1.0 / (1.0 + np.exp(-shap.sum(axis=1)))
+        predictions = np.where(positive_probability > 0.5, self._positive, self._negative)
+        probabilities = positive_probability if self._positive == 1 else 1.0 - positive_probability
+        return predictions, probabilities, shap[:, :-1], shap[:, -1]
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._cache),
+                'maxSize': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hitRate': self.hits / lookups if lookups else 0.0
+            }
+
+
+def format_contributions(contributions):
+    """
+    {feature: contribution} for one row, largest absolute contribution first.
+    """
+    order = np.argsort(-np.abs(contributions), kind='stable')
+    return {FEATURES[i]: float(contributions[i]) for i in order}
+
+
+def score_records(model, records, attributor=None):
+    """
+    Score a chunk of request records (dicts keyed by feature name).
+    Returns one result per record, in order: {'index', 'prediction', 'probability'} or
+    {'index', 'error'} for records with missing or invalid features. With an attributor,
+    scored records also get 'feature_contributions' and 'contribution_base_value'.
+    """
+    results = [{'index': i} for i in range(len(records))]
+    matrix = np.empty((len(records), len(FEATURES)))
+    valid = np.zeros(len(records), dtype=bool)
+    for i, record in enumerate(records):
+        try:
+            if not isinstance(record, dict):
+                raise ValueError(f'Missing feature: {FEATURES[0]}')
+            feature_encoder.encode_into(record, matrix[i])
+            valid[i] = True
+        except ValueError as e:
+            results[i]['error'] = str(e)
+
+    if attributor is None:
+        predictions, probabilities = score_encoded(model, matrix[valid])
+    elif valid.any():
+        predictions, probabilities, contributions, base_values = attributor.explain(matrix[valid])
+    else:
+        return results
+    for n, i in enumerate(np.flatnonzero(valid)):
+        results[i]['prediction'] = prediction_label(predictions[n])
+        results[i]['probability'] = float(probabilities[n])
+        if attributor is not None:
+            results[i]['feature_contributions'] = format_contributions(contributions[n])
+            results[i]['contribution_base_value'] = float(base_values[n])
+    return results
+
+
+def what_if_axis(feature, spec):
+    """
+    Values of one what-if axis from {'values': [...]} or {'min', 'max', 'step'}.
+    Returns (labels as given, encoded values).
+    """
+    if feature not in FEATURES:
+        raise ValueError(f'Unknown feature: {feature}')
+    if not isinstance(spec, dict):
+        raise ValueError(f'Range for {feature} must be an object')
+    if 'values' in spec:
+        labels = list(spec['values'])
+    else:
+        try:
+            low, high, step = float(spec['min']), float(spec['max']), float(spec.get('step', 1))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError(f'Range for {feature} needs numeric min and max (and optional step)')
+        if step <= 0 or high < low:
+            raise ValueError(f'Range for {feature} needs min <= max and step > 0')
+        count = int(math.floor(round((high - low) / step, 9))) + 1
+        if count > MAX_WHAT_IF_VALUES:
+            raise ValueError(f'Range for {feature} has {count} values; at most {MAX_WHAT_IF_VALUES} are allowed')
+        labels = [round(low + i * step, 10) for i in range(count)]
+    if not labels or len(labels) > MAX_WHAT_IF_VALUES:
+        raise ValueError(f'Range for {feature} must have between 1 and {MAX_WHAT_IF_VALUES} values')
+    return labels, np.array([feature_encoder.encode_value(feature, label) for label in labels])
+
+
+def what_if(model, record, ranges):
+    """
+    Sensitivity of one student's predicted risk to changes in the features named in ranges.
+
+    One matrix holds the unchanged student, every one-at-a-time change and (for two or
+    more features) the full grid of combinations, and is scored in a single predict_proba
+    call. Returns the baseline, a response curve per feature (other features unchanged)
+    and, for grids, the probabilities over the grid plus each feature's average response
+    across it. Raises ValueError for invalid input or oversized grids.
+    """
+    if not isinstance(ranges, dict) or not ranges:
+        raise ValueError('ranges must name at least one feature')
+    base = feature_encoder.encode_into(record, np.empty(len(FEATURES)))
+    axes = [(feature, *what_if_axis(feature, spec)) for feature, spec in ranges.items()]
+    axes = [(feature, FEATURES.index(feature), labels, values) for feature, labels, values in axes]
+
+    shape = tuple(len(values) for _, _, _, values in axes)
+    grid_points = int(np.prod(shape)) if len(axes) > 1 else 0
+    curve_points = sum(shape)
+    if grid_points + curve_points > MAX_WHAT_IF_POINTS:
+        raise ValueError(f'What-if grid has {grid_points + curve_points} points; at most {MAX_WHAT_IF_POINTS} are allowed')
+
+    matrix = np.repeat(base[np.newaxis, :], 1 + curve_points + grid_points, axis=0)
+    offset = 1
+    for _, column, _, values in axes:
+        matrix[offset:offset + len(values), column] = values
+        offset += len(values)
+    if grid_points:
+        mesh = np.meshgrid(*(values for _, _, _, values in axes), indexing='ij')
+        for (_, column, _, _), coordinates in zip(axes, mesh):
+            matrix[offset:, column] = coordinates.ravel()
+
+    predictions, probabilities = score_encoded(model, matrix)
+
+    result = {
+        'baseline': {'prediction': prediction_label(predictions[0]), 'probability': float(probabilities[0])},
+        'curves': {},
+        'points': len(matrix)
+    }
+    offset = 1
+    for feature, _, labels, values in axes:
+        result['curves'][feature] = [
+            {'value': label, 'prediction': prediction_label(prediction), 'probability': float(probability)}
+            for label, prediction, probability in zip(
+                labels, predictions[offset:offset + len(values)], probabilities[offset:offset + len(values)]
+            )
+        ]
+        offset += len(values)
+    if grid_points:
+        grid = probabilities[offset:].reshape(shape)
+        result['grid'] = {
+            'features': [feature for feature, _, _, _ in axes],
+            'values': [labels for _, _, labels, _ in axes],
+            'probabilities': grid.tolist()
+        }
+        result['averageResponse'] = {
+            feature: grid.mean(axis=tuple(a for a in range(len(axes)) if a != axis)).tolist()
+            for axis, (feature, _, _, _) in enumerate(axes)
+        }
+    return result
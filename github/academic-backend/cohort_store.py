@@ -0,0 +1,145 @@
+"""
+Append-only store of academic predictions with incrementally maintained cohort aggregates.
+
+Every prediction is folded into running aggregates: a histogram of risk probabilities, mean
+risk by degree and by study-hour bucket, and daily counts. The dashboard reads only the
+aggregates, so its cost does not grow with the number of predictions. Given a path, each
+prediction is also appended as one NDJSON line (without any user ID) and the log is replayed
+once at startup; without one the aggregates live in memory only.
+"""
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+
+from academic_scoring import DEGREE_MAPPING, FEATURES
+
+HISTOGRAM_BINS = 20
+# Study-hour buckets as (label, lower bound inclusive); the last one is open-ended
+STUDY_HOUR_BUCKETS = [('0-2', 0), ('3-5', 3), ('6-8', 6), ('9-11', 9), ('12+', 12)]
+DEGREE_LABELS = {code: label for label, code in DEGREE_MAPPING.items()}
+DEGREE_INDEX = FEATURES.index('Degree')
+STUDY_HOURS_INDEX = FEATURES.index('Work/Study Hours')
+# Days of daily counts returned by the dashboard
+DASHBOARD_DAYS = 90
+
+
+def _empty_group():
+    return {'count': 0, 'riskSum': 0.0, 'depression': 0}
+
+
+def study_hour_bucket(hours):
+    label = STUDY_HOUR_BUCKETS[0][0]
+    for bucket, lower in STUDY_HOUR_BUCKETS:
+        if hours >= lower:
+            label = bucket
+    return label
+
+
+class CohortAnalytics:
+    """
+    Thread-safe prediction log plus running cohort aggregates.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self.total = _empty_group()
+        self.histogram = [0] * HISTOGRAM_BINS
+        self.by_degree = {}
+        self.by_study_hours = {bucket: _empty_group() for bucket, _ in STUDY_HOUR_BUCKETS}
+        self.daily = {}
+
+    @staticmethod
+    def _fold(group, probability, depression):
+        group['count'] += 1
+        group['riskSum'] += probability
+        group['depression'] += int(depression)
+
+    def _apply(self, entry):
+        probability = entry['probability']
+        depression = entry['prediction'] == 'Depression'
+        self._fold(self.total, probability, depression)
+        self.histogram[min(int(probability * HISTOGRAM_BINS), HISTOGRAM_BINS - 1)] += 1
+        self._fold(self.by_degree.setdefault(entry['degree'], _empty_group()), probability, depression)
+        self._fold(self.by_study_hours[study_hour_bucket(entry['studyHours'])], probability, depression)
+        self._fold(self.daily.setdefault(entry['timestamp'][:10], _empty_group()), probability, depression)
+
+    def record(self, entries):
+        """
+        Append predictions and fold them into the aggregates. Each entry has prediction,
+        probability, degree, studyHours, features and timestamp.
+        """
+        if not entries:
+            return
+        lines = ''.join(json.dumps(entry) + '\n' for entry in entries)
+        with self._lock:
+            for entry in entries:
+                self._apply(entry)
+            if self.path:
+                try:
+                    if self._file is None:
+                        self._file = open(self.path, 'a')
+                    self._file.write(lines)
+                    self._file.flush()
+                except OSError as e:
+                    logging.error(f"Could not append predictions to {self.path}: {e}")
+
+    def load(self):
+        """
+        Rebuild the aggregates from the log written by record(). A missing file is not an error.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return
+        loaded = 0
+        with self._lock, open(self.path) as f:
+            for line in f:
+                try:
+                    self._apply(json.loads(line))
+                    loaded += 1
+                except (ValueError, KeyError, TypeError):
+                    logging.warning(f"Skipping malformed line in {self.path}")
+        logging.debug(f"Loaded {loaded} predictions from {self.path}")
+
+    @staticmethod
+    def _summary(group):
+        count = group['count']
+        return {
+            'count': count,
+            'meanRisk': group['riskSum'] / count if count else None,
+            'depressionRate': group['depression'] / count if count else None
+        }
+
+    def dashboard(self, days=DASHBOARD_DAYS):
+        """
+        Cohort aggregates for the dashboard, read without touching the stored predictions.
+        """
+        with self._lock:
+            recent_days = sorted(self.daily)[-days:]
+            return {
+                'overall': self._summary(self.total),
+                'riskHistogram': [
+                    {'from': i / HISTOGRAM_BINS, 'to': (i + 1) / HISTOGRAM_BINS, 'count': count}
+                    for i, count in enumerate(self.histogram)
+                ],
+                'byDegree': {degree: self._summary(group) for degree, group in self.by_degree.items()},
+                'byStudyHours': {bucket: self._summary(group) for bucket, group in self.by_study_hours.items()},
+                'overTime': [{'date': day, **self._summary(self.daily[day])} for day in recent_days]
+            }
+
+
+def prediction_entry(input_data, row, prediction, probability, timestamp=None):
+    """
+    Stored form of one prediction. row is the encoded feature vector the model scored; the
+    entry is not linked to a user.
+    """
+    return {
+        'timestamp': timestamp or datetime.utcnow().isoformat(),
+        'prediction': prediction,
+        'probability': probability,
+        'degree': DEGREE_LABELS.get(int(row[DEGREE_INDEX]), str(input_data.get('Degree'))),
+        'studyHours': float(row[STUDY_HOURS_INDEX]),
+        'features': input_data
+    }
@@ -0,0 +1,183 @@
+"""
+Shared cache of LLM responses: an in-memory LRU in front of a SQLite file.
+
+Entries are keyed by a SHA-256 of the model, the messages (whitespace-normalised) and the
+generation parameters, so byte-identical prompts are answered without an OpenRouter call.
+Entries are fresh for `ttl` seconds; expired entries are kept for another `stale_ttl` seconds
+and served only when the upstream call fails. The SQLite file is shared by every worker
+process and survives restarts; beyond max_disk_entries the least recently used rows are
+deleted.
+"""
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+DEFAULT_TTL = 24 * 3600
+DEFAULT_STALE_TTL = 7 * 24 * 3600
+DEFAULT_MEMORY_ENTRIES = 1000
+DEFAULT_DISK_ENTRIES = 50000
+# Disk size is checked once per this many stores
+_EVICTION_INTERVAL = 100
+
+
+def cache_key(model, messages, **params):
+    """
+    Hash of model, messages and generation parameters (max_tokens, temperature, ...).
+    """
+    normalized = [{'role': message['role'], 'content': ' '.join(str(message['content']).split())} for message in messages]
+    payload = json.dumps({'model': model, 'messages': normalized, 'params': params}, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class LLMCache:
+    """
+    Thread-safe two-level cache; path=None keeps it in memory only.
+    """
+
+    def __init__(self, path=None, ttl=DEFAULT_TTL, stale_ttl=DEFAULT_STALE_TTL, max_memory_entries=DEFAULT_MEMORY_ENTRIES,
+                 max_disk_entries=DEFAULT_DISK_ENTRIES, clock=time.time):
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_memory_entries = max_memory_entries
+        self.max_disk_entries = max_disk_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        # key -> (value, created), least recently used first
+        self._memory = OrderedDict()
+        self._stores = 0
+        self.counts = {'memoryHits': 0, 'diskHits': 0, 'misses': 0, 'staleServed': 0, 'upstreamErrors': 0, 'evictions': 0}
+        self._db = None
+        if path:
+            try:
+                self._db = sqlite3.connect(path, check_same_thread=False, timeout=5)
+                self._db.execute('PRAGMA journal_mode=WAL')
+                self._db.execute(
+                    'CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL, accessed REAL NOT NULL)'
+                )
+                self._db.execute('CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)')
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.error(f"LLM cache database {path} unavailable, caching in memory only: {e}")
+                self._db = None
+
+    def _remember(self, key, value, created):
+        self._memory[key] = (value, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_entries:
+            self._memory.popitem(last=False)
+
+    def lookup(self, key):
+        """
+        (value, created, level) for a key that is fresh or still servable as stale, or None;
+        level is 'memory' or 'disk'.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None and now - entry[1] > self.ttl + self.stale_ttl:
+                del self._memory[key]
+                entry = None
+            if entry is not None:
+                self._memory.move_to_end(key)
+                return entry[0], entry[1], 'memory'
+            if self._db is None:
+                return None
+            try:
+                row = self._db.execute('SELECT value, created FROM llm_cache WHERE key = ?', (key,)).fetchone()
+                if row is None or now - row[1] > self.ttl + self.stale_ttl:
+                    return None
+                self._db.execute('UPDATE llm_cache SET accessed = ? WHERE key = ?', (now, key))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"LLM cache read failed: {e}")
+                return None
+            value = json.loads(row[0])
+            self._remember(key, value, row[1])
+            return value, row[1], 'disk'
+
+    def store(self, key, value):
+        now = self.clock()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._db is None:
+                return
+            try:
+                self._db.execute('INSERT OR REPLACE INTO llm_cache (key, value, created, accessed) VALUES (?, ?, ?, ?)',
+                                 (key, json.dumps(value), now, now))
+                self._stores += 1
+                if self._stores % _EVICTION_INTERVAL == 0:
+                    self._evict(now)
+                self._db.commit()
+            except sqlite3.Error as e:
+                logging.warning(f"LLM cache write failed: {e}")
+
+    def _evict(self, now):
+        cursor = self._db.execute('DELETE FROM llm_cache WHERE created < ?', (now - self.ttl - self.stale_ttl,))
+        evicted = cursor.rowcount
+        excess = self._db.execute('SELECT COUNT(*) FROM llm_cache').fetchone()[0] - self.max_disk_entries
+        if excess > 0:
+            cursor = self._db.execute(
+                'DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed LIMIT ?)', (excess,)
+            )
+            evicted += cursor.rowcount
+        self.counts['evictions'] += evicted
+
+    def fetch(self, key, call):
+        """
+        Cached value of call() under key, as (value, status) with status 'hit', 'miss' or
+        'stale'. When call() raises, an expired entry is served instead if one is still kept;
+        otherwise the error propagates. Empty results are returned but not cached.
+        """
+        entry = self.lookup(key)
+        if entry is not None and self.clock() - entry[1] <= self.ttl:
+            with self._lock:
+                self.counts[f'{entry[2]}Hits'] += 1
+            return entry[0], 'hit'
+        try:
+            value = call()
+        except Exception as e:
+            with self._lock:
+                self.counts['upstreamErrors'] += 1
+                if entry is not None:
+                    self.counts['staleServed'] += 1
+            if entry is None:
+                raise
+            logging.warning(f"Upstream LLM call failed ({e}); serving a cached response {int(self.clock() - entry[1])}s old")
+            return entry[0], 'stale'
+        with self._lock:
+            self.counts['misses'] += 1
+        if value:
+            self.store(key, value)
+        return value, 'miss'
+
+    def stats(self):
+        with self._lock:
+            counts = dict(self.counts)
+            memory_entries = len(self._memory)
+        hits = counts['memoryHits'] + counts['diskHits']
+        lookups = hits + counts['misses'] + counts['staleServed']
+        return {
+            **counts,
+            'hitRate': hits / lookups if lookups else None,
+            'memoryEntries': memory_entries,
+            'persistent': self._db is not None
+        }
+
+
+def llm_cache_from_env(default_path='llm_cache.sqlite3'):
+    """
+    LLMCache configured by LLM_CACHE_PATH ('' keeps it in memory only), LLM_CACHE_TTL,
+    LLM_CACHE_STALE_TTL, LLM_CACHE_MEMORY_ENTRIES and LLM_CACHE_DISK_ENTRIES.
+    """
+    return LLMCache(
+        path=os.getenv('LLM_CACHE_PATH', default_path) or None,
+        ttl=float(os.getenv('LLM_CACHE_TTL', DEFAULT_TTL)),
+        stale_ttl=float(os.getenv('LLM_CACHE_STALE_TTL', DEFAULT_STALE_TTL)),
+        max_memory_entries=int(os.getenv('LLM_CACHE_MEMORY_ENTRIES', DEFAULT_MEMORY_ENTRIES)),
+        max_disk_entries=int(os.getenv('LLM_CACHE_DISK_ENTRIES', DEFAULT_DISK_ENTRIES))
+    )
@@ -0,0 +1,185 @@
+"""
+Token budgeting for the essay prompt.
+
+Token counts are estimated locally, without a tokenizer download. When the full prompt would
+exceed the budget, the space left after the fixed instructions is shared between Q1-Q3
+(short answers are kept verbatim, long ones split what remains) and each long answer is
+condensed extractively: it is cut into chunks, every chunk keeps its most salient sentences
+in proportion to its size, and the kept sentences are joined in their original order.
+"""
+import math
+import re
+from collections import Counter
+
+from essay_screen import FLAG_RE
+
+CHARS_PER_TOKEN = 4
+# Roughly the size of one paragraph; every chunk of a long answer is represented in the summary
+CHUNK_TOKENS = 200
+OMISSION = ' [...] '
+
+_SENTENCE_RE = re.compile(r'[^.!?\n]+[.!?]*')
+_WORD_RE = re.compile(r"[a-z][a-z']*")
+_FIRST_PERSON = {'i', "i'm", "i've", "i'd", "i'll", 'me', 'my', 'myself'}
+STOPWORDS = {
+    'a', 'an', 'and', 'are', 'as', 'at', 'be', 'but', 'by', 'for', 'from', 'had', 'has', 'have', 'he', 'her',
+    'his', 'in', 'is', 'it', 'its', 'of', 'on', 'or', 'she', 'so', 'that', 'the', 'their', 'them', 'then',
+    'there', 'they', 'this', 'to', 'was', 'we', 'were', 'what', 'when', 'which', 'with', 'you', 'your',
+} | _FIRST_PERSON
+
+
+def estimate_tokens(text):
+    """
+    Local token estimate: the larger of 4 characters or 3/4 of a word per token, which errs
+    high for English prose on the Llama tokenizers.
+    """
+    if not text:
+        return 0
+    return math.ceil(max(len(text) / CHARS_PER_TOKEN, len(text.split()) * 4 / 3))
+
+
+def split_sentences(text, max_tokens=CHUNK_TOKENS):
+    """
+    Sentences of text; runs without punctuation longer than max_tokens are split into word windows.
+    """
+    sentences = []
+    for sentence in _SENTENCE_RE.findall(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if estimate_tokens(sentence) <= max_tokens:
+            sentences.append(sentence)
+            continue
+        words = sentence.split()
+        window = max(1, int(max_tokens * 3 / 4))
+        sentences.extend(' '.join(words[i:i + window]) for i in range(0, len(words), window))
+    return sentences
+
+
+def allocate(lengths, available):
+    """
+    Split `available` tokens between answers of the given lengths: answers shorter than an
+    equal share keep everything and the rest share what is left equally.
+    """
+    shares = [0] * len(lengths)
+    remaining = max(available, 0)
+    pending = sorted(range(len(lengths)), key=lengths.__getitem__)
+    while pending:
+        fair = remaining // len(pending)
+        if lengths[pending[0]] > fair:
+            for i in pending:
+                shares[i] = fair
+            break
+        i = pending.pop(0)
+        shares[i] = lengths[i]
+        remaining -= lengths[i]
+    return shares
+
+
+def _salience(sentences):
+    # Sentences about what the answer keeps returning to score high, self-referential ones higher,
+    # and mentions of self-harm are always kept
+    words = [_WORD_RE.findall(sentence.lower()) for sentence in sentences]
+    content = [[word for word in sentence_words if word not in STOPWORDS] for sentence_words in words]
+    frequency = Counter(word for sentence_words in content for word in set(sentence_words))
+    scores = []
+    for sentence, sentence_words, content_words in zip(sentences, words, content):
+        if FLAG_RE.search(sentence.lower()):
+            scores.append(math.inf)
+            continue
+        score = sum(frequency[word] for word in content_words) / math.sqrt(len(content_words)) if content_words else 0.0
+        if _FIRST_PERSON.intersection(sentence_words):
+            score *= 1.5
+        scores.append(score)
+    return scores
+
+
+def condense(text, budget, chunk_tokens=CHUNK_TOKENS):
+    """
+    Extractive summary of text within about `budget` estimated tokens.
+    """
+    if estimate_tokens(text) <= budget:
+        return text
+    sentences = split_sentences(text, chunk_tokens)
+    costs = [estimate_tokens(sentence) for sentence in sentences]
+    scores = _salience(sentences)
+
+    # Map: each chunk keeps its best sentences within its proportional share; unused share carries over
+    chunks, current, size = [], [], 0
+    for i, cost in enumerate(costs):
+        if current and size + cost > chunk_tokens:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(i)
+        size += cost
+    chunks.append(current)
+    total = sum(costs)
+    omission_cost = estimate_tokens(OMISSION)
+    kept, kept_text, carry = set(), set(), 0.0
+    for chunk in chunks:
+        share = budget * sum(costs[i] for i in chunk) / total + carry
+        for i in sorted(chunk, key=scores.__getitem__, reverse=True):
+            # A sentence repeated verbatim is only worth keeping once
+            if sentences[i].lower() in kept_text:
+                continue
+            if scores[i] == math.inf or costs[i] + omission_cost <= share:
+                kept.add(i)
+                kept_text.add(sentences[i].lower())
+                share -= costs[i] + omission_cost
+        carry = share
+
+    # Reduce: drop the least salient sentences until the joined summary fits
+    def joined():
+        parts, previous = [], -1
+        for i in sorted(kept):
+            if i != previous + 1:
+                parts.append(OMISSION.strip())
+            parts.append(sentences[i])
+            previous = i
+        if previous != len(sentences) - 1:
+            parts.append(OMISSION.strip())
+        return ' '.join(parts)
+
+    summary = joined()
+    while kept and estimate_tokens(summary) > budget:
+        kept.remove(min(kept, key=scores.__getitem__))
+        summary = joined()
+    if not kept:
+        # Not even one sentence fits: fall back to the start of the text
+        return text[:max(budget, 1) * CHARS_PER_TOKEN].rsplit(' ', 1)[0] + OMISSION.rstrip()
+    return summary
+
+
+def fit_prompt(responses, build_prompt, budget):
+    """
+    Build the prompt from responses ({key: text}), condensing answers so the prompt fits
+    `budget` estimated tokens. Returns (prompt, info) with the original and final estimates
+    and which answers were condensed.
+    """
+    prompt = build_prompt(responses)
+    original_tokens = estimate_tokens(prompt)
+    info = {'original_prompt_tokens': original_tokens, 'estimated_prompt_tokens': original_tokens, 'condensed': []}
+    if original_tokens <= budget:
+        return prompt, info
+
+    keys = list(responses)
+    lengths = [estimate_tokens(responses[key]) for key in keys]
+    available = budget - estimate_tokens(build_prompt({key: '' for key in responses}))
+    # Estimates of the parts do not add up exactly to the estimate of the whole, so shrink and retry on overflow
+    for _ in range(3):
+        fitted = {key: condense(responses[key], share) for key, share in zip(keys, allocate(lengths, available))}
+        prompt = build_prompt(fitted)
+        overflow = estimate_tokens(prompt) - budget
+        if overflow <= 0:
+            break
+        available -= overflow
+    info['estimated_prompt_tokens'] = estimate_tokens(prompt)
+    info['condensed'] = [key for key in keys if fitted[key] != responses[key]]
+    return prompt, info
+
+
+def request_cost(prompt_tokens, completion_tokens, prompt_price, completion_price):
+    """
+    USD cost of one call from per-million-token prices.
+    """
+    return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1e6
@@ -0,0 +1,476 @@
+"""
+In-process gateway for OpenAI-compatible chat completions (OpenRouter by default).
+
+Every service talks to the LLM through one LLMGateway, which exposes the
+client.chat.completions.create(...) call of the OpenAI SDK so existing call sites are unchanged.
+Requests share a pooled keep-alive HTTP session. Each model has its own lane: a slot count caps
+the calls in flight, a bounded FIFO queue holds the callers waiting for a slot, and a circuit breaker
+stops sending to a model after consecutive failed requests until a cooldown has passed.
+Connection errors, timeouts, 429 and 5xx responses are retried with full-jitter exponential
+backoff (honouring Retry-After); when a model's breaker is open, its queue is full or its retries
+are exhausted, the request moves on to the fallback models, if any are configured (a fallback
+can cost money where the primary is free, so none are used unless LLM_FALLBACK_MODELS lists
+them). Every response carries served_model, and calls served by a fallback are logged. Latency
+of every call is recorded in a per-model histogram.
+
+Point LLM_BASE_URL at a local OpenAI-compatible server (e.g. llm_stub_server.py) to run a service
+without OpenRouter.
+"""
+import json
+import logging
+import os
+import random
+import threading
+import time
+from collections import deque
+from types import SimpleNamespace
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_BASE_URL = 'https://openrouter.ai/api/v1'
+# Opt-in: e.g. 'meta-llama/llama-3.1-8b-instruct', the paid variant of the :free model the reports use
+DEFAULT_FALLBACK_MODELS = ''
+DEFAULT_MAX_CONCURRENCY = 8
+DEFAULT_MAX_QUEUE = 32
+DEFAULT_QUEUE_TIMEOUT = 10.0
+DEFAULT_MAX_RETRIES = 2
+DEFAULT_BACKOFF_BASE = 0.5
+DEFAULT_BACKOFF_MAX = 8.0
+DEFAULT_CONNECT_TIMEOUT = 5.0
+DEFAULT_READ_TIMEOUT = 60.0
+DEFAULT_BREAKER_THRESHOLD = 5
+DEFAULT_BREAKER_COOLDOWN = 30.0
+DEFAULT_POOL_SIZE = 16
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+
+class LLMGatewayError(Exception):
+    """
+    A failed completion; retryable errors are worth trying again or on another model.
+    """
+
+    def __init__(self, message, status=None, retryable=True, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+
+class LLMUnavailable(LLMGatewayError):
+    """
+    No model could take the request: every breaker is open or every queue is full.
+    """
+
+
+class CompletionObject(SimpleNamespace):
+    """
+    Attribute view of a JSON object where absent fields read as None, like the OpenAI SDK's
+    optional fields (e.g. the empty delta of a final stream chunk has no content).
+    """
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return None
+
+
+def _namespace(value):
+    # JSON to attribute access, so responses read like the OpenAI SDK's objects
+    if isinstance(value, dict):
+        return CompletionObject(**{key: _namespace(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return [_namespace(item) for item in value]
+    return value
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class LatencyHistogram:
+    """
+    Cumulative latency histogram with fixed buckets; percentiles are bucket upper bounds.
+    """
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.total = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self.counts[index] += 1
+            self.total += seconds
+
+    def percentile(self, q, counts=None):
+        counts = counts or self.counts
+        target = q * sum(counts)
+        seen = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            seen += count
+            if count and seen >= target:
+                return bound
+        return None
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self.counts)
+            total = self.total
+        observed = sum(counts)
+        bounds = [bound * 1000 for bound in self.buckets] + ['+Inf']
+        return {
+            'count': observed,
+            'meanMs': round(total / observed * 1000, 1) if observed else None,
+            'p50Ms': self._ms(self.percentile(0.5, counts)),
+            'p95Ms': self._ms(self.percentile(0.95, counts)),
+            'p99Ms': self._ms(self.percentile(0.99, counts)),
+            # [upper bound in ms, count] pairs in bucket order
+            'bucketsMs': [list(bucket) for bucket in zip(bounds, counts)]
+        }
+
+    @staticmethod
+    def _ms(bound):
+        return None if bound is None else (bound * 1000 if bound != float('inf') else '+Inf')
+
+
+class CircuitBreaker:
+    """
+    Opens after `threshold` consecutive failed requests; after `cooldown` seconds one trial
+    request is let through (half-open), which closes the breaker on success or reopens it.
+    """
+
+    def __init__(self, threshold=DEFAULT_BREAKER_THRESHOLD, cooldown=DEFAULT_BREAKER_COOLDOWN, clock=time.monotonic):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.times_opened = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return 'closed'
+        return 'half_open' if self.clock() - self.opened_at >= self.cooldown else 'open'
+
+    def allow(self):
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half_open' and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.threshold):
+                if self.opened_at is None:
+                    logging.warning(f"LLM circuit breaker opened after {self.failures} consecutive failures")
+                    self.times_opened += 1
+                self.opened_at = self.clock()
+            self.trial_running = False
+
+    def release_trial(self):
+        # The trial request never reached the model (e.g. it was rejected by the queue)
+        with self._lock:
+            self.trial_running = False
+
+
+class _ModelLane:
+    """
+    Concurrency slots, waiting queue, breaker, counters and latency of one model.
+    """
+
+    def __init__(self, max_concurrency, max_queue, breaker):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.breaker = breaker
+        self.latency = LatencyHistogram()
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        # Callers waiting for a slot, oldest first; a released slot goes straight to the oldest
+        self._waiters = deque()
+        self.counts = {'requests': 0, 'succeeded': 0, 'failed': 0, 'retries': 0, 'rejected': 0, 'servedAsFallback': 0}
+
+    def count(self, name, amount=1):
+        with self._lock:
+            self.counts[name] += amount
+
+    def acquire(self, timeout):
+        """
+        Wait up to `timeout` seconds for a slot, first come first served; False at once when
+        the queue is already full.
+        """
+        with self._lock:
+            if self.in_flight < self.max_concurrency and not self._waiters:
+                self.in_flight += 1
+                return True
+            if len(self._waiters) >= self.max_queue:
+                return False
+            waiter = threading.Event()
+            self._waiters.append(waiter)
+        if waiter.wait(timeout):
+            return True
+        with self._lock:
+            # The slot may have been handed over just as the wait timed out
+            if waiter.is_set():
+                return True
+            self._waiters.remove(waiter)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiters:
+                self._waiters.popleft().set()
+            else:
+                self.in_flight -= 1
+
+    def stats(self):
+        with self._lock:
+            stats = {**self.counts, 'inFlight': self.in_flight, 'waiting': len(self._waiters),
+                     'maxConcurrency': self.max_concurrency, 'maxQueue': self.max_queue}
+        stats['breaker'] = {'state': self.breaker.state, 'consecutiveFailures': self.breaker.failures,
+                            'timesOpened': self.breaker.times_opened}
+        stats['latency'] = self.latency.snapshot()
+        return stats
+
+
+class CompletionStream:
+    """
+    Chunks of a streamed completion (server-sent events). The model's slot is held until the
+    stream is exhausted or closed.
+    """
+
+    def __init__(self, response, on_close, served_model=None):
+        self.response = response
+        self.served_model = served_model
+        self._on_close = on_close
+        self._closed = False
+
+    def __iter__(self):
+        try:
+            lines = self.response.iter_lines(decode_unicode=True)
+            for line in lines:
+                if not line or not line.startswith('data:'):
+                    continue
+                data = line[len('data:'):].strip()
+                if data == '[DONE]':
+                    # Read the end of the body too, so the connection goes back to the pool
+                    for _ in lines:
+                        pass
+                    break
+                chunk = json.loads(data)
+                if 'error' in chunk and not chunk.get('choices'):
+                    raise LLMGatewayError(f"Stream failed: {chunk['error']}", retryable=False)
+                yield _namespace(chunk)
+        finally:
+            self.close()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self.response.close()
+        self._on_close()
+
+
+class LLMGateway:
+    """
+    Thread-safe chat-completions client; use gateway.chat.completions.create(...) like the OpenAI SDK.
+    """
+
+    def __init__(self, api_key=None, base_url=DEFAULT_BASE_URL, fallback_models=(), max_concurrency=DEFAULT_MAX_CONCURRENCY,
+                 max_queue=DEFAULT_MAX_QUEUE, queue_timeout=DEFAULT_QUEUE_TIMEOUT, max_retries=DEFAULT_MAX_RETRIES,
+                 backoff_base=DEFAULT_BACKOFF_BASE, backoff_max=DEFAULT_BACKOFF_MAX,
+                 timeout=(DEFAULT_CONNECT_TIMEOUT, DEFAULT_READ_TIMEOUT), breaker_threshold=DEFAULT_BREAKER_THRESHOLD,
+                 breaker_cooldown=DEFAULT_BREAKER_COOLDOWN, pool_size=DEFAULT_POOL_SIZE, default_headers=None,
+                 clock=time.monotonic, sleep=time.sleep):
+        self.url = base_url.rstrip('/') + '/chat/completions'
+        self.fallback_models = list(fallback_models)
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.timeout = timeout
+        self.breaker_threshold = breaker_threshold
+        self.breaker_cooldown = breaker_cooldown
+        self.clock = clock
+        self.sleep = sleep
+        self.session = requests.Session()
+        # Keep-alive pool sized to the concurrency of all lanes; retries are done here, not by urllib3
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        self.session.headers.update({'Content-Type': 'application/json', **(default_headers or {})})
+        if api_key:
+            self.session.headers['Authorization'] = f"Bearer {api_key}"
+        self._lanes = {}
+        self._lanes_lock = threading.Lock()
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def _lane(self, model):
+        with self._lanes_lock:
+            lane = self._lanes.get(model)
+            if lane is None:
+                breaker = CircuitBreaker(self.breaker_threshold, self.breaker_cooldown, self.clock)
+                lane = self._lanes[model] = _ModelLane(self.max_concurrency, self.max_queue, breaker)
+            return lane
+
+    def create(self, model, messages, stream=False, extra_headers=None, extra_body=None, **params):
+        """
+        Chat completion from `model`, or from the first fallback model that can serve it. Returns
+        a response object (or a CompletionStream when stream=True) whose served_model names the
+        model that answered; raises LLMGatewayError.
+        """
+        payload = {'messages': messages, **params, **(extra_body or {})}
+        if stream:
+            payload['stream'] = True
+        last_error = None
+        for candidate in [model] + [fallback for fallback in self.fallback_models if fallback != model]:
+            lane = self._lane(candidate)
+            lane.count('requests')
+            if lane.breaker.state == 'open' or not lane.acquire(self.queue_timeout):
+                lane.count('rejected')
+                continue
+            if not lane.breaker.allow():
+                lane.release()
+                lane.count('rejected')
+                continue
+            try:
+                response = self._send(lane, {**payload, 'model': candidate}, extra_headers, stream)
+            except LLMGatewayError as e:
+                lane.release()
+                lane.count('failed')
+                if not e.retryable:
+                    raise
+                logging.warning(f"LLM model {candidate} failed: {e}")
+                last_error = e
+                continue
+            except BaseException:
+                lane.release()
+                lane.breaker.release_trial()
+                raise
+            lane.count('succeeded')
+            if candidate != model:
+                lane.count('servedAsFallback')
+                logging.warning(f"LLM request for {model} served by fallback {candidate}")
+            if stream:
+                return CompletionStream(response, lane.release, candidate)
+            lane.release()
+            response.served_model = candidate
+            return response
+        if last_error is not None:
+            raise last_error
+        raise LLMUnavailable(f"No LLM model available for {model}: circuit open or queue full")
+
+    def _send(self, lane, payload, extra_headers, stream):
+        # One request with retries; the breaker sees its final outcome
+        for attempt in range(self.max_retries + 1):
+            started = self.clock()
+            try:
+                response = self.session.post(self.url, json=payload, headers=extra_headers, timeout=self.timeout, stream=stream)
+            except requests.exceptions.RequestException as e:
+                error = LLMGatewayError(f"{type(e).__name__}: {e}")
+            else:
+                lane.latency.observe(self.clock() - started)
+                result, error = self._read(response, stream)
+                if error is None:
+                    lane.breaker.record_success()
+                    return result
+                response.close()
+                if not error.retryable:
+                    # The request was at fault, not the model
+                    lane.breaker.record_success()
+                    raise error
+            if attempt == self.max_retries:
+                break
+            lane.count('retries')
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if error.retry_after is not None:
+                delay = min(max(delay, error.retry_after), self.backoff_max)
+            self.sleep(delay)
+        lane.breaker.record_failure()
+        raise error
+
+    @staticmethod
+    def _read(response, stream):
+        """
+        (completion, None) for a usable response (the response itself when streaming), else
+        (None, the LLMGatewayError it stands for).
+        """
+        if response.status_code >= 400:
+            return None, LLMGatewayError(
+                f"HTTP {response.status_code}: {response.text[:200]}", status=response.status_code,
+                retryable=response.status_code in _RETRYABLE_STATUSES, retry_after=_retry_after(response)
+            )
+        if stream:
+            return response, None
+        try:
+            body = response.json()
+        except ValueError:
+            return None, LLMGatewayError(f"Invalid JSON in response: {response.text[:200]}", status=response.status_code)
+        # OpenRouter reports some upstream failures as a 200 with an error body
+        if isinstance(body, dict) and 'error' in body and not body.get('choices'):
+            error = body['error'] if isinstance(body['error'], dict) else {'message': body['error']}
+            code = error.get('code')
+            return None, LLMGatewayError(
+                f"Upstream error {code}: {error.get('message')}", status=code,
+                retryable=not isinstance(code, int) or code in _RETRYABLE_STATUSES
+            )
+        return _namespace(body), None
+
+    def stats(self):
+        with self._lanes_lock:
+            lanes = dict(self._lanes)
+        return {
+            'fallbackModels': self.fallback_models,
+            'models': {model: lane.stats() for model, lane in lanes.items()}
+        }
+
+
+def llm_gateway_from_env(**kwargs):
+    """
+    LLMGateway for OPENROUTER_API_KEY, configured by LLM_BASE_URL, LLM_FALLBACK_MODELS (comma-separated,
+    '' for none), LLM_MAX_CONCURRENCY, LLM_MAX_QUEUE, LLM_QUEUE_TIMEOUT, LLM_MAX_RETRIES,
+    LLM_CONNECT_TIMEOUT, LLM_READ_TIMEOUT, LLM_BREAKER_THRESHOLD, LLM_BREAKER_COOLDOWN and
+    LLM_POOL_SIZE; keyword arguments override them.
+    """
+    settings = dict(
+        api_key=os.getenv('OPENROUTER_API_KEY'),
+        base_url=os.getenv('LLM_BASE_URL', DEFAULT_BASE_URL),
+        fallback_models=[model.strip() for model in os.getenv('LLM_FALLBACK_MODELS', DEFAULT_FALLBACK_MODELS).split(',')
+                         if model.strip()],
+        max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', DEFAULT_MAX_CONCURRENCY)),
+        max_queue=int(os.getenv('LLM_MAX_QUEUE', DEFAULT_MAX_QUEUE)),
+        queue_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT', DEFAULT_QUEUE_TIMEOUT)),
+        max_retries=int(os.getenv('LLM_MAX_RETRIES', DEFAULT_MAX_RETRIES)),
+        timeout=(float(os.getenv('LLM_CONNECT_TIMEOUT', DEFAULT_CONNECT_TIMEOUT)),
+                 float(os.getenv('LLM_READ_TIMEOUT', DEFAULT_READ_TIMEOUT))),
+        breaker_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', DEFAULT_BREAKER_THRESHOLD)),
+        breaker_cooldown=float(os.getenv('LLM_BREAKER_COOLDOWN', DEFAULT_BREAKER_COOLDOWN)),
+        pool_size=int(os.getenv('LLM_POOL_SIZE', DEFAULT_POOL_SIZE)),
+    )
+    settings.update(kwargs)
+    return LLMGateway(**settings)
@@ -0,0 +1,71 @@
+"""
+Score-only LLM calls: ask for just the '<label>: X%' line and stop reading once it arrives.
+
+Callers that only need the probability skip the 500-1000 token narrative. The completion is
+requested with a tiny max_tokens, streamed, and closed as soon as the score line is complete.
+The inputs are kept under a full_report_id for a while, so the full narrative can still be
+requested later without sending them again.
+"""
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from llm_streaming import ProbabilityWatcher, completion_deltas
+
+# Enough for 'Academic Stress Probability: 100%' plus a little slack
+SCORE_ONLY_MAX_TOKENS = 16
+PENDING_REPORT_TTL = 3600
+PENDING_REPORT_MAX_ENTRIES = 10000
+
+
+def score_instruction(label):
+    return (f"Respond with exactly one line in the format '{label}: X%', where X is a number between 0 and 100, "
+            "and nothing else.")
+
+
+def read_score(client, label, **kwargs):
+    """
+    Stream a completion and stop at the first complete '<label>: X%'. Returns the score (None
+    if the model never wrote the line), the text read and whether reading stopped before the
+    model finished.
+    """
+    watcher = ProbabilityWatcher(label)
+    for delta in completion_deltas(client, max_tokens=SCORE_ONLY_MAX_TOKENS, **kwargs):
+        if watcher.feed(delta) is not None:
+            return watcher.value, watcher.text, True
+    return watcher.value, watcher.text, False
+
+
+class PendingReports:
+    """
+    Inputs of score-only requests, kept under an id until the full report is asked for.
+    """
+
+    def __init__(self, ttl=PENDING_REPORT_TTL, max_entries=PENDING_REPORT_MAX_ENTRIES, clock=time.monotonic):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def put(self, payload):
+        report_id = uuid.uuid4().hex
+        with self._lock:
+            self._entries[report_id] = (self.clock() + self.ttl, payload)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return report_id
+
+    def get(self, report_id):
+        """
+        The stored payload, or None if the id is unknown or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(report_id)
+            if entry is None:
+                return None
+            if entry[0] < self.clock():
+                del self._entries[report_id]
+                return None
+            return entry[1]
@@ -0,0 +1,76 @@
+"""
+Train the local essay pre-screen used by essay_model.py.
+
+Input is a CSV or NDJSON file with either a text column or Q1, Q2 and Q3 columns, and either
+a label column (0/1) or a probability column (0-100, e.g. the Depression Probability of past
+LLM reports, to distil the LLM). Writes the weights as an .npz file for ESSAY_SCREEN_MODEL.
+
+Usage: python train_essay_screen.py essays.csv essay_screen_model.npz [--epochs 5] [--holdout 0.1] [--seed 0]
+"""
+import argparse
+import csv
+import json
+import logging
+
+import numpy as np
+
+from essay_screen import N_FEATURES, EssayScreen, essay_text
+
+
+def read_examples(path):
+    """
+    (texts, targets in [0, 1]) from a CSV or NDJSON file.
+    """
+    with open(path, encoding='utf-8', newline='') as f:
+        if path.endswith(('.ndjson', '.jsonl')):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            rows = list(csv.DictReader(f))
+
+    texts, targets = [], []
+    for row in rows:
+        text = row.get('text') or essay_text({key: row.get(key) or '' for key in ('Q1', 'Q2', 'Q3')})
+        if row.get('label') not in (None, ''):
+            target = float(row['label'])
+        elif row.get('probability') not in (None, ''):
+            target = float(row['probability']) / 100
+        else:
+            continue
+        texts.append(text)
+        targets.append(min(max(target, 0.0), 1.0))
+    return texts, np.array(targets)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the hashed n-gram essay pre-screen.")
+    parser.add_argument('input', help="CSV or NDJSON with text (or Q1-Q3) and label or probability")
+    parser.add_argument('output', help="output .npz model")
+    parser.add_argument('--epochs', type=int, default=5)
+    parser.add_argument('--learning-rate', type=float, default=0.5)
+    parser.add_argument('--n-features', type=int, default=N_FEATURES, help="hashed feature space size")
+    parser.add_argument('--holdout', type=float, default=0.1, help="fraction held out for evaluation")
+    parser.add_argument('--seed', type=int, default=0, help="seed of the shuffle before the holdout split")
+    args = parser.parse_args(argv)
+
+    texts, targets = read_examples(args.input)
+    # Shuffle first: exported files are usually ordered (by date or label), so the tail is not a fair sample
+    order = np.random.default_rng(args.seed).permutation(len(texts))
+    texts, targets = [texts[i] for i in order], targets[order]
+    split = int(len(texts) * (1 - args.holdout))
+    screen = EssayScreen.train(texts[:split], targets[:split], epochs=args.epochs,
+                               learning_rate=args.learning_rate, n_features=args.n_features)
+    screen.save(args.output)
+    logging.info(f"Trained on {split} essays, saved to {args.output}")
+
+    if split < len(texts):
+        probabilities = np.array([screen.probability(text) for text in texts[split:]])
+        held_out = targets[split:]
+        confident = (probabilities < screen.low) | (probabilities > screen.high)
+        agreement = ((probabilities > 0.5) == (held_out > 0.5))[confident].mean() if confident.any() else float('nan')
+        logging.info(f"Held out {len(held_out)}: {confident.mean():.1%} answered locally, "
+                     f"{agreement:.1%} of those agree with the label")
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    main()
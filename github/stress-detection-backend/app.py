@@ -6,8 +6,8 @@ from tensorflow.keras.models import load_model
 from tensorflow.keras.applications.resnet50 import preprocess_input
 from tensorflow.keras.metrics import MeanSquaredError
 from flask_cors import CORS
+from image_decode import UploadRequest, decode_grayscale
 import logging
-import tempfile
 import requests
 import re
 
@@ -19,9 +19,9 @@ app = Flask(__name__)
 # Configure CORS using the FRONTEND_URL environment variable
 CORS(app, resources={r"/api/*": {"origins": os.getenv("FRONTEND_URL", "http://localhost:3000")}})
 
-# Use a temporary directory for uploads on Render
-UPLOAD_FOLDER = tempfile.gettempdir()
-app.config['UPLOAD_FOLDER'] = UPLOAD_FOLDER
+# Uploads are decoded in memory from pooled buffers; nothing is written to disk
+app.request_class = UploadRequest
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
 
 # Load the stress detection model
 MODEL_PATH = os.path.join(os.path.dirname(__file__), 'stress_model.h5')
@@ -94,11 +94,9 @@ except Exception as e:
 # Log after model loading attempt
 logging.info("Model loading attempt completed. Model is None: %s", model is None)
 
-def load_and_preprocess_image(image_path):
-    # Load the image in grayscale (FER2013 images are grayscale)
-    img = cv2.imread(image_path, cv2.IMREAD_GRAYSCALE)
-    if img is None:
-        raise ValueError(f"Could not load image from {image_path}")
+def load_and_preprocess_image(data):
+    # Decode the uploaded bytes in grayscale (FER2013 images are grayscale), reduced for large photos
+    img = decode_grayscale(data)
     
     # Resize to 224x224 (model input size)
     img = cv2.resize(img, (224, 224))
@@ -126,23 +124,25 @@ def predict_stress():
         logging.error("Stress detection model not loaded")
         return jsonify({'error': 'Stress detection model not loaded'}), 500
 
-    if 'image' not in request.files:
-        logging.error("No image uploaded in request")
-        return jsonify({'error': 'No image uploaded'}), 400
-    
-    file = request.files['image']
-    if file.filename == '':
-        logging.error("No image selected")
-        return jsonify({'error': 'No image selected'}), 400
-    
-    # Save the uploaded image to the temporary directory
-    image_path = os.path.join(app.config['UPLOAD_FOLDER'], file.filename)
-    file.save(image_path)
-    logging.debug(f"Image saved to {image_path}")
+    if request.mimetype.startswith('image/'):
+        # Raw image body: read straight from the request stream
+        upload = request.upload_body()
+    else:
+        if 'image' not in request.files:
+            logging.error("No image uploaded in request")
+            return jsonify({'error': 'No image uploaded'}), 400
+
+        file = request.files['image']
+        if file.filename == '':
+            logging.error("No image selected")
+            return jsonify({'error': 'No image selected'}), 400
+        # The form parser wrote the file into a pooled in-memory buffer
+        upload = file.stream
+    logging.debug(f"Image received in memory: {len(upload.array())} bytes")
     
     try:
-        # Load and preprocess the image
-        img = load_and_preprocess_image(image_path)
+        # Decode and preprocess the image
+        img = load_and_preprocess_image(upload.array())
         
         # Make prediction
         stress_level = model.predict(img)[0][0]
@@ -155,11 +155,6 @@ def predict_stress():
     except Exception as e:
         logging.error(f"Error during prediction: {e}")
         return jsonify({'error': str(e)}), 500
-    finally:
-        # Clean up: delete the uploaded image
-        if os.path.exists(image_path):
-            os.remove(image_path)
-            logging.debug(f"Image deleted from {image_path}")
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 5001))
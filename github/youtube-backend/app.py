@@ -2,8 +2,19 @@ from flask import Flask, jsonify, request
 from flask_cors import CORS
 import logging
 from datetime import datetime, timedelta
-import requests
 import os
+import atexit
+import hashlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from sentiment import score_texts
+from youtube_metrics import MetricsAccumulator, parse_report_projection, project_report
+from video_cache import VideoAnalysisCache
+from report_store import StoredReport, PackedMetricsState, compact_metrics
+from google_api import GoogleAPIClient, Deadline, DEFAULT_TIMEOUT, LIKED_VIDEOS_FIELDS, COMMENT_THREADS_FIELDS
+from youtube_quota import QuotaScheduler, QuotaExhaustedError, INTERACTIVE, BACKGROUND, PRIORITIES
+from report_scheduler import ReportRefreshScheduler, parse_hour_ranges
 
 # Configure logging
 logging.basicConfig(level=logging.DEBUG)
@@ -28,12 +39,70 @@ if not client_id or not client_secret:
 # Mock database (bypassing MongoDB for testing)
 mock_db = {}
 
+# YouTube Data API base URL (overridable so the service can be pointed at a local fake server)
+YOUTUBE_API_BASE = os.getenv("YOUTUBE_API_BASE", "https://www.googleapis.com/youtube/v3")
+
+# Maximum number of commentThreads requests in flight for a single analysis
+COMMENT_FETCH_CONCURRENCY = int(os.getenv("COMMENT_FETCH_CONCURRENCY", 8))
+
+# Pooled Google API client with ETag caching (bodies kept up to ETAG_CACHE_MAX_MB), fields projections and gzip
+google_api = GoogleAPIClient(
+    pool_size=max(32, COMMENT_FETCH_CONCURRENCY),
+    max_etag_bytes=int(float(os.getenv("ETAG_CACHE_MAX_MB", 32)) * 1024 * 1024)
+)
+
+# YouTube Data API quota budget shared by all users; interactive analyses may wait this long for quota
+youtube_quota = QuotaScheduler(daily_budget=int(os.getenv("YOUTUBE_DAILY_QUOTA", 10000)))
+QUOTA_WAIT_SECONDS = float(os.getenv("QUOTA_WAIT_SECONDS", 5))
+
+# Overall time budget for one /api/analyze-youtube call, shared by all of its outbound requests
+ANALYSIS_DEADLINE_SECONDS = float(os.getenv("ANALYSIS_DEADLINE_SECONDS", 20))
+
+# Liked-video paging: page size is the API maximum, the page cap bounds the cost of a single analysis
+LIKED_VIDEOS_PAGE_SIZE = 50
+MAX_LIKED_VIDEO_PAGES = int(os.getenv("MAX_LIKED_VIDEO_PAGES", 20))
+ANALYSIS_WINDOW_DAYS = 60
+
+# Shared cross-user cache of per-video analysis results, persisted across restarts if VIDEO_CACHE_PATH is set
+video_cache = VideoAnalysisCache(
+    max_size=int(os.getenv("VIDEO_CACHE_MAX_SIZE", 50000)),
+    ttl=int(os.getenv("VIDEO_CACHE_TTL", 7 * 24 * 3600)),
+    path=os.getenv("VIDEO_CACHE_PATH")
+)
+video_cache.load()
+atexit.register(video_cache.save)
+
+class YouTubeAPIError(Exception):
+    """
+    Raised when the YouTube Data API returns a non-200 response that the analysis cannot recover from.
+    """
+    def __init__(self, message, details=None, status_code=500):
+        super().__init__(message)
+        self.details = details
+        self.status_code = status_code
+
+class AnalysisInProgressError(YouTubeAPIError):
+    """
+    Raised when another analysis of the same user did not finish within the caller's deadline.
+    """
+    def __init__(self, user_id):
+        super().__init__(f"An analysis for user {user_id} is already running, please try again shortly", status_code=409)
+
+# One analysis at a time per user: concurrent runs would overwrite each other's youtube_* state and cursor
+analysis_locks = {}
+analysis_locks_guard = threading.Lock()
+
+def user_analysis_lock(user_id):
+    with analysis_locks_guard:
+        return analysis_locks.setdefault(user_id, threading.Lock())
+
 # Helper Functions
 def analyze_sentiment(text):
     """
-    Placeholder for sentiment analysis. Returns a sentiment score between 0 and 100.
+    Score a single text with the local sentiment engine. Returns a sentiment score between 0 and 100.
+    Prefer score_texts for more than one text: it scores a whole batch in one vectorized call.
     """
-    return 50  # Example: 0 (negative) to 100 (positive)
+    return float(score_texts([text])[0])  # 0 (negative) to 100 (positive)
 
 def categorize_emotion(sentiment_score):
     """
@@ -48,19 +117,271 @@ def categorize_emotion(sentiment_score):
     else:
         return 'energetic'
 
-def generate_mental_health_report(video_data):
+def parse_liked_video(video, cutoff_date):
+    """
+    Extract the fields used by the analysis from a liked-video item.
+    Returns None if the video has no valid publishedAt or was published before cutoff_date.
+    """
+    snippet = video.get('snippet', {})
+    published_at = snippet.get('publishedAt', '')
+    if not published_at:
+        return None
+
+    try:
+        published_date = datetime.strptime(published_at, '%Y-%m-%dT%H:%M:%SZ')
+    except ValueError:
+        logging.warning(f"Invalid publishedAt format for video: {published_at}")
+        return None
+
+    if published_date < cutoff_date:
+        return None
+
+    return {
+        'id': video.get('id', ''),
+        'title': snippet.get('title', ''),
+        'description': snippet.get('description', ''),
+        'publishedAt': published_at
+    }
+
+def check_quota_exceeded(response):
+    """
+    Drain the local quota budget if YouTube itself reports that the daily quota is used up.
+    """
+    if response.status_code == 403 and 'quotaExceeded' in response.text:
+        logging.error("YouTube reported quotaExceeded; draining the local quota budget")
+        youtube_quota.drain()
+
+def iter_liked_video_pages(headers, cutoff_date, max_pages=None, known_video_ids=None, priority=INTERACTIVE,
+                           deadline=None, coverage=None):
+    """
+    Generator over the user's liked videos, one page at a time, following nextPageToken.
+    Each yielded page holds only the videos published after cutoff_date. Paging stops when
+    there are no more pages, when a whole page falls outside the analysis window, when a video
+    in known_video_ids is reached (likes are returned newest first, so everything after it has
+    already been analyzed), or after max_pages (defaults to MAX_LIKED_VIDEO_PAGES) requests.
+    Paging also stops early when no quota is left for the next page or when the deadline runs
+    out; QuotaExhaustedError or YouTubeAPIError is raised only if the first page cannot be fetched.
+    Whether paging ran to its natural end is recorded in coverage['pagingComplete'].
+    """
+    coverage = coverage if coverage is not None else {}
+    coverage.setdefault('pagesFetched', 0)
+    page_token = None
+    for page_number in range(max_pages or MAX_LIKED_VIDEO_PAGES):
+        params = {'part': 'snippet', 'maxResults': LIKED_VIDEOS_PAGE_SIZE, 'myRating': 'like'}
+        if page_token:
+            params['pageToken'] = page_token
+
+        if deadline and deadline.expired():
+            if page_number == 0:
+                raise YouTubeAPIError('Analysis deadline exceeded before any videos were fetched', status_code=504)
+            logging.warning(f"Deadline reached; stopped paging liked videos after {page_number} pages")
+            coverage['pagingComplete'] = False
+            return
+
+        try:
+            quota_wait = min(QUOTA_WAIT_SECONDS, deadline.remaining()) if deadline else QUOTA_WAIT_SECONDS
+            youtube_quota.acquire('videos.list', priority, timeout=quota_wait if page_number == 0 else 0)
+        except QuotaExhaustedError:
+            if page_number == 0:
+                raise
+            logging.warning(f"Quota budget low; stopped paging liked videos after {page_number} pages")
+            coverage['pagingComplete'] = False
+            return
+
+        try:
+            response = google_api.get(
+                f'{YOUTUBE_API_BASE}/videos',
+                headers=headers,
+                params=params,
+                fields=LIKED_VIDEOS_FIELDS,
+                timeout=deadline.request_timeout() if deadline else DEFAULT_TIMEOUT
+            )
+        except Exception as e:
+            logging.error(f"Error fetching liked videos page {page_number + 1}: {e}")
+            if page_number == 0:
+                if deadline and deadline.expired():
+                    raise YouTubeAPIError('Analysis deadline exceeded before any videos were fetched', str(e), status_code=504)
+                raise YouTubeAPIError('Failed to fetch liked videos', str(e))
+            coverage['pagingComplete'] = False
+            return
+        coverage['pagesFetched'] += 1
+        logging.debug(f"Fetch liked videos page {page_number + 1} HTTP status: {response.status_code}")
+        if response.status_code != 200:
+            logging.error(f"Failed to fetch liked videos: {response.status_code} - {response.text}")
+            check_quota_exceeded(response)
+            if page_number == 0:
+                try:
+                    details = response.json()
+                except ValueError:
+                    details = response.text
+                raise YouTubeAPIError('Failed to fetch liked videos', details)
+            # Later pages only shorten the analysis; keep what has been processed so far
+            coverage['pagingComplete'] = False
+            return
+
+        page = response.json()
+        items = page.get('items', [])
+
+        reached_known_video = False
+        if known_video_ids:
+            for index, item in enumerate(items):
+                if item.get('id') in known_video_ids:
+                    items = items[:index]
+                    reached_known_video = True
+                    break
+
+        recent_videos = [v for v in (parse_liked_video(item, cutoff_date) for item in items) if v]
+        if recent_videos:
+            yield recent_videos
+
+        page_token = page.get('nextPageToken')
+        if reached_known_video or not page_token or (items and not recent_videos):
+            return
+
+    logging.warning(f"Stopped paging liked videos after {max_pages or MAX_LIKED_VIDEO_PAGES} pages")
+    coverage['pagingComplete'] = False
+
+def fetch_video_comments(video_id, headers, priority=INTERACTIVE, deadline=None):
+    """
+    Fetch the top-level comment texts for a single video.
+    Errors (including running out of quota) are logged and isolated to this video: an empty list is returned instead.
+    Returns None if the deadline ran out before the comments could be fetched.
+    """
+    if deadline and deadline.expired():
+        return None
+    if not youtube_quota.try_acquire('commentThreads.list', priority):
+        logging.warning(f"No quota left to fetch comments for video {video_id}")
+        return []
+    try:
+        comments_response = google_api.get(
+            f'{YOUTUBE_API_BASE}/commentThreads',
+            headers=headers,
+            params={'part': 'snippet', 'videoId': video_id, 'maxResults': 20},
+            fields=COMMENT_THREADS_FIELDS,
+            timeout=deadline.request_timeout() if deadline else DEFAULT_TIMEOUT
+        )
+        if comments_response.status_code != 200:
+            logging.warning(f"Failed to fetch comments for video {video_id}: {comments_response.status_code}")
+            check_quota_exceeded(comments_response)
+            return []
+        comments = comments_response.json().get('items', [])
+        return [comment['snippet']['topLevelComment']['snippet']['textDisplay'] for comment in comments]
+    except Exception as e:
+        if deadline and deadline.expired():
+            logging.warning(f"Deadline reached while fetching comments for video {video_id}")
+            return None
+        logging.warning(f"Error fetching comments for video {video_id}: {e}")
+        return []
+
+def fetch_comments_concurrently(video_ids, headers, max_workers=None, priority=INTERACTIVE, deadline=None):
+    """
+    Fetch comments for several videos in parallel, bounded by max_workers
+    (defaults to COMMENT_FETCH_CONCURRENCY). Results are returned in the same order as video_ids.
+    Fetches still pending when the deadline runs out are cancelled and come back as None.
+    """
+    if not video_ids:
+        return []
+    max_workers = max(1, min(max_workers or COMMENT_FETCH_CONCURRENCY, len(video_ids)))
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(fetch_video_comments, video_id, headers, priority, deadline) for video_id in video_ids]
+        wait(futures, timeout=deadline.remaining() if deadline else None)
+        return [future.result() if future.done() else None for future in futures]
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def score_video_page(videos, headers, priority=INTERACTIVE, deadline=None, coverage=None):
+    """
+    Yield the scored video records for a page of videos, in page order.
+    Videos found in the shared video_cache are reused; comments are fetched and scored only for the rest.
+    When the quota budget is low, only some videos get their comments fetched and the others are
+    scored from title and description alone (and not cached). Videos whose comments were still
+    pending at the deadline are left out and counted in coverage['videosSkipped'].
+    """
+    coverage = coverage if coverage is not None else {}
+    coverage.setdefault('videosSkipped', 0)
+    cached_results = [video_cache.get(video['id']) for video in videos]
+    uncached_videos = [video for video, cached in zip(videos, cached_results) if cached is None]
+
+    fresh_results = {}
+    if uncached_videos:
+        comment_limit = youtube_quota.comment_fetch_limit(len(uncached_videos), priority)
+        if comment_limit < len(uncached_videos):
+            logging.warning(f"Quota budget low; fetching comments for {comment_limit} of {len(uncached_videos)} videos")
+            youtube_quota.record_degraded(len(uncached_videos) - comment_limit)
+        fetched_comments = fetch_comments_concurrently(
+            [v['id'] for v in uncached_videos[:comment_limit]], headers, priority=priority, deadline=deadline
+        )
+        all_comment_texts = fetched_comments + [[] for _ in uncached_videos[comment_limit:]]
+
+        # Videos whose comment fetch did not finish before the deadline are not scored
+        finished = [
+            (index, video, comment_texts)
+            for index, (video, comment_texts) in enumerate(zip(uncached_videos, all_comment_texts))
+            if comment_texts is not None
+        ]
+        coverage['videosSkipped'] += len(uncached_videos) - len(finished)
+
+        # Perform sentiment analysis for the whole page in one batch
+        texts_to_analyze = [
+            f"{video['title']} {video['description']} {' '.join(comment_texts)}"
+            for _, video, comment_texts in finished
+        ]
+        sentiment_scores = score_texts(texts_to_analyze)
+
+        for (index, video, _), sentiment_score in zip(finished, sentiment_scores.tolist()):
+            category = categorize_emotion(sentiment_score)
+            if index < comment_limit:
+                video_cache.put(video['id'], sentiment_score, category)
+            fresh_results[video['id']] = {'sentimentScore': sentiment_score, 'category': category}
+
+    for video, cached in zip(videos, cached_results):
+        result = cached or fresh_results.get(video['id'])
+        if result is None:
+            continue
+        yield {
+            'id': video['id'],
+            'title': video['title'],
+            'description': video['description'],
+            'sentimentScore': result['sentimentScore'],
+            'category': result['category'],
+            'publishedAt': video['publishedAt']
+        }
+
+def report_etag(user_id, generated_at, projection):
     """
-    Generate a mental health report based on the analyzed videos.
+    ETag for a stored report: changes whenever the report is regenerated or a different projection is requested.
+    """
+    raw = f"{user_id}|{generated_at}|{projection['fields']}|{projection['page']}|{projection['pageSize']}"
+    return hashlib.sha1(raw.encode()).hexdigest()
+
+def conditional_report_response(payload_builder, etag, status=200):
+    """
+    Answer 304 if the client already holds this ETag; otherwise build and serialize the payload.
+    """
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = jsonify(payload_builder())
+        response.status_code = status
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+def mental_health_report_params(accumulator):
+    """
+    Parameters of the report template: the total and per-category video counts.
+    """
+    counts = accumulator.category_counts
+    return (accumulator.total, counts['sad'], counts['happy'], counts['energetic'], counts['calm'])
+
+def render_mental_health_report_v1(total, sad_count, happy_count, energetic_count, calm_count):
+    """
+    Version 1 of the mental health report text.
     """
-    total = len(video_data)
     if total == 0:
         return "No videos analyzed. Please like some videos on YouTube to generate a report."
 
-    sad_count = sum(1 for v in video_data if v['category'] == 'sad')
-    happy_count = sum(1 for v in video_data if v['category'] == 'happy')
-    energetic_count = sum(1 for v in video_data if v['category'] == 'energetic')
-    calm_count = sum(1 for v in video_data if v['category'] == 'calm')
-
     report = (
         f"Mental Health Report: Analysis of your YouTube Liked Videos over the last 60 days. "
         f"While this is not a professional diagnosis, it can offer valuable insights into your emotional stability and overall mental well-being.\n\n"
@@ -82,6 +403,16 @@ def generate_mental_health_report(video_data):
     )
     return report
 
+# Stored reports keep only a template version and its parameters, so a version must never change once used
+REPORT_TEMPLATES = {1: render_mental_health_report_v1}
+REPORT_TEMPLATE_VERSION = 1
+
+def generate_mental_health_report(accumulator):
+    """
+    Generate a mental health report from the MetricsAccumulator of the analyzed videos.
+    """
+    return REPORT_TEMPLATES[REPORT_TEMPLATE_VERSION](*mental_health_report_params(accumulator))
+
 # Routes
 @app.route('/api/health', methods=['GET'])
 def health_check():
@@ -90,6 +421,27 @@ def health_check():
     """
     return jsonify({"status": "healthy", "message": "Backend is running"}), 200
 
+@app.route('/api/video-cache-stats', methods=['GET'])
+def video_cache_stats():
+    """
+    Hit/miss counters of the shared per-video analysis cache.
+    """
+    return jsonify(video_cache.stats()), 200
+
+@app.route('/api/google-api-stats', methods=['GET'])
+def google_api_stats():
+    """
+    Request, 304 and byte-transfer counters of the Google API client.
+    """
+    return jsonify(google_api.stats()), 200
+
+@app.route('/api/youtube-quota', methods=['GET'])
+def youtube_quota_stats():
+    """
+    Remaining YouTube Data API budget and units spent per API method.
+    """
+    return jsonify(youtube_quota.stats()), 200
+
 @app.route('/api/test', methods=['GET'])
 def test():
     return jsonify({"message": "Backend is working!"}), 200
@@ -153,7 +505,7 @@ def save_youtube_token():
         }
 
         logging.debug(f"Sending token exchange request to Google: {payload}")
-        response = requests.post(token_url, data=payload)
+        response = google_api.post(token_url, data=payload)
         logging.debug(f"Token exchange HTTP status: {response.status_code}")
         logging.debug(f"Token exchange raw response: {response.text}")
 
@@ -257,6 +609,9 @@ def clear_youtube_token():
             user.pop("youtube_metrics", None)
             user.pop("youtube_report", None)
             user.pop("youtube_report_generated_at", None)
+            user.pop("youtube_analyzed_videos", None)
+            user.pop("youtube_metrics_state", None)
+            report_scheduler.forget(user_id)
             logging.debug(f"Cleared YouTube token for user {user_id} in mock DB")
             return jsonify({"message": "YouTube token cleared successfully"}), 200
         else:
@@ -285,38 +640,207 @@ def save_youtube_report():
             return jsonify({"error": "User not found"}), 404
 
         mock_db[user_id].update({
-            "youtube_metrics": metrics,
-            "youtube_report": report,
+            "youtube_metrics": compact_metrics(metrics),
+            "youtube_report": StoredReport.from_text(report),
             "youtube_report_generated_at": datetime.utcnow().isoformat()
         })
+        # Externally supplied metrics replace the analyzed video set, so the next analysis runs in full
+        mock_db[user_id].pop("youtube_analyzed_videos", None)
+        mock_db[user_id].pop("youtube_metrics_state", None)
         logging.debug(f"Report saved to mock DB for user {user_id}")
         return jsonify({"message": "Report saved successfully"}), 200
     except Exception as e:
         logging.error(f"Error in /api/save-youtube-report: {e}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/api/get-youtube-report', methods=['POST'])
+@app.route('/api/get-youtube-report', methods=['GET', 'POST'])
 def get_youtube_report():
+    """
+    Return a stored report. Clients may choose fields (summary, timeseries, videos, report,
+    descriptions) and a page of videos; responses carry an ETag so unchanged reports return 304.
+    """
     try:
-        logging.debug("Received POST request to /api/get-youtube-report")
-        data = request.json
+        logging.debug(f"Received {request.method} request to /api/get-youtube-report")
+        data = request.args if request.method == 'GET' else (request.json or {})
         user_id = data.get('user_id')
 
         if not user_id:
             logging.error("Missing user_id in request data")
             return jsonify({"error": "Missing user_id"}), 400
 
+        try:
+            projection = parse_report_projection(data)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
         user = mock_db.get(user_id)
+        if user and user.get('youtube_access_token'):
+            report_scheduler.record_activity(user_id)
         if user and user.get('youtube_report'):
-            return jsonify({
-                "metrics": user.get('youtube_metrics'),
-                "report": user.get('youtube_report')
-            }), 200
+            etag = report_etag(user_id, user.get('youtube_report_generated_at'), projection)
+            return conditional_report_response(
+                lambda: project_report(user.get('youtube_metrics'), user['youtube_report'].render(REPORT_TEMPLATES), projection),
+                etag
+            )
         return jsonify({"metrics": None, "report": None}), 404
     except Exception as e:
         logging.error(f"Error in /api/get-youtube-report: {e}")
         return jsonify({"error": str(e)}), 500
 
+def run_youtube_analysis(user_id, user, incremental=True, priority=INTERACTIVE, deadline_seconds=ANALYSIS_DEADLINE_SECONDS, blocking=True):
+    """
+    Analyze a connected user's liked videos and save the report and metrics to mock DB.
+    Used by /api/analyze-youtube and by the background report refresh. Runs for the same user are
+    serialized: when blocking, time spent waiting for a running one counts against the deadline.
+    Raises AnalysisInProgressError if the user could not be analyzed in time (or at once, when not
+    blocking), and YouTubeAPIError or QuotaExhaustedError if no report could be produced.
+    """
+    deadline = Deadline(deadline_seconds)
+    lock = user_analysis_lock(user_id)
+    if not (lock.acquire(timeout=deadline.remaining()) if blocking else lock.acquire(blocking=False)):
+        raise AnalysisInProgressError(user_id)
+    try:
+        return analyze_liked_videos(user_id, user, incremental, priority, deadline)
+    finally:
+        lock.release()
+
+def analyze_liked_videos(user_id, user, incremental, priority, deadline):
+    """
+    The analysis behind run_youtube_analysis; callers hold the user's analysis lock.
+    """
+    access_token = user['youtube_access_token']
+    headers = {'Authorization': f'Bearer {access_token}'}
+    cutoff_date = datetime.utcnow() - timedelta(days=ANALYSIS_WINDOW_DAYS)
+    analyzed_at = datetime.utcnow().isoformat()
+
+    # Incremental mode: resume from the previous run's accumulator, reuse its scored videos that
+    # are still inside the window and only fetch likes newer than the most recent one analyzed
+    previously_analyzed = user.get('youtube_analyzed_videos') or {}
+    metrics_state = user.get('youtube_metrics_state')
+    incremental = incremental and bool(previously_analyzed) and bool(metrics_state)
+    retained_videos = []
+    if incremental:
+        cutoff_day = cutoff_date.strftime('%Y-%m-%d')
+        accumulator = metrics_state.unpack()
+        accumulator.prune(cutoff_day)
+        previous_videos = (user.get('youtube_metrics') or {}).get('videos') or []
+        retained_videos = [
+            v for v in previous_videos
+            if v.get('id') in previously_analyzed and v['publishedAt'][:10] >= cutoff_day
+        ]
+    else:
+        accumulator = MetricsAccumulator()
+
+    # Stream liked videos page by page, scoring and aggregating each page as it arrives
+    coverage = {'pagesFetched': 0, 'pagingComplete': True, 'videosSkipped': 0}
+    new_videos = []
+    known_video_ids = set(previously_analyzed) if incremental else None
+    pages = iter_liked_video_pages(
+        headers, cutoff_date, known_video_ids=known_video_ids, priority=priority, deadline=deadline, coverage=coverage
+    )
+    for page in pages:
+        for video in score_video_page(page, headers, priority=priority, deadline=deadline, coverage=coverage):
+            new_videos.append(video)
+            accumulator.add(video)
+
+    video_data = new_videos + retained_videos
+    logging.debug(f"Analyzed {len(new_videos)} new videos, reused {len(retained_videos)} (incremental={incremental})")
+
+    partial = coverage['videosSkipped'] > 0 or not coverage['pagingComplete']
+    # Nothing new to score (e.g. an incremental run with no new likes) counts as fully analyzed
+    attempted = len(new_videos) + coverage['videosSkipped']
+    coverage.update({
+        'videosAnalyzed': len(new_videos),
+        'videosReused': len(retained_videos),
+        'fractionAnalyzed': len(new_videos) / attempted if attempted else 1.0,
+        'elapsedSeconds': round(deadline.elapsed(), 3),
+        'deadlineSeconds': deadline.seconds
+    })
+    if partial:
+        logging.warning(f"Partial analysis for user {user_id}: {coverage}")
+
+    # Remember which videos have been analyzed and when, dropping those that aged out of the window
+    analyzed_videos = {v['id']: previously_analyzed[v['id']] for v in retained_videos}
+    analyzed_videos.update((sys.intern(v['id']), analyzed_at) for v in new_videos)
+
+    # Generate mental health report and metrics from the accumulator
+    report = generate_mental_health_report(accumulator)
+    metrics = accumulator.to_metrics(video_data)
+
+    # Save the report and metrics to mock DB in their compact form. A partial run keeps the previous
+    # incremental state, so the videos it skipped are picked up again by the next analysis.
+    user.update({
+        "youtube_metrics": compact_metrics(metrics),
+        "youtube_report": StoredReport(REPORT_TEMPLATE_VERSION, mental_health_report_params(accumulator)),
+        "youtube_report_generated_at": analyzed_at
+    })
+    if not partial:
+        user.update({
+            "youtube_analyzed_videos": analyzed_videos,
+            "youtube_metrics_state": PackedMetricsState.pack(accumulator)
+        })
+    logging.debug(f"Report saved to mock DB for user {user_id}")
+    return {
+        'report': report,
+        'metrics': metrics,
+        'mode': 'incremental' if incremental else 'full',
+        'newVideos': len(new_videos),
+        'partial': partial,
+        'coverage': coverage,
+        'analyzedAt': analyzed_at
+    }
+
+def refresh_youtube_report(user_id):
+    """
+    Background refresh of one user's report at background quota priority.
+    A partial run is not counted as a success, so it is retried with backoff.
+    """
+    user = mock_db.get(user_id)
+    if not user or 'youtube_access_token' not in user:
+        return False
+    try:
+        result = run_youtube_analysis(user_id, user, priority=BACKGROUND, blocking=False)
+    except AnalysisInProgressError:
+        # An interactive analysis is refreshing this report right now
+        logging.debug(f"Background refresh for user {user_id} skipped: an analysis is already running")
+        return True
+    logging.debug(f"Background refresh for user {user_id}: {result['mode']}, {result['newVideos']} new videos")
+    return not result['partial']
+
+def report_refresh_candidates():
+    for user_id, user in list(mock_db.items()):
+        if user.get('youtube_access_token'):
+            generated_at = user.get('youtube_report_generated_at')
+            yield user_id, datetime.fromisoformat(generated_at) if generated_at else None
+
+# Background refresh of active users' reports, preferring off-peak hours (UTC)
+report_scheduler = ReportRefreshScheduler(
+    refresh_youtube_report,
+    report_refresh_candidates,
+    max_concurrency=int(os.getenv("REPORT_REFRESH_CONCURRENCY", 2)),
+    interval=float(os.getenv("REPORT_REFRESH_INTERVAL", 60)),
+    min_age=float(os.getenv("REPORT_REFRESH_MIN_AGE", 3600)),
+    peak_min_age=float(os.getenv("REPORT_REFRESH_PEAK_MIN_AGE", 6 * 3600)),
+    off_peak_hours=parse_hour_ranges(os.getenv("REPORT_REFRESH_OFF_PEAK_HOURS", "1-6"))
+)
+REPORT_REFRESH_ENABLED = os.getenv("REPORT_REFRESH_ENABLED", "true").lower() == "true"
+
+@app.before_request
+def start_report_scheduler():
+    """
+    Start the background refresh with the first request rather than at import, so importing the
+    module (scripts, a gunicorn master before it forks workers) does not spawn its threads.
+    """
+    if REPORT_REFRESH_ENABLED:
+        report_scheduler.start()
+
+@app.route('/api/report-refresh-stats', methods=['GET'])
+def report_refresh_stats():
+    """
+    Counters of the background report refresh scheduler.
+    """
+    return jsonify(report_scheduler.stats()), 200
+
 @app.route('/api/analyze-youtube', methods=['POST'])
 def analyze_youtube():
     try:
@@ -327,125 +851,47 @@ def analyze_youtube():
             logging.error("Missing user_id in request data")
             return jsonify({'error': 'User ID is required'}), 400
 
+        try:
+            projection = parse_report_projection(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         # Fetch user from mock DB
         user = mock_db.get(user_id)
         if not user or 'youtube_access_token' not in user:
             logging.error("YouTube not connected for user")
             return jsonify({'error': 'YouTube not connected'}), 400
+        report_scheduler.record_activity(user_id)
 
-        access_token = user['youtube_access_token']
-        headers = {'Authorization': f'Bearer {access_token}'}
-        params = {'part': 'snippet', 'maxResults': 50, 'myRating': 'like'}
-
-        # Fetch liked videos from YouTube API
-        response = requests.get('https://www.googleapis.com/youtube/v3/videos', headers=headers, params=params)
-        logging.debug(f"Fetch liked videos HTTP status: {response.status_code}")
-        if response.status_code != 200:
-            logging.error(f"Failed to fetch liked videos: {response.status_code} - {response.text}")
-            return jsonify({'error': 'Failed to fetch liked videos', 'details': response.json()}), 500
-
-        videos = response.json().get('items', [])
-        video_data = []
-        cutoff_date = datetime.utcnow() - timedelta(days=60)  # Last 60 days
-
-        # Analyze each video
-        for video in videos:
-            snippet = video.get('snippet', {})
-            published_at = snippet.get('publishedAt', '')
-            if not published_at:
-                continue
-
-            try:
-                published_date = datetime.strptime(published_at, '%Y-%m-%dT%H:%M:%SZ')
-            except ValueError:
-                logging.warning(f"Invalid publishedAt format for video: {published_at}")
-                continue
-
-            if published_date < cutoff_date:
-                continue
-
-            title = snippet.get('title', '')
-            description = snippet.get('description', '')
-            video_id = video.get('id', '')
-
-            # Fetch comments
-            try:
-                comments_response = requests.get(
-                    'https://www.googleapis.com/youtube/v3/commentThreads',
-                    headers=headers,
-                    params={'part': 'snippet', 'videoId': video_id, 'maxResults': 20}
-                )
-                if comments_response.status_code != 200:
-                    logging.warning(f"Failed to fetch comments for video {video_id}: {comments_response.status_code}")
-                    comment_texts = []
-                else:
-                    comments = comments_response.json().get('items', [])
-                    comment_texts = [comment['snippet']['topLevelComment']['snippet']['textDisplay'] for comment in comments]
-            except Exception as e:
-                logging.warning(f"Error fetching comments for video {video_id}: {e}")
-                comment_texts = []
-
-            # Perform sentiment analysis
-            text_to_analyze = f"{title} {description} {' '.join(comment_texts)}"
-            sentiment_score = analyze_sentiment(text_to_analyze)
-            category = categorize_emotion(sentiment_score)
-
-            video_data.append({
-                'title': title,
-                'description': description,
-                'sentimentScore': sentiment_score,
-                'category': category,
-                'publishedAt': published_at
-            })
-
-        # Calculate category counts
-        sad_count = sum(1 for v in video_data if v['category'] == 'sad')
-        happy_count = sum(1 for v in video_data if v['category'] == 'happy')
-        energetic_count = sum(1 for v in video_data if v['category'] == 'energetic')
-        calm_count = sum(1 for v in video_data if v['category'] == 'calm')
-
-        # Calculate total videos and average sentiment score
-        total_videos = len(video_data)
-        average_sentiment_score = sum(v['sentimentScore'] for v in video_data) / total_videos if total_videos > 0 else 0
-
-        # Calculate sentiment over time (daily averages)
-        sentiment_over_time = {}
-        for video in video_data:
-            published_date = datetime.strptime(video['publishedAt'], '%Y-%m-%dT%H:%M:%SZ')
-            date_key = published_date.strftime('%Y-%m-%d')
-            if date_key not in sentiment_over_time:
-                sentiment_over_time[date_key] = {'total_score': 0, 'count': 0}
-            sentiment_over_time[date_key]['total_score'] += video['sentimentScore']
-            sentiment_over_time[date_key]['count'] += 1
-
-        sentiment_over_time_list = [
-            {'date': date, 'score': data['total_score'] / data['count']}
-            for date, data in sorted(sentiment_over_time.items())
-        ]
-
-        # Generate mental health report
-        report = generate_mental_health_report(video_data)
-
-        # Prepare metrics
-        metrics = {
-            'sadCount': sad_count,
-            'happyCount': happy_count,
-            'energeticCount': energetic_count,
-            'calmCount': calm_count,
-            'videos': video_data,
-            'totalVideos': total_videos,
-            'averageSentimentScore': average_sentiment_score,
-            'sentimentOverTime': sentiment_over_time_list
-        }
-
-        # Save the report and metrics to mock DB
-        mock_db[user_id].update({
-            "youtube_metrics": metrics,
-            "youtube_report": report,
-            "youtube_report_generated_at": datetime.utcnow().isoformat()
-        })
-        logging.debug(f"Report saved to mock DB for user {user_id}")
-        return jsonify({'report': report, 'metrics': metrics}), 200
+        priority = PRIORITIES.get(data.get('priority', 'interactive'), INTERACTIVE)
+        deadline_seconds = data.get('deadline')
+        try:
+            deadline_seconds = ANALYSIS_DEADLINE_SECONDS if deadline_seconds is None else float(deadline_seconds)
+        except (TypeError, ValueError):
+            return jsonify({'error': 'deadline must be a number of seconds'}), 400
+        if not deadline_seconds > 0:
+            return jsonify({'error': 'deadline must be positive'}), 400
+        deadline_seconds = min(deadline_seconds, ANALYSIS_DEADLINE_SECONDS)
+        incremental = str(data.get('incremental', True)).lower() not in ('false', '0')
+        try:
+            result = run_youtube_analysis(
+                user_id, user, incremental=incremental, priority=priority, deadline_seconds=deadline_seconds
+            )
+        except YouTubeAPIError as e:
+            return jsonify({'error': str(e), 'details': e.details}), e.status_code
+        except QuotaExhaustedError as e:
+            logging.error(f"Quota exhausted for user {user_id}: {e}")
+            response = jsonify({'error': 'YouTube API quota exhausted, please try again later', 'retry_after': round(e.retry_after)})
+            response.headers['Retry-After'] = str(max(1, round(e.retry_after)))
+            return response, 429
+
+        return conditional_report_response(lambda: {
+            **project_report(result['metrics'], result['report'], projection),
+            'mode': result['mode'],
+            'newVideos': result['newVideos'],
+            'partial': result['partial'],
+            'coverage': result['coverage']
+        }, report_etag(user_id, result['analyzedAt'], projection))
     except Exception as e:
         logging.error(f"Error in /api/analyze-youtube: {e}")
         return jsonify({"error": str(e)}), 500
@@ -0,0 +1,249 @@
+"""
+Single-pass metrics accumulator for YouTube liked-video analyses.
+"""
+from datetime import date
+
+CATEGORIES = ('sad', 'happy', 'energetic', 'calm')
+
+
+def _empty_bucket():
+    return {'count': 0, 'score': 0.0}
+
+
+class MetricsAccumulator:
+    """
+    Accumulates category counts, the running sentiment mean and daily/weekly/monthly
+    rollups as videos are scored, in a single pass.
+
+    Daily buckets also keep per-category counts, so days that age out of the analysis
+    window can be subtracted again with prune(). The state round-trips through
+    to_dict()/from_dict() and can be stored and updated later without the raw video list.
+    """
+
+    def __init__(self):
+        self.category_counts = {category: 0 for category in CATEGORIES}
+        self.total = 0
+        self.score_sum = 0.0
+        self.daily = {}
+        self.weekly = {}
+        self.monthly = {}
+
+    @staticmethod
+    def _period_keys(day):
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}", day[:7]
+
+    def add(self, video):
+        """
+        Fold one scored video ({'category', 'sentimentScore', 'publishedAt', ...}) into the metrics.
+        """
+        category = video['category']
+        score = video['sentimentScore']
+        self.category_counts[category] += 1
+        self.total += 1
+        self.score_sum += score
+
+        # publishedAt has been validated upstream, so its first 10 characters are the date
+        day = video['publishedAt'][:10]
+        daily = self.daily.get(day)
+        if daily is None:
+            daily = self.daily[day] = {'count': 0, 'score': 0.0, 'categories': {c: 0 for c in CATEGORIES}}
+        daily['count'] += 1
+        daily['score'] += score
+        daily['categories'][category] += 1
+
+        week, month = self._period_keys(day)
+        for rollup, key in ((self.weekly, week), (self.monthly, month)):
+            bucket = rollup.setdefault(key, _empty_bucket())
+            bucket['count'] += 1
+            bucket['score'] += score
+
+    def prune(self, cutoff_day):
+        """
+        Remove every day before cutoff_day ('YYYY-MM-DD') from the counts and rollups.
+        """
+        for day in [d for d in self.daily if d < cutoff_day]:
+            daily = self.daily.pop(day)
+            self.total -= daily['count']
+            self.score_sum -= daily['score']
+            for category, count in daily['categories'].items():
+                self.category_counts[category] -= count
+
+            week, month = self._period_keys(day)
+            for rollup, key in ((self.weekly, week), (self.monthly, month)):
+                bucket = rollup[key]
+                bucket['count'] -= daily['count']
+                bucket['score'] -= daily['score']
+                if bucket['count'] <= 0:
+                    del rollup[key]
+
+    @property
+    def average_score(self):
+        return self.score_sum / self.total if self.total > 0 else 0
+
+    @staticmethod
+    def _series(rollup):
+        return [{'date': key, 'score': bucket['score'] / bucket['count']} for key, bucket in sorted(rollup.items())]
+
+    def to_metrics(self, videos):
+        """
+        Render the metrics payload returned by /api/analyze-youtube.
+        """
+        return {
+            'sadCount': self.category_counts['sad'],
+            'happyCount': self.category_counts['happy'],
+            'energeticCount': self.category_counts['energetic'],
+            'calmCount': self.category_counts['calm'],
+            'videos': videos,
+            'totalVideos': self.total,
+            'averageSentimentScore': self.average_score,
+            'sentimentOverTime': self._series(self.daily),
+            'sentimentByWeek': self._series(self.weekly),
+            'sentimentByMonth': self._series(self.monthly)
+        }
+
+    def to_dict(self):
+        """
+        Serialize the accumulator state to plain JSON-compatible data.
+        """
+        return {
+            'categoryCounts': dict(self.category_counts),
+            'total': self.total,
+            'scoreSum': self.score_sum,
+            'daily': {day: {**bucket, 'categories': dict(bucket['categories'])} for day, bucket in self.daily.items()},
+            'weekly': {key: dict(bucket) for key, bucket in self.weekly.items()},
+            'monthly': {key: dict(bucket) for key, bucket in self.monthly.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        """
+        Rebuild an accumulator from the output of to_dict().
+        """
+        accumulator = cls()
+        accumulator.category_counts.update(state['categoryCounts'])
+        accumulator.total = state['total']
+        accumulator.score_sum = state['scoreSum']
+        accumulator.daily = {day: {**bucket, 'categories': dict(bucket['categories'])} for day, bucket in state['daily'].items()}
+        accumulator.weekly = {key: dict(bucket) for key, bucket in state['weekly'].items()}
+        accumulator.monthly = {key: dict(bucket) for key, bucket in state['monthly'].items()}
+        return accumulator
+
+    def to_rows(self):
+        """
+        Daily buckets as (day, count, score, [per-category counts]) rows in day order.
+        Totals and the weekly/monthly rollups can all be rebuilt from these.
+        """
+        return [
+            (day, bucket['count'], bucket['score'], [bucket['categories'][c] for c in CATEGORIES])
+            for day, bucket in sorted(self.daily.items())
+        ]
+
+    @classmethod
+    def from_rows(cls, rows):
+        """
+        Rebuild an accumulator from the output of to_rows().
+        """
+        accumulator = cls()
+        for day, count, score, category_counts in rows:
+            accumulator.daily[day] = {'count': count, 'score': score, 'categories': dict(zip(CATEGORIES, category_counts))}
+            accumulator.total += count
+            accumulator.score_sum += score
+            for category, category_count in zip(CATEGORIES, category_counts):
+                accumulator.category_counts[category] += category_count
+            week, month = cls._period_keys(day)
+            for rollup, key in ((accumulator.weekly, week), (accumulator.monthly, month)):
+                bucket = rollup.setdefault(key, _empty_bucket())
+                bucket['count'] += count
+                bucket['score'] += score
+        return accumulator
+
+
+# Field groups a client can request from a stored report
+REPORT_FIELD_GROUPS = {
+    'summary': ('sadCount', 'happyCount', 'energeticCount', 'calmCount', 'totalVideos', 'averageSentimentScore'),
+    'timeseries': ('sentimentOverTime', 'sentimentByWeek', 'sentimentByMonth'),
+    'videos': ('videos',)
+}
+REPORT_FIELDS = set(REPORT_FIELD_GROUPS) | {'report', 'descriptions'}
+DEFAULT_VIDEOS_PAGE_SIZE = 50
+MAX_VIDEOS_PAGE_SIZE = 200
+
+
+def parse_report_projection(params):
+    """
+    Read the projection requested by a client from request args or a JSON body.
+
+    fields is a comma-separated list (or JSON list) of summary, timeseries, videos, report and
+    descriptions; without it the full payload is returned. page/page_size select a page of
+    videos. Raises ValueError for unknown fields or invalid paging values.
+    """
+    fields = params.get('fields')
+    if fields is None:
+        requested = None
+    else:
+        if isinstance(fields, str):
+            fields = [f for f in fields.split(',') if f.strip()]
+        if not isinstance(fields, list) or not all(isinstance(f, str) for f in fields):
+            raise ValueError("fields must be a comma-separated string or a list of strings")
+        requested = {f.strip() for f in fields}
+        unknown = requested - REPORT_FIELDS
+        if unknown:
+            raise ValueError(f"Unknown report fields: {', '.join(sorted(unknown))}")
+
+    page = params.get('page')
+    page_size = params.get('page_size')
+    paged = page is not None or page_size is not None
+    try:
+        page = int(page or 1)
+        page_size = int(page_size or DEFAULT_VIDEOS_PAGE_SIZE)
+    except (TypeError, ValueError):
+        raise ValueError("page and page_size must be integers")
+    if page < 1 or not 1 <= page_size <= MAX_VIDEOS_PAGE_SIZE:
+        raise ValueError(f"page must be >= 1 and page_size between 1 and {MAX_VIDEOS_PAGE_SIZE}")
+
+    return {
+        'fields': sorted(requested) if requested is not None else None,
+        'page': page if paged else None,
+        'pageSize': page_size if paged else None
+    }
+
+
+def project_report(metrics, report, projection):
+    """
+    Build the response payload for a stored report according to a parsed projection.
+    The unprojected payload is {'metrics': metrics, 'report': report}, as before.
+
+    metrics may be a metrics dict or any object with the same get() and a to_dict()
+    (such as the compact stored form), which is only fully expanded when unprojected.
+    """
+    fields = projection['fields']
+    paged = projection['page'] is not None
+    if fields is None and not paged:
+        to_dict = getattr(metrics, 'to_dict', None)
+        return {'metrics': to_dict() if to_dict else metrics, 'report': report}
+
+    requested = set(fields) if fields is not None else set(REPORT_FIELD_GROUPS) | {'report', 'descriptions'}
+    metrics = metrics or {}
+    projected = {}
+    for group, keys in REPORT_FIELD_GROUPS.items():
+        if group in requested:
+            projected.update((key, metrics.get(key)) for key in keys)
+
+    if 'videos' in requested:
+        videos = metrics.get('videos') or []
+        total = len(videos)
+        if paged:
+            start = (projection['page'] - 1) * projection['pageSize']
+            videos = videos[start:start + projection['pageSize']]
+            projected['videosPage'] = {'page': projection['page'], 'pageSize': projection['pageSize'], 'total': total}
+        else:
+            videos = videos[:]
+        if 'descriptions' not in requested:
+            videos = [{key: value for key, value in video.items() if key != 'description'} for video in videos]
+        projected['videos'] = videos
+
+    payload = {'metrics': projected}
+    if 'report' in requested:
+        payload['report'] = report
+    return payload